@@ -0,0 +1,273 @@
+"""
+Reusable data module for the Task-1 / Task-2 training notebooks.
+
+Each split is tokenized once into a compact on-disk cache:
+
+    <cache_dir>/<key>/input_ids.int32   flat int32 token ids of every row, unpadded
+    <cache_dir>/<key>/offsets.npy       int64 row offsets (len = rows + 1)
+    <cache_dir>/<key>/meta.json         tokenizer / max_length / row count
+
+The key is derived from the tokenizer, max_length and the texts themselves, so
+5-fold x N-epoch runs (and reruns of the notebook) reuse the same cache instead
+of calling the tokenizer inside __getitem__ every epoch. Datasets read rows from
+the memory-mapped arrays, so only the pages a batch touches are resident.
+
+Training loaders combine unpadded datasets with LengthGroupedBatchSampler and
+DynamicPaddingCollate, so each batch holds texts of similar length and is only
+padded to its own longest row instead of the global max_length.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Sampler
+
+TOKENIZE_BATCH_SIZE = 1024
+
+
+def _tokenizer_fingerprint(tokenizer):
+    """Identify a tokenizer by class, name/path, vocab size and special token ids"""
+    return json.dumps({
+        'class': type(tokenizer).__name__,
+        'name_or_path': str(getattr(tokenizer, 'name_or_path', '')),
+        'vocab_size': len(tokenizer),
+        'pad_token_id': tokenizer.pad_token_id,
+        'cls_token_id': tokenizer.cls_token_id,
+        'sep_token_id': tokenizer.sep_token_id,
+    }, sort_keys=True)
+
+
+def cache_key(texts, tokenizer, max_length):
+    """Stable key for (texts, tokenizer, max_length)"""
+    digest = hashlib.sha1()
+    digest.update(_tokenizer_fingerprint(tokenizer).encode('utf-8'))
+    digest.update(str(max_length).encode('utf-8'))
+    for text in texts:
+        digest.update(str(text).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:20]
+
+
+class TokenCache:
+    """Memory-mapped, pre-tokenized split (ragged int32 ids + row offsets)"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        total = int(self.offsets[-1])
+        # np.memmap refuses zero-length files
+        if total:
+            self.input_ids = np.memmap(os.path.join(path, 'input_ids.int32'), dtype=np.int32, mode='r', shape=(total,))
+        else:
+            self.input_ids = np.zeros(0, dtype=np.int32)
+        self.lengths = np.diff(self.offsets).astype(np.int64)
+        self.max_length = self.meta['max_length']
+        self.pad_token_id = self.meta['pad_token_id']
+
+    @classmethod
+    def build(cls, texts, tokenizer, max_length=512, cache_dir="token_cache", batch_size=TOKENIZE_BATCH_SIZE):
+        """
+        Tokenize `texts` once (or reuse an existing cache with the same key).
+
+        Args:
+            texts: iterable of strings (e.g. df['text'])
+            tokenizer: Hugging Face tokenizer
+            max_length: truncation length, same meaning as in CryptoDataset
+            cache_dir: directory holding all caches
+        """
+        texts = [str(t) for t in texts]
+        key = cache_key(texts, tokenizer, max_length)
+        path = os.path.join(cache_dir, key)
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            print(f" Reusing token cache {path}")
+            return cls(path)
+
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        with open(os.path.join(tmp_path, 'input_ids.int32'), 'wb') as f:
+            for start in range(0, len(texts), batch_size):
+                encoded = tokenizer(
+                    texts[start:start + batch_size],
+                    truncation=True,
+                    max_length=max_length,
+                    padding=False,
+                )['input_ids']
+                for i, ids in enumerate(encoded):
+                    offsets[start + i + 1] = len(ids)
+                    np.asarray(ids, dtype=np.int32).tofile(f)
+        offsets = np.cumsum(offsets)
+        np.save(os.path.join(tmp_path, 'offsets.npy'), offsets)
+
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({
+                'rows': len(texts),
+                'tokens': int(offsets[-1]),
+                'max_length': max_length,
+                'pad_token_id': tokenizer.pad_token_id or 0,
+                'tokenizer': json.loads(_tokenizer_fingerprint(tokenizer)),
+            }, f, indent=4)
+
+        # Publish atomically so an interrupted build is never reused
+        if os.path.exists(path):
+            shutil.rmtree(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+        print(f" Tokenized {len(texts)} rows ({int(offsets[-1])} tokens) into {path}")
+        return cls(path)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def get(self, idx):
+        """Unpadded token ids of row `idx` as an int64 array"""
+        return np.asarray(self.input_ids[self.offsets[idx]:self.offsets[idx + 1]], dtype=np.int64)
+
+
+class CachedCryptoDataset(Dataset):
+    """
+    Drop-in replacement for CryptoDataset backed by a TokenCache.
+
+    Args:
+        cache: TokenCache of the full split
+        labels: labels aligned with the cached split (e.g. train_df['level_1_enc'])
+        indices: optional row subset of the split (e.g. a fold's train_idx)
+        pad_to_max_length: pad every item to cache.max_length so the default
+            `collate_fn` (torch.stack) keeps working
+    """
+    def __init__(self, cache, labels, indices=None, pad_to_max_length=True):
+        self.cache = cache
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.indices = np.arange(len(cache)) if indices is None else np.asarray(indices, dtype=np.int64)
+        self.pad_to_max_length = pad_to_max_length
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def lengths(self):
+        """Token length of every item, in dataset order"""
+        return self.cache.lengths[self.indices]
+
+    def __getitem__(self, idx):
+        row = self.indices[idx]
+        ids = self.cache.get(row)
+        attention_mask = np.ones(len(ids), dtype=np.int64)
+        if self.pad_to_max_length and len(ids) < self.cache.max_length:
+            pad = self.cache.max_length - len(ids)
+            ids = np.concatenate([ids, np.full(pad, self.cache.pad_token_id, dtype=np.int64)])
+            attention_mask = np.concatenate([attention_mask, np.zeros(pad, dtype=np.int64)])
+        return {
+            'input_ids': torch.from_numpy(ids),
+            'attention_mask': torch.from_numpy(attention_mask),
+            'labels': torch.tensor(self.labels[row], dtype=torch.long),
+        }
+
+
+class LengthGroupedBatchSampler(Sampler):
+    """
+    Batch sampler that groups rows of similar token length.
+
+    Indices are drawn from `sampler` (e.g. the WeightedRandomSampler of the
+    Level 1 loop) or a random permutation, cut into mega-batches of
+    `batch_size * mega_batch_mult`, sorted by length inside each mega-batch and
+    split into batches. Batch order is shuffled again so an epoch does not run
+    from short to long texts.
+
+    Args:
+        lengths: token length of every dataset item (CachedCryptoDataset.lengths)
+        batch_size: rows per batch
+        sampler: optional sampler yielding dataset positions
+        shuffle: shuffle rows/batches when no sampler is given
+        mega_batch_mult: mega-batch size as a multiple of batch_size
+        drop_last: drop the final incomplete batches
+        seed: base seed, advanced every epoch
+    """
+    def __init__(self, lengths, batch_size, sampler=None, shuffle=True, mega_batch_mult=50,
+                 drop_last=False, seed=42):
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.batch_size = batch_size
+        self.sampler = sampler
+        self.shuffle = shuffle
+        self.mega_batch_mult = mega_batch_mult
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def _num_samples(self):
+        return len(self.sampler) if self.sampler is not None else len(self.lengths)
+
+    def __len__(self):
+        if self.drop_last:
+            return self._num_samples() // self.batch_size
+        return (self._num_samples() + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        self.epoch += 1
+
+        if self.sampler is not None:
+            indices = np.fromiter(iter(self.sampler), dtype=np.int64)
+        elif self.shuffle:
+            indices = rng.permutation(len(self.lengths))
+        else:
+            indices = np.arange(len(self.lengths))
+
+        mega_batch_size = self.batch_size * self.mega_batch_mult
+        batches = []
+        for start in range(0, len(indices), mega_batch_size):
+            chunk = indices[start:start + mega_batch_size]
+            chunk = chunk[np.argsort(-self.lengths[chunk], kind='stable')]
+            batches.extend(chunk[i:i + self.batch_size] for i in range(0, len(chunk), self.batch_size))
+
+        if self.drop_last:
+            batches = [b for b in batches if len(b) == self.batch_size]
+        if self.shuffle or self.sampler is not None:
+            order = rng.permutation(len(batches))
+            batches = [batches[i] for i in order]
+
+        for batch in batches:
+            yield batch.tolist()
+
+
+class DynamicPaddingCollate:
+    """
+    Collate unpadded items by padding to the longest row of the batch.
+
+    Variable-length 1-D tensors (input_ids, attention_mask, token_type_ids) are
+    padded; everything else (labels) is stacked as in the old collate_fn.
+
+    Args:
+        pad_token_id: id used to pad input_ids (tokenizer.pad_token_id)
+        pad_to_multiple_of: round the padded length up for tensor-core friendly shapes
+    """
+    PADDED_KEYS = ('input_ids', 'attention_mask', 'token_type_ids')
+
+    def __init__(self, pad_token_id=0, pad_to_multiple_of=8):
+        self.pad_token_id = pad_token_id or 0
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def __call__(self, batch):
+        max_len = max(len(item['input_ids']) for item in batch)
+        if self.pad_to_multiple_of:
+            max_len = -(-max_len // self.pad_to_multiple_of) * self.pad_to_multiple_of
+
+        collated = {}
+        for key in batch[0].keys():
+            if key not in self.PADDED_KEYS:
+                collated[key] = torch.stack([item[key] for item in batch])
+                continue
+            pad_value = self.pad_token_id if key == 'input_ids' else 0
+            out = torch.full((len(batch), max_len), pad_value, dtype=batch[0][key].dtype)
+            for i, item in enumerate(batch):
+                out[i, :len(item[key])] = item[key]
+            collated[key] = out
+        return collated
@@ -0,0 +1,200 @@
+"""
+Shared-encoder multi-head training for Task-1.
+
+One DeBERTa encoder is trained with three classification heads (level 1, 2
+and 3) instead of three separate 5-fold ensembles. Rows only contribute to the
+heads that apply to them in the hierarchy:
+
+    level_1: NOISE / OBJECTIVE / SUBJECTIVE          -> every row
+    level_2: NEUTRAL / NEGATIVE / POSITIVE           -> only level_1 == SUBJECTIVE
+    level_3: NEUTRAL_SENTIMENT / QUESTION / AD / MISC -> only level_2 == NEUTRAL
+
+Saved state dicts load directly into
+`sentiment.ai_analyzer.MultiHeadDeBERTaClassifier` (keys `deberta.*` and
+`heads.level{1,2,3}.*`). Put the fold checkpoints under
+`models/MultiHead/Fold{1-5}/model.pth` and run the web app with
+SENTIMENT_MODEL_TYPE=multihead.
+"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.optim import AdamW
+from torch.utils.data import Dataset
+from tqdm import tqdm
+from sklearn.metrics import f1_score, accuracy_score
+from transformers import AutoModel, get_scheduler
+
+# -------------------- Configuration --------------------
+MODEL_NAME = 'microsoft/deberta-v3-small'
+MAX_LENGTH = 128
+EPOCHS = 3
+LEARNING_RATE = 1e-5
+PATIENCE = 2
+IGNORE_INDEX = -100
+
+HEAD_SIZES = {'level1': 3, 'level2': 3, 'level3': 4}
+SUBJECTIVE = 2   # level_1 encoding of SUBJECTIVE
+NEUTRAL = 0      # level_2 encoding of NEUTRAL
+
+
+# -------------------- Model --------------------
+class MultiHeadDeBERTa(nn.Module):
+    """DeBERTa encoder with one linear head per hierarchy level"""
+    def __init__(self, model_name=MODEL_NAME, head_sizes=HEAD_SIZES):
+        super(MultiHeadDeBERTa, self).__init__()
+        self.deberta = AutoModel.from_pretrained(model_name)
+        hidden_size = self.deberta.config.hidden_size
+        self.heads = nn.ModuleDict({
+            level: nn.Linear(hidden_size, num_classes)
+            for level, num_classes in head_sizes.items()
+        })
+
+    def forward(self, input_ids, attention_mask=None):
+        outputs = self.deberta(input_ids=input_ids, attention_mask=attention_mask)
+        # [CLS] pooling, matching MultiHeadDeBERTaClassifier.encode at serving time
+        pooled_output = outputs.last_hidden_state[:, 0]
+        return {level: head(pooled_output) for level, head in self.heads.items()}
+
+
+# -------------------- Targets --------------------
+def hierarchical_targets(df):
+    """
+    Build per-head targets from the cleaned Task-1 dataframe.
+
+    Heads that do not apply to a row get IGNORE_INDEX so they add no loss.
+    """
+    level1 = df['level_1'].astype(int).to_numpy()
+    level2 = pd.to_numeric(df['level_2'], errors='coerce').to_numpy()
+    level3 = pd.to_numeric(df['level_3'], errors='coerce').to_numpy()
+
+    has_level2 = (level1 == SUBJECTIVE) & ~np.isnan(level2)
+    has_level3 = has_level2 & (level2 == NEUTRAL) & ~np.isnan(level3)
+
+    return {
+        'level1': level1.astype(np.int64),
+        'level2': np.where(has_level2, np.nan_to_num(level2), IGNORE_INDEX).astype(np.int64),
+        'level3': np.where(has_level3, np.nan_to_num(level3), IGNORE_INDEX).astype(np.int64),
+    }
+
+
+class MultiHeadCryptoDataset(Dataset):
+    """Tokenized texts with one label per head (IGNORE_INDEX where not applicable)"""
+    def __init__(self, texts, targets, tokenizer, max_length=MAX_LENGTH):
+        self.texts = list(texts)
+        self.targets = targets
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, idx):
+        encoding = self.tokenizer(
+            str(self.texts[idx]),
+            truncation=True,
+            padding='max_length',
+            max_length=self.max_length,
+            return_tensors="pt"
+        )
+        item = {key: val.squeeze(0) for key, val in encoding.items()}
+        for level, labels in self.targets.items():
+            item[f'labels_{level}'] = torch.tensor(labels[idx], dtype=torch.long)
+        return item
+
+
+def multihead_loss(outputs, batch, head_weights=None):
+    """Sum of per-head cross entropies, ignoring rows a head does not apply to"""
+    head_weights = head_weights or {}
+    loss = 0
+    for level, logits in outputs.items():
+        labels = batch[f'labels_{level}']
+        if (labels != IGNORE_INDEX).any():
+            loss = loss + head_weights.get(level, 1.0) * F.cross_entropy(logits, labels, ignore_index=IGNORE_INDEX)
+    return loss
+
+
+def _head_f1(labels, preds):
+    labels = np.asarray(labels)
+    preds = np.asarray(preds)
+    mask = labels != IGNORE_INDEX
+    if not mask.any():
+        return 0.0, 0.0
+    return f1_score(labels[mask], preds[mask], average='weighted'), accuracy_score(labels[mask], preds[mask])
+
+
+# -------------------- Training --------------------
+def train_multihead_model(train_loader, val_loader, save_path, device, output_dir,
+                          run_name="multihead", head_weights=None):
+    """
+    Train one shared-encoder fold model and keep the checkpoint with the best
+    mean weighted F1 across the three heads.
+    """
+    os.makedirs(os.path.join(output_dir, "logs"), exist_ok=True)
+
+    model = MultiHeadDeBERTa().to(device)
+    optimizer = AdamW(model.parameters(), lr=LEARNING_RATE)
+    scheduler = get_scheduler("linear", optimizer=optimizer, num_warmup_steps=0,
+                              num_training_steps=EPOCHS * len(train_loader))
+
+    best_f1 = 0
+    patience_counter = 0
+    history = {'train_losses': [], 'val_f1s': {level: [] for level in HEAD_SIZES}, 'val_mean_f1s': []}
+
+    for epoch in range(EPOCHS):
+        model.train()
+        total_loss = 0
+        for batch in tqdm(train_loader, desc=f"[{run_name}] Epoch {epoch+1}/{EPOCHS}"):
+            batch = {k: v.to(device) for k, v in batch.items()}
+            outputs = model(batch['input_ids'], batch['attention_mask'])
+            loss = multihead_loss(outputs, batch, head_weights)
+
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            optimizer.zero_grad()
+            total_loss += loss.item()
+
+        # ===== Validation =====
+        model.eval()
+        val_preds = {level: [] for level in HEAD_SIZES}
+        val_labels = {level: [] for level in HEAD_SIZES}
+        with torch.no_grad():
+            for batch in val_loader:
+                batch = {k: v.to(device) for k, v in batch.items()}
+                outputs = model(batch['input_ids'], batch['attention_mask'])
+                for level, logits in outputs.items():
+                    val_preds[level].extend(torch.argmax(logits, dim=-1).cpu().numpy())
+                    val_labels[level].extend(batch[f'labels_{level}'].cpu().numpy())
+
+        head_f1s = {}
+        for level in HEAD_SIZES:
+            head_f1s[level], head_acc = _head_f1(val_labels[level], val_preds[level])
+            history['val_f1s'][level].append(head_f1s[level])
+            print(f" {level}: Val F1 {head_f1s[level]:.4f} | Val Acc {head_acc:.4f}")
+        mean_f1 = float(np.mean(list(head_f1s.values())))
+        history['train_losses'].append(total_loss)
+        history['val_mean_f1s'].append(mean_f1)
+        print(f" Epoch {epoch+1} | Loss: {total_loss:.4f} | Mean Val F1: {mean_f1:.4f}")
+
+        if mean_f1 > best_f1:
+            best_f1 = mean_f1
+            patience_counter = 0
+            with open(save_path, "wb") as f:
+                torch.save(model.state_dict(), f)
+        else:
+            patience_counter += 1
+            if patience_counter >= PATIENCE:
+                print(" Early stopping.")
+                break
+
+    with open(os.path.join(output_dir, "logs", f"history_{run_name}.json"), "w") as f:
+        json.dump(history, f, indent=4)
+
+    model.load_state_dict(torch.load(save_path))
+    return model
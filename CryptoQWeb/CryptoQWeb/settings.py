@@ -219,3 +219,75 @@ if not DEBUG:
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Near-duplicate reuse: texts whose SimHash similarity to a recently analyzed
+# text is above the threshold reuse its prediction instead of re-running the models
+NEAR_DUPLICATE_ENABLED = os.environ.get('NEAR_DUPLICATE_ENABLED', 'True').lower() == 'true'
+NEAR_DUPLICATE_SIMILARITY = float(os.environ.get('NEAR_DUPLICATE_SIMILARITY', '0.9'))
+NEAR_DUPLICATE_CAPACITY = int(os.environ.get('NEAR_DUPLICATE_CAPACITY', '10000'))
+
+# Write-behind buffer: queue new analyses and bulk insert them from a background
+# thread every ANALYSIS_WRITE_BUFFER_SIZE rows or ANALYSIS_WRITE_BUFFER_INTERVAL seconds;
+# beyond ANALYSIS_WRITE_BUFFER_MAX_PENDING waiting rows, analyses are written synchronously
+ANALYSIS_WRITE_BUFFER_ENABLED = os.environ.get('ANALYSIS_WRITE_BUFFER_ENABLED', 'False').lower() == 'true'
+ANALYSIS_WRITE_BUFFER_SIZE = int(os.environ.get('ANALYSIS_WRITE_BUFFER_SIZE', '100'))
+ANALYSIS_WRITE_BUFFER_INTERVAL = float(os.environ.get('ANALYSIS_WRITE_BUFFER_INTERVAL', '1.0'))
+ANALYSIS_WRITE_BUFFER_MAX_PENDING = int(os.environ.get('ANALYSIS_WRITE_BUFFER_MAX_PENDING', '10000'))
+
+# Date-partitioned Parquet archive for analyses moved out of the hot table by
+# 'manage.py archive_analyses --days N'; a history page that includes the archive
+# reads at most this many daily partitions
+ANALYSIS_ARCHIVE_DIR = os.environ.get('ANALYSIS_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+ANALYSIS_ARCHIVE_HISTORY_PARTITIONS = int(os.environ.get('ANALYSIS_ARCHIVE_HISTORY_PARTITIONS', '7'))
+
+# Fold-averaged DeBERTa pooled vectors of every analysis (float16, append-only,
+# memory-mapped), captured during inference for similarity features
+ANALYSIS_VECTOR_STORE_ENABLED = os.environ.get('ANALYSIS_VECTOR_STORE_ENABLED', 'True').lower() == 'true'
+ANALYSIS_VECTOR_DIR = os.environ.get('ANALYSIS_VECTOR_DIR', str(BASE_DIR / 'vectors'))
+
+# Approximate nearest-neighbor index over the level-1 vectors (/api/similar/<id>/):
+# lists scanned per query, and the number of not-yet-indexed vectors that triggers
+# a background compaction (0 = only 'manage.py compact_similarity_index')
+SIMILARITY_INDEX_DIR = os.environ.get('SIMILARITY_INDEX_DIR', '')
+SIMILARITY_NPROBE = int(os.environ.get('SIMILARITY_NPROBE', '16'))
+SIMILARITY_COMPACT_ROWS = int(os.environ.get('SIMILARITY_COMPACT_ROWS', '20000'))
+
+# Caches: per-process default cache, plus file caches shared by all workers for
+# token attributions (computed in the prediction pass, keyed by analysis id) and
+# dashboard data (/api/dashboard/<id>/, dropped when the analysis is edited)
+CACHE_DIR = os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache'))
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'attributions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'attributions'),
+        'TIMEOUT': int(os.environ.get('ATTRIBUTION_CACHE_TIMEOUT', str(30 * 24 * 3600))),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'dashboard'),
+        'TIMEOUT': int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', str(7 * 24 * 3600))),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+ATTRIBUTIONS_ENABLED = os.environ.get('ATTRIBUTIONS_ENABLED', 'True').lower() == 'true'
+
+# Rendered dashboard figures (/api/figures/<id>/<figure>/): per-process LRU of
+# this many figures in front of a disk cache shared by all workers ('' = memory only)
+FIGURE_CACHE_DIR = os.environ.get('FIGURE_CACHE_DIR', os.path.join(CACHE_DIR, 'figures'))
+FIGURE_CACHE_MEMORY_ITEMS = int(os.environ.get('FIGURE_CACHE_MEMORY_ITEMS', '256'))
+FIGURE_CACHE_MAX_FILES = int(os.environ.get('FIGURE_CACHE_MAX_FILES', '20000'))
+
+# Model registry: checkpoints in MODELS_DIR/<version>/, the served version named by
+# MODELS_DIR/CURRENT ('manage.py activate_model_version'); workers check it this often,
+# and retry a version that failed to load after this long (or as soon as its files change)
+MODELS_DIR = os.environ.get('MODELS_DIR', 'models')
+MODEL_VERSION_CHECK_INTERVAL = float(os.environ.get('MODEL_VERSION_CHECK_INTERVAL', '10'))
+MODEL_VERSION_RETRY_INTERVAL = float(os.environ.get('MODEL_VERSION_RETRY_INTERVAL', '300'))
+
+# Latency budget of one analysis in seconds (0 = none): under load the analyzer
+# evaluates fewer folds per level, or skips level 3, to finish within it
+ANALYSIS_DEADLINE = float(os.environ.get('ANALYSIS_DEADLINE', '30'))
@@ -1,13 +1,23 @@
 from django.contrib import admin
+from django.db.models import Q
 from .models import SentimentAnalysis
+from .search import matching_ids
 
 @admin.register(SentimentAnalysis)
 class SentimentAnalysisAdmin(admin.ModelAdmin):
     list_display = ['id', 'text_preview', 'final_classification', 'level1_prediction', 'level2_prediction', 'level3_prediction', 'created_at']
-    list_filter = ['level1_prediction', 'level2_prediction', 'level3_prediction', 'created_at']
+    list_filter = ['level1_prediction', 'level2_prediction', 'level3_prediction', 'model_version', 'created_at']
     search_fields = ['text', 'final_classification']
     readonly_fields = ['created_at']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index for the text instead of LIKE '%...%' scans when the
+        # backend has one; the class is still matched as in search_fields
+        subquery = matching_ids(search_term) if search_term else None
+        if subquery is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(Q(id__in=subquery) | Q(final_classification__icontains=search_term)), False
     
     def text_preview(self, obj):
         return obj.text[:50] + '...' if len(obj.text) > 50 else obj.text
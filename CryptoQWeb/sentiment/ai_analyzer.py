@@ -4,17 +4,27 @@ CryptoQ Sentiment Analyzer AI
 """
 
 import os
+import hashlib
 import torch
 import torch.nn as nn
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 import logging
-import re
+import copy
+import time
 from collections import Counter
 
+from .hashing_tokenizer import HashingTokenizer
+from .tokenizer_store import TOKENIZER_NAME, get_shared_tokenizer, get_shared_encoder_config
+from .attributions import attention_rollout, word_attributions
+from .degradation import LoadTracker, describe
+from .windowing import Windows, aggregate, build_windows, stitch
+from .lexicon import FALLBACK_CATEGORIES, get_lexicon
+from .first_tier import MODEL_FILE as FIRST_TIER_FILE, FirstTierModel
+
 # Try to import transformers, fallback if not available
 try:
-    from transformers import AutoTokenizer, AutoModel
+    from transformers import AutoModel
     TRANSFORMERS_AVAILABLE = True
 except (ImportError, ValueError) as e:
     TRANSFORMERS_AVAILABLE = False
@@ -103,12 +113,17 @@ class CustomDeBERTaClassifier(nn.Module):
 
 class DeBERTaClassifier(nn.Module):
     """DeBERTa-based text classifier that directly matches the saved model structure"""
-    def __init__(self, model_name="microsoft/deberta-base", num_classes=3):
+    def __init__(self, model_name=TOKENIZER_NAME, num_classes=3, config=None):
         super(DeBERTaClassifier, self).__init__()
-        if TRANSFORMERS_AVAILABLE:
-            self.deberta = AutoModel.from_pretrained(model_name)
+        if TRANSFORMERS_AVAILABLE and config is not None:
+            # Weights come from the fold checkpoint, so the architecture is built from
+            # the vendored config and the pretrained backbone is never downloaded
+            self.deberta = AutoModel.from_config(config)
             self.classifier = nn.Linear(self.deberta.config.hidden_size, num_classes)
         else:
+            if TRANSFORMERS_AVAILABLE:
+                logger.warning(f"No vendored encoder config for {model_name} (run 'manage.py vendor_tokenizer'), "
+                               f"using the custom DeBERTa architecture")
             # Use custom DeBERTa architecture directly (no nesting)
             # Create deberta module directly in this class
             self.deberta = nn.ModuleDict({
@@ -154,11 +169,26 @@ class DeBERTaClassifier(nn.Module):
             self.classifier = nn.Linear(768, num_classes)
         
     def forward(self, input_ids, attention_mask=None):
+        pooled_output = self.encode(input_ids, attention_mask)
+        logits = self.classifier(pooled_output)
+        return logits
+
+    def encode(self, input_ids, attention_mask=None, return_rollout=False):
+        """
+        Run the encoder and return the pooled sentence representation
+
+        With return_rollout, returns (pooled_output, (batch, seq) attention-rollout
+        token attributions) computed from the attention maps of the same pass.
+        """
         if TRANSFORMERS_AVAILABLE and hasattr(self, 'deberta') and hasattr(self.deberta, 'config'):
-            outputs = self.deberta(input_ids=input_ids, attention_mask=attention_mask)
-            pooled_output = outputs.pooler_output
-            logits = self.classifier(pooled_output)
-            return logits
+            outputs = self.deberta(input_ids=input_ids, attention_mask=attention_mask, output_attentions=return_rollout)
+            pooled_output = getattr(outputs, 'pooler_output', None)
+            if pooled_output is None:
+                # DeBERTa has no pooler head; fall back to the [CLS] hidden state
+                pooled_output = outputs.last_hidden_state[:, 0]
+            if return_rollout:
+                return pooled_output, attention_rollout(outputs.attentions, attention_mask, pooling='first')
+            return pooled_output
         else:
             # Use custom implementation with proper transformer processing
             batch_size = input_ids.size(0)
@@ -170,14 +200,17 @@ class DeBERTaClassifier(nn.Module):
             
             # Process through encoder layers
             hidden_states = embeddings
+            attentions = []
             for layer in self.deberta['encoder']['layer']:
                 # Self-attention
-                attention_output = self._self_attention(
+                attention_output, attention_weights = self._self_attention(
                     hidden_states, 
                     attention_mask,
                     layer['attention']['self'],
                     layer['attention']['output']
                 )
+                if return_rollout:
+                    attentions.append(attention_weights)
                 hidden_states = attention_output + hidden_states
                 
                 # Feed-forward
@@ -201,13 +234,12 @@ class DeBERTaClassifier(nn.Module):
             
             # Apply pooler
             pooled_output = torch.tanh(self.pooler['dense'](pooled_output))
-            
-            # Classifier
-            logits = self.classifier(pooled_output)
-            return logits
+            if return_rollout:
+                return pooled_output, attention_rollout(attentions, attention_mask, pooling='mean')
+            return pooled_output
     
     def _self_attention(self, hidden_states, attention_mask, self_attn, output_layer):
-        """Simplified self-attention implementation"""
+        """Simplified self-attention implementation; returns (output, attention weights)"""
         batch_size, seq_len, hidden_size = hidden_states.size()
         
         # Linear projections
@@ -242,7 +274,28 @@ class DeBERTaClassifier(nn.Module):
         output = output_layer['dense'](context)
         output = output_layer['LayerNorm'](output)
         
-        return output
+        return output, attention_weights
+
+class MultiHeadDeBERTaClassifier(DeBERTaClassifier):
+    """
+    Single DeBERTa encoder shared by the level 1, 2 and 3 classification heads.
+    Each text is encoded once and the hierarchy reads the head it needs.
+    """
+    HEAD_SIZES = {'level1': 3, 'level2': 3, 'level3': 4}
+
+    def __init__(self, model_name=TOKENIZER_NAME, config=None):
+        super(MultiHeadDeBERTaClassifier, self).__init__(model_name=model_name, num_classes=3, config=config)
+        hidden_size = self.classifier.in_features
+        # Replace the single classifier with one head per level
+        del self.classifier
+        self.heads = nn.ModuleDict({
+            level: nn.Linear(hidden_size, num_classes)
+            for level, num_classes in self.HEAD_SIZES.items()
+        })
+
+    def forward(self, input_ids, attention_mask=None):
+        pooled_output = self.encode(input_ids, attention_mask)
+        return {level: head(pooled_output) for level, head in self.heads.items()}
 
 class SimpleTextClassifier(nn.Module):
     """Simple neural network for text classification (fallback)"""
@@ -268,15 +321,61 @@ class SentimentAnalyzer:
     Level 1: NOISE, OBJECTIVE, SUBJECTIVE
     Level 2: NEUTRAL, NEGATIVE, POSITIVE (only if Level 1 = SUBJECTIVE)
     Level 3: NEUTRAL_SENTIMENT, QUESTION, ADVERTISEMENT, MISCELLANEOUS (only if Level 2 = NEUTRAL)
+
+    Two model types are supported:
+    ensemble:  separate 5-fold DeBERTa ensembles per level (Level1-3/Fold1-5)
+    multihead: one shared encoder with three heads per fold (MultiHead/Fold1-5)
+
+    In long-text mode (window > 0) texts are not truncated at 512 tokens but
+    split into overlapping windows; the windows of all texts of a call run as
+    one batch and their probabilities are averaged per text (see windowing).
+
+    When a first-tier model (FirstTier/model.npz) is installed, texts go
+    through it first and only those it answers with less than the threshold
+    confidence reach the DeBERTa models (see first_tier). Their results carry
+    no 'embeddings' or 'attributions', since no DeBERTa pass ran.
     """
+
+    MODEL_TYPES = ('ensemble', 'multihead')
     
-    def __init__(self, models_dir: str = None):
+    def __init__(self, models_dir: str = None, model_type: str = None, version: str = None,
+                 window: int = None, overlap: int = None, first_tier_threshold: float = None):
         """
         Initialize the sentiment analyzer with model paths
         
         Args:
             models_dir: Directory containing the .pth model files
+            model_type: 'ensemble' or 'multihead' (defaults to SENTIMENT_MODEL_TYPE env var)
+            version: Model registry version; the checkpoints are read from
+                models_dir/<version>/ (the tokenizer still from models_dir)
+            window: Long-text mode window in tokens, special tokens included
+                (defaults to SENTIMENT_LONG_TEXT_WINDOW env var; 0 = truncate at 512)
+            overlap: Tokens shared by consecutive windows (defaults to
+                SENTIMENT_LONG_TEXT_OVERLAP env var, or 32)
+            first_tier_threshold: Confidence from which a first-tier answer skips the
+                ensemble (defaults to SENTIMENT_FIRST_TIER_THRESHOLD env var, or the
+                threshold stored with the first-tier model; 1 = always escalate)
         """
+        if model_type is None:
+            model_type = os.environ.get('SENTIMENT_MODEL_TYPE', 'ensemble')
+        if model_type not in self.MODEL_TYPES:
+            raise ValueError(f"Unknown model type '{model_type}', expected one of {self.MODEL_TYPES}")
+        self.model_type = model_type
+
+        if window is None:
+            window = int(os.environ.get('SENTIMENT_LONG_TEXT_WINDOW', '0'))
+        if overlap is None:
+            overlap = int(os.environ.get('SENTIMENT_LONG_TEXT_OVERLAP', '32'))
+        # Two slots of every window hold [CLS] and [SEP]
+        if window and not 0 <= overlap < window - 2:
+            raise ValueError(f"Overlap must be between 0 and {window - 3} for a window of {window} tokens")
+        self.window = window
+        self.overlap = overlap
+
+        if first_tier_threshold is None and os.environ.get('SENTIMENT_FIRST_TIER_THRESHOLD'):
+            first_tier_threshold = float(os.environ['SENTIMENT_FIRST_TIER_THRESHOLD'])
+        self.first_tier_threshold = first_tier_threshold
+
         # Set default models directory to the correct path
         if models_dir is None:
             # Get the parent directory of the sentiment app
@@ -284,94 +383,133 @@ class SentimentAnalyzer:
             models_dir = os.path.join(os.path.dirname(current_dir), 'models')
         
         self.models_dir = models_dir
+        self.version = version
+        self.checkpoints_dir = os.path.join(models_dir, version) if version else models_dir
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         
         # Build model paths supporting both flat and nested layouts
-        self.model_paths = self._discover_model_paths(models_dir)
+        self.model_paths = self._discover_model_paths(self.checkpoints_dir)
         
         # Initialize models attribute
         self.models = None
+        self.first_tier = None
+        self._model_version = None
+
+        # Requests in flight and per-fold latency, used to fit analyses to their deadline
+        self.load = LoadTracker()
+
+        # Class mappings
+        self.level1_classes = ['NOISE', 'OBJECTIVE', 'SUBJECTIVE']
+        self.level2_classes = ['NEUTRAL', 'NEGATIVE', 'POSITIVE']
+        self.level3_classes = ['NEUTRAL_SENTIMENT', 'QUESTION', 'ADVERTISEMENT', 'MISCELLANEOUS']
+
+        # Vendored fast tokenizer and encoder config, read from disk once per process
+        # and shared by all analyzer instances (never fetched over the network)
+        if TRANSFORMERS_AVAILABLE:
+            self.tokenizer = get_shared_tokenizer(models_dir)
+            self.encoder_config = get_shared_encoder_config(models_dir)
+        else:
+            self.tokenizer = None
+            self.encoder_config = None
+
+        # Deterministic tokenizer used when the DeBERTa tokenizer is unavailable
+        self.fallback_tokenizer = HashingTokenizer(max_length=100)
 
     def _ensure_models_loaded(self):
         """Ensure models are loaded before use"""
         if self.models is None:
+            self.first_tier = self._load_first_tier()
             self.models = self._load_models()
 
     def _discover_model_paths(self, models_dir: str) -> Dict[str, List[str]]:
         """Discover model files in both legacy flat layout and new nested Level/Fold layout."""
-        def nested(level: int) -> List[str]:
+        def nested(name: str) -> List[str]:
             paths: List[str] = []
-            level_dir = os.path.join(models_dir, f"Level{level}")
+            level_dir = os.path.join(models_dir, name)
             for fold in range(1, 6):
                 candidate = os.path.join(level_dir, f"Fold{fold}", "model.pth")
                 if os.path.exists(candidate):
                     paths.append(candidate)
             return paths
 
-        def flat(level: int) -> List[str]:
+        def flat(prefix: str) -> List[str]:
             return [
-                p for p in [os.path.join(models_dir, f"level{level}_fold{i}.pth") for i in range(1, 6)]
+                p for p in [os.path.join(models_dir, f"{prefix}_fold{i}.pth") for i in range(1, 6)]
                 if os.path.exists(p)
             ]
 
-        paths_level1 = nested(1) or flat(1)
-        paths_level2 = nested(2) or flat(2)
-        paths_level3 = nested(3) or flat(3)
+        paths_level1 = nested("Level1") or flat("level1")
+        paths_level2 = nested("Level2") or flat("level2")
+        paths_level3 = nested("Level3") or flat("level3")
+        paths_multihead = nested("MultiHead") or flat("multihead")
+        first_tier = os.path.join(models_dir, FIRST_TIER_FILE)
 
         return {
             'level1': paths_level1,
             'level2': paths_level2,
             'level3': paths_level3,
+            'multihead': paths_multihead,
+            'first_tier': [first_tier] if os.path.exists(first_tier) else [],
         }
-        
-        # Class mappings
-        self.level1_classes = ['NOISE', 'OBJECTIVE', 'SUBJECTIVE']
-        self.level2_classes = ['NEUTRAL', 'NEGATIVE', 'POSITIVE']
-        self.level3_classes = ['NEUTRAL_SENTIMENT', 'QUESTION', 'ADVERTISEMENT', 'MISCELLANEOUS']
-        
-        # Initialize tokenizer if transformers available
-        if TRANSFORMERS_AVAILABLE:
-            try:
-                self.tokenizer = AutoTokenizer.from_pretrained("microsoft/deberta-base")
-                logger.info("✓ DeBERTa tokenizer loaded successfully")
-            except Exception as e:
-                logger.error(f"Error loading tokenizer: {e}")
-                self.tokenizer = None
-        else:
-            self.tokenizer = None
-            # Fallback vocabulary for text preprocessing
-            self.vocab = self._build_vocab()
-        
-        # Load models
-        self.models = self._load_models()
     
-    def _build_vocab(self):
-        """Build a simple vocabulary for text preprocessing"""
-        # Common words for sentiment analysis
-        common_words = [
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
-            'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did',
-            'will', 'would', 'could', 'should', 'may', 'might', 'can', 'must', 'shall',
-            'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them',
-            'this', 'that', 'these', 'those', 'my', 'your', 'his', 'her', 'its', 'our', 'their',
-            'good', 'bad', 'great', 'terrible', 'amazing', 'awful', 'love', 'hate', 'like', 'dislike',
-            'happy', 'sad', 'angry', 'excited', 'disappointed', 'positive', 'negative', 'neutral',
-            'bitcoin', 'crypto', 'cryptocurrency', 'price', 'market', 'trading', 'investment',
-            'what', 'how', 'when', 'where', 'why', 'who', 'which', 'question', 'advertisement', 'ad'
-        ]
-        
-        # Create vocabulary with word to index mapping
-        vocab = {'<PAD>': 0, '<UNK>': 1}
-        for i, word in enumerate(common_words, 2):
-            vocab[word] = i
-        
-        return vocab
-        
+    def model_version(self) -> str:
+        """
+        Registry version of the checkpoints in use
+
+        Unversioned layouts (checkpoints directly in models_dir) get a short
+        fingerprint of the model files (paths, sizes, mtimes); 'fallback' when
+        no models are available.
+        """
+        if self.version:
+            return self.version
+        if self._model_version is None:
+            files = []
+            for level in sorted(self.model_paths):
+                for path in self.model_paths[level]:
+                    stat = os.stat(path)
+                    files.append(f"{os.path.relpath(path, self.checkpoints_dir)}:{stat.st_size}:{int(stat.st_mtime)}")
+            if files:
+                digest = hashlib.sha1('\n'.join([self.model_type] + files).encode('utf-8'))
+                self._model_version = digest.hexdigest()[:12]
+            else:
+                self._model_version = 'fallback'
+        return self._model_version
+    
+    def warm_up(self) -> bool:
+        """
+        Load the weights and run every fold once, so no request pays for it
+
+        Returns False when no models could be loaded.
+        """
+        self._ensure_models_loaded()
+        if not any(self.models.values()):
+            return False
+        input_ids, attention_mask = self._preprocess_text("warm up")
+        for level, models in self.models.items():
+            started = time.perf_counter()
+            if level == 'multihead':
+                self._multihead_predict(models, input_ids, attention_mask)
+            else:
+                self._ensemble_predict(models, input_ids, attention_mask)
+            self.load.record(level, len(models), time.perf_counter() - started)
+        logger.info(f"✓ Models {self.model_version()} warmed up")
+        return True
+    
+    def release(self):
+        """Drop the loaded weights (a retired registry version)"""
+        self.models = None
+        self.first_tier = None
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    
     def _load_models(self) -> Dict[str, List[nn.Module]]:
         """Load all pre-trained models"""
         models = {'level1': [], 'level2': [], 'level3': []}
         
-        logger.info(f"Loading models from directory: {self.models_dir}")
+        logger.info(f"Loading models from directory: {self.checkpoints_dir}")
+
+        if self.model_type == 'multihead':
+            return self._load_multihead_models()
         
         for level in ['level1', 'level2', 'level3']:
             logger.info(f"Loading {level} models...")
@@ -381,11 +519,11 @@ class SentimentAnalyzer:
                         # Create model instance - always use DeBERTaClassifier
                         # It will use custom architecture when transformers is not available
                         if level == 'level1':
-                            model = DeBERTaClassifier(num_classes=3)
+                            model = DeBERTaClassifier(num_classes=3, config=self.encoder_config)
                         elif level == 'level2':
-                            model = DeBERTaClassifier(num_classes=3)
+                            model = DeBERTaClassifier(num_classes=3, config=self.encoder_config)
                         else:  # level3
-                            model = DeBERTaClassifier(num_classes=4)
+                            model = DeBERTaClassifier(num_classes=4, config=self.encoder_config)
                         
                         # Load state dictionary
                         state_dict = torch.load(model_path, map_location=self.device)
@@ -405,6 +543,61 @@ class SentimentAnalyzer:
             logger.info(f"{level}: {len(models[level])}/5 models loaded")
         
         return models
+
+    def _load_first_tier(self) -> Optional[FirstTierModel]:
+        """Load the first-tier linear model, if one is installed"""
+        for model_path in self.model_paths['first_tier']:
+            try:
+                model = FirstTierModel.load(model_path)
+                threshold = self.first_tier_threshold if self.first_tier_threshold is not None else model.threshold
+                logger.info(f"✓ Loaded first tier from {model_path} (threshold {threshold:.2f})")
+                return model
+            except Exception as e:
+                logger.error(f"✗ Error loading {model_path}: {e}")
+        return None
+
+    def _first_tier_pass(self, texts: List[str]) -> List[Optional[Dict]]:
+        """
+        First-tier results of each text, None when no first tier is in use
+
+        results['first_tier'] holds {'accepted', 'confidence'}; accepted results
+        are final, the others are only kept for that annotation.
+        """
+        model = self.first_tier
+        threshold = self.first_tier_threshold
+        if model is None or not texts:
+            return [None] * len(texts)
+        if threshold is None:
+            threshold = model.threshold
+        if threshold >= 1:
+            return [None] * len(texts)
+        _, decoded = model.confidences(texts)
+        for results in decoded:
+            results['first_tier']['accepted'] = results['first_tier']['confidence'] >= threshold
+        accepted = sum(results['first_tier']['accepted'] for results in decoded)
+        logger.info(f"First tier: {accepted}/{len(texts)} answered, {len(texts) - accepted} escalated")
+        return decoded
+
+    def _load_multihead_models(self) -> Dict[str, List[nn.Module]]:
+        """Load the shared-encoder multi-head fold models"""
+        models = {'multihead': []}
+
+        logger.info("Loading multihead models...")
+        for model_path in self.model_paths['multihead']:
+            try:
+                model = MultiHeadDeBERTaClassifier(config=self.encoder_config)
+                state_dict = torch.load(model_path, map_location=self.device)
+                model.load_state_dict(state_dict)
+                model.eval()
+                model.to(self.device)
+
+                models['multihead'].append(model)
+                logger.info(f"✓ Loaded multihead model from {model_path}")
+            except Exception as e:
+                logger.error(f"✗ Error loading {model_path}: {e}")
+
+        logger.info(f"multihead: {len(models['multihead'])}/5 models loaded")
+        return models
     
     def _preprocess_text(self, text: str) -> Tuple[torch.Tensor, torch.Tensor]:
         """
@@ -412,15 +605,22 @@ class SentimentAnalyzer:
         """
         if not text or not text.strip():
             return None, None
-            
+        return self._preprocess_texts([text.strip()])
+
+    def _preprocess_texts(self, texts: List[str]) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Encode a batch of texts in one call.
+
+        The fast tokenizer encodes the batch on its parallel Rust path and pads to the
+        longest text (attention masks make this equivalent to padding to 512).
+        """
         if self.tokenizer is not None:
             # Use DeBERTa tokenizer
             try:
-                # Tokenize text
                 encoded = self.tokenizer(
-                    text.strip(),
+                    texts,
                     max_length=512,
-                    padding='max_length',
+                    padding=True,
                     truncation=True,
                     return_tensors='pt'
                 )
@@ -429,41 +629,30 @@ class SentimentAnalyzer:
                 logger.error(f"Error tokenizing text: {e}")
                 return None, None
         else:
-            # Fallback: improved tokenization that's more compatible with DeBERTa
-            import re
-            
-            text = text.strip().lower()
-            
-            # Simple tokenization (split by spaces and punctuation)
-            words = re.findall(r'\b\w+\b', text)
-            
-            # Convert words to indices using a more realistic vocabulary mapping
-            # This maps common words to indices that are more likely to be in the DeBERTa vocabulary
-            word_indices = []
-            for word in words:
-                # Use a hash-based approach to map words to indices in the DeBERTa vocabulary range
-                # This is a simplified approach - ideally we'd have the actual DeBERTa vocabulary
-                word_hash = hash(word) % 50000  # Map to a reasonable range within the 128k vocab
-                word_indices.append(word_hash + 1000)  # Offset to avoid special tokens
-            
-            # Pad or truncate to fixed length (100 tokens max)
-            max_length = 100
-            pad_token_id = 0  # Use 0 as padding token (common in DeBERTa)
-            
-            if len(word_indices) < max_length:
-                word_indices.extend([pad_token_id] * (max_length - len(word_indices)))
-                attention_mask = [1] * len(words) + [0] * (max_length - len(words))
-            else:
-                word_indices = word_indices[:max_length]
-                attention_mask = [1] * max_length
-            
-            # Convert to tensors
-            input_ids = torch.tensor(word_indices, dtype=torch.long).unsqueeze(0)
-            attention_mask = torch.tensor(attention_mask, dtype=torch.long).unsqueeze(0)
-            
-            return input_ids, attention_mask
+            # Fallback: deterministic hashed word ids (stable across workers and restarts)
+            encoded = self.fallback_tokenizer(texts, max_length=100)
+            return encoded['input_ids'], encoded['attention_mask']
     
-    def _ensemble_predict(self, models: List[nn.Module], input_ids: torch.Tensor, attention_mask: torch.Tensor = None) -> Tuple[int, float, List[float]]:
+    def _preprocess_windows(self, texts: List[str]) -> Optional[Windows]:
+        """
+        Untruncated token ids of a batch of texts, split into overlapping windows
+
+        DeBERTa windows are wrapped in [CLS] ... [SEP]; the hashing fallback
+        has no special tokens.
+        """
+        if self.tokenizer is not None:
+            try:
+                sequences = self.tokenizer(texts, add_special_tokens=False, verbose=False)['input_ids']
+            except Exception as e:
+                logger.error(f"Error tokenizing text: {e}")
+                return None
+            return build_windows(sequences, self.window, self.overlap, pad_token_id=self.tokenizer.pad_token_id,
+                                 cls_token_id=self.tokenizer.cls_token_id, sep_token_id=self.tokenizer.sep_token_id)
+        return build_windows(self.fallback_tokenizer.token_ids(texts), self.window, self.overlap,
+                             pad_token_id=self.fallback_tokenizer.pad_token_id)
+
+    def _ensemble_predict(self, models: List[nn.Module], input_ids: torch.Tensor, attention_mask: torch.Tensor = None,
+                          capture: Optional[Dict] = None) -> Tuple[int, float, List[float]]:
         """
         Make ensemble prediction across multiple models (5-fold ensemble)
         
@@ -471,6 +660,9 @@ class SentimentAnalyzer:
             models: List of trained models (should be 5 models for 5-fold ensemble)
             input_ids: Preprocessed input IDs tensor
             attention_mask: Attention mask tensor (for DeBERTa models)
+            capture: Optional dict whose keys request by-products of the same pass;
+                'embedding' is set to the fold-averaged pooled vector and
+                'attributions' to the fold-averaged attention rollout (None if no fold ran)
             
         Returns:
             Tuple of (predicted_class_index, confidence_score, probability_distribution)
@@ -484,12 +676,15 @@ class SentimentAnalyzer:
         predictions = []
         confidences = []
         all_probabilities = []
+        pooled_outputs, rollouts = self._capture_lists(capture)
         
         with torch.no_grad():
             for i, model in enumerate(models):
                 try:
-                    # All models are now DeBERTaClassifier instances
-                    output = model(input_ids, attention_mask)
+                    # All models are now DeBERTaClassifier instances; keep the pooled
+                    # vector of the same pass instead of calling model() and discarding it
+                    pooled_output = self._encode(model, input_ids, attention_mask, pooled_outputs, rollouts)
+                    output = model.classifier(pooled_output)
                     
                     # Get probabilities
                     probabilities = torch.softmax(output, dim=1)
@@ -504,6 +699,7 @@ class SentimentAnalyzer:
                     logger.error(f"Error in model {i+1} prediction: {e}")
                     continue
         
+        self._fill_capture(capture, pooled_outputs, rollouts)
         if not predictions:
             logger.warning("No successful predictions from any model")
             return 0, 0.0, [1.0, 0.0, 0.0]  # NOISE class index with default probabilities
@@ -511,8 +707,8 @@ class SentimentAnalyzer:
         # Ensemble averaging - average probabilities across all models
         if all_probabilities:
             avg_probabilities = np.mean(all_probabilities, axis=0)
-            predicted_class = np.argmax(avg_probabilities)
-            avg_confidence = np.max(avg_probabilities)
+            predicted_class = int(np.argmax(avg_probabilities))
+            avg_confidence = float(np.max(avg_probabilities))
             
             logger.info(f"Ensemble prediction: class {predicted_class}, confidence {avg_confidence:.3f}")
             logger.info(f"Individual predictions: {predictions}")
@@ -531,17 +727,189 @@ class SentimentAnalyzer:
             prob_dist = [0.0] * num_classes
             prob_dist[most_common_pred] = avg_confidence
             return most_common_pred, avg_confidence, prob_dist
+
+    @staticmethod
+    def _capture_lists(capture: Optional[Dict]) -> Tuple[Optional[List], Optional[List]]:
+        """Per-fold collectors for the by-products requested in capture (None = not requested)"""
+        capture = capture or {}
+        return ([] if 'embedding' in capture else None), ([] if 'attributions' in capture else None)
+
+    @staticmethod
+    def _encode(model: nn.Module, input_ids: torch.Tensor, attention_mask: torch.Tensor,
+                pooled_outputs: Optional[List], rollouts: Optional[List]) -> torch.Tensor:
+        """One encoder pass, collecting its pooled vector / attention rollout when requested"""
+        if rollouts is not None:
+            pooled_output, rollout = model.encode(input_ids, attention_mask, return_rollout=True)
+            rollouts.append(rollout.float().cpu().numpy()[0])
+        else:
+            pooled_output = model.encode(input_ids, attention_mask)
+        if pooled_outputs is not None:
+            pooled_outputs.append(pooled_output.float().cpu().numpy()[0])
+        return pooled_output
+
+    @staticmethod
+    def _fill_capture(capture: Optional[Dict], pooled_outputs: Optional[List], rollouts: Optional[List]):
+        """Average the collected per-fold by-products into capture"""
+        if pooled_outputs is not None:
+            capture['embedding'] = np.mean(pooled_outputs, axis=0).astype(np.float32) if pooled_outputs else None
+        if rollouts is not None:
+            capture['attributions'] = np.mean(rollouts, axis=0) if rollouts else None
     
-    def analyze(self, text: str) -> Dict:
+    def _multihead_predict(self, models: List[nn.Module], input_ids: torch.Tensor, attention_mask: torch.Tensor = None,
+                           capture: Optional[Dict] = None) -> Dict[str, Tuple[int, float, List[float]]]:
+        """
+        Run every multi-head fold model once and average each head across folds
+
+        Args:
+            capture: as for _ensemble_predict; the shared encoder gives one value for all heads
+
+        Returns:
+            Dictionary mapping level name to (predicted_class_index, confidence_score, probability_distribution)
+        """
+        defaults = {
+            'level1': (0, 0.0, [1.0, 0.0, 0.0]),
+            'level2': (0, 0.0, [1.0, 0.0, 0.0]),
+            'level3': (3, 0.0, [0.0, 0.0, 0.0, 1.0]),
+        }
+        if not models or input_ids is None:
+            logger.warning("No models available or invalid input")
+            return defaults
+
+        logger.info(f"Running multihead prediction with {len(models)} models")
+
+        head_probabilities = {level: [] for level in defaults}
+        pooled_outputs, rollouts = self._capture_lists(capture)
+        with torch.no_grad():
+            for i, model in enumerate(models):
+                try:
+                    pooled_output = self._encode(model, input_ids, attention_mask, pooled_outputs, rollouts)
+                    outputs = {level: head(pooled_output) for level, head in model.heads.items()}
+                    for level, logits in outputs.items():
+                        head_probabilities[level].append(torch.softmax(logits, dim=1).cpu().numpy()[0])
+                except Exception as e:
+                    logger.error(f"Error in model {i+1} prediction: {e}")
+                    continue
+        self._fill_capture(capture, pooled_outputs, rollouts)
+
+        predictions = {}
+        for level, probabilities in head_probabilities.items():
+            if not probabilities:
+                predictions[level] = defaults[level]
+                continue
+            avg_probabilities = np.mean(probabilities, axis=0)
+            predictions[level] = (
+                int(np.argmax(avg_probabilities)),
+                float(np.max(avg_probabilities)),
+                avg_probabilities.tolist(),
+            )
+            logger.info(f"Multihead {level} prediction: class {predictions[level][0]}, confidence {predictions[level][1]:.3f}")
+        return predictions
+
+    def _windowed_predict(self, models: List[nn.Module], windows: Windows, levels: Tuple[str, ...],
+                          capture: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+        """
+        Fold-averaged (n_texts, classes) probabilities per level, all windows of all texts in one pass per fold
+
+        Args:
+            levels: the level of an ensemble, or the heads to read from multihead models
+            capture: as for _ensemble_predict, but per text: 'embedding' becomes an
+                (n_texts, hidden) array and 'attributions' a list of per-token arrays
+
+        Returns:
+            {level: probabilities}; a level is missing when no fold produced it
+        """
+        input_ids = torch.from_numpy(windows.input_ids).to(self.device)
+        attention_mask = torch.from_numpy(windows.attention_mask).to(self.device)
+        logger.info(f"Running windowed prediction with {len(models)} models over {len(windows.owners)} windows "
+                    f"of {windows.n_texts} texts")
+
+        level_probabilities = {level: [] for level in levels}
+        pooled_outputs, rollouts = self._capture_lists(capture)
+        with torch.no_grad():
+            for i, model in enumerate(models):
+                try:
+                    if rollouts is not None:
+                        pooled_output, rollout = model.encode(input_ids, attention_mask, return_rollout=True)
+                    else:
+                        pooled_output, rollout = model.encode(input_ids, attention_mask), None
+                    if self.model_type == 'multihead':
+                        outputs = {level: model.heads[level](pooled_output) for level in levels}
+                    else:
+                        outputs = {levels[0]: model.classifier(pooled_output)}
+                    for level, logits in outputs.items():
+                        probabilities = torch.softmax(logits, dim=1).float().cpu().numpy()
+                        level_probabilities[level].append(aggregate(probabilities, windows))
+                    if pooled_outputs is not None:
+                        pooled_outputs.append(aggregate(pooled_output.float().cpu().numpy(), windows))
+                    if rollout is not None:
+                        rollouts.append(rollout.float().cpu().numpy())
+                except Exception as e:
+                    logger.error(f"Error in model {i+1} prediction: {e}")
+                    continue
+
+        if pooled_outputs is not None:
+            capture['embedding'] = np.mean(pooled_outputs, axis=0).astype(np.float32) if pooled_outputs else None
+        if rollouts is not None:
+            capture['attributions'] = stitch(np.mean(rollouts, axis=0), windows) if rollouts else None
+        return {level: np.mean(probabilities, axis=0) for level, probabilities in level_probabilities.items()
+                if probabilities}
+
+    def _input_pieces(self, text: str, input_ids: torch.Tensor) -> Tuple[List[str], List[str]]:
+        """(token strings aligned with input_ids[0], special tokens to skip) for attributions"""
+        if self.tokenizer is not None:
+            pieces = self.tokenizer.convert_ids_to_tokens(input_ids[0].tolist())
+            return pieces, list(self.tokenizer.all_special_tokens)
+        words = self.fallback_tokenizer.tokenize(text)[:input_ids.shape[1]]
+        return words + [''] * (input_ids.shape[1] - len(words)), ['']
+
+    def analyze(self, text: str, return_embeddings: bool = False, return_attributions: bool = False,
+                deadline: Optional[float] = None) -> Dict:
         """
         Perform hierarchical sentiment analysis
         
         Args:
             text: Input text to analyze
+            return_embeddings: Add 'embeddings' ({level: fold-averaged pooled vector}) for
+                the levels the models ran; the vectors come from the same forward pass
+            return_attributions: Add 'attributions' ({'levels': {level: [{'token', 'score'}]}}),
+                fold-averaged attention rollout of the same forward pass
+            deadline: time.monotonic() value the analysis should finish by; under load
+                fewer folds are evaluated and level 3 may be skipped (see degradation)
             
         Returns:
-            Dictionary containing analysis results
+            Dictionary containing analysis results, including the 'model_version'
+            that produced them and the 'degradation' applied to meet the deadline
         """
+        with self.load.request():
+            if self.window:
+                results = self._analyze_windowed([text], return_embeddings, return_attributions, deadline)[0]
+            else:
+                results = self._analyze(text, return_embeddings, return_attributions, deadline)
+        return self._annotate(results)
+
+    def analyze_batch(self, texts: List[str], return_embeddings: bool = False, return_attributions: bool = False,
+                      deadline: Optional[float] = None) -> List[Dict]:
+        """
+        Analyze several texts (same arguments and results as analyze, one dict per text)
+
+        In long-text mode the windows of all texts run as one batch per fold and
+        level; otherwise the texts are analyzed one after another.
+        """
+        if not self.window:
+            return [self.analyze(text, return_embeddings, return_attributions, deadline) for text in texts]
+        with self.load.request():
+            batch = self._analyze_windowed(texts, return_embeddings, return_attributions, deadline)
+        return [self._annotate(results) for results in batch]
+
+    def _annotate(self, results: Dict) -> Dict:
+        """Add the model version and (for analyses that ran no model) the degradation"""
+        results.setdefault('degradation', describe({}, {}, []))
+        models_used = self.models is not None and any(self.models.values())
+        results['model_version'] = self.model_version() if models_used else 'fallback'
+        return results
+    
+    def _analyze(self, text: str, return_embeddings: bool, return_attributions: bool,
+                 deadline: Optional[float]) -> Dict:
         if not text or not text.strip():
             return {
                 'final_classification': 'NOISE',
@@ -558,6 +926,11 @@ class SentimentAnalyzer:
         if not any(self.models.values()):
             logger.warning("No models available, using fallback analysis")
             return self._fallback_analysis(text)
+
+        # Texts the first tier is sure about never reach the ensemble
+        first_tier = self._first_tier_pass([text.strip()])[0]
+        if first_tier is not None and first_tier['first_tier']['accepted']:
+            return first_tier
         
         # Use actual models for prediction
         logger.info("Using pre-trained models for inference")
@@ -580,10 +953,56 @@ class SentimentAnalyzer:
             'confidence_scores': {},
             'probability_distributions': {}
         }
+
+        # By-products of the prediction passes, collected per level
+        requested = {}
+        if return_embeddings:
+            requested['embedding'] = None
+        if return_attributions:
+            requested['attributions'] = None
+        captured = {}
+
+        # Folds evaluated per model group, and the levels skipped, to meet the deadline
+        folds_used = {}
+        folds_available = {}
+        skipped = []
+
+        if self.model_type == 'multihead':
+            # Encode once; each level just reads its head from the shared pass
+            # (so level 3 costs nothing extra and is never skipped)
+            models = self.models['multihead']
+            folds = self.load.plan_folds('multihead', len(models), deadline)
+            folds_used['multihead'], folds_available['multihead'] = folds, len(models)
+            shared = dict(requested) if requested else None
+            started = time.perf_counter()
+            head_predictions = self._multihead_predict(models[:folds], input_ids, attention_mask, capture=shared)
+            self.load.record('multihead', folds, time.perf_counter() - started)
+
+            def predict_level(level):
+                if shared is not None:
+                    captured[level] = shared
+                return head_predictions[level]
+        else:
+            def predict_level(level):
+                """(index, confidence, probabilities), or None when level 3 does not fit the deadline"""
+                models = self.models[level]
+                # Level 1 leaves time for one fold of level 2
+                reserve = (self.load.fold_cost('level2') or 0.0) if level == 'level1' else 0.0
+                folds = self.load.plan_folds(level, len(models), deadline, required=level != 'level3', reserve=reserve)
+                if folds == 0 and models:
+                    return None
+                folds_used[level], folds_available[level] = folds, len(models)
+                capture = dict(requested) if requested else None
+                started = time.perf_counter()
+                prediction = self._ensemble_predict(models[:folds], input_ids, attention_mask, capture=capture)
+                self.load.record(level, folds, time.perf_counter() - started)
+                if capture is not None:
+                    captured[level] = capture
+                return prediction
         
         # Level 1: Always run
         try:
-            pred_idx, confidence, prob_dist = self._ensemble_predict(self.models['level1'], input_ids, attention_mask)
+            pred_idx, confidence, prob_dist = predict_level('level1')
             level1_class = self.level1_classes[pred_idx] if pred_idx < len(self.level1_classes) else 'NOISE'
             results['level1_prediction'] = level1_class
             results['confidence_scores']['level1'] = confidence
@@ -598,7 +1017,7 @@ class SentimentAnalyzer:
         # Level 2: Only if Level 1 = SUBJECTIVE
         if results['level1_prediction'] == 'SUBJECTIVE':
             try:
-                pred_idx, confidence, prob_dist = self._ensemble_predict(self.models['level2'], input_ids, attention_mask)
+                pred_idx, confidence, prob_dist = predict_level('level2')
                 level2_class = self.level2_classes[pred_idx] if pred_idx < len(self.level2_classes) else 'NEUTRAL'
                 results['level2_prediction'] = level2_class
                 results['confidence_scores']['level2'] = confidence
@@ -613,12 +1032,16 @@ class SentimentAnalyzer:
         # Level 3: Only if Level 2 = NEUTRAL
         if results['level2_prediction'] == 'NEUTRAL':
             try:
-                pred_idx, confidence, prob_dist = self._ensemble_predict(self.models['level3'], input_ids, attention_mask)
-                level3_class = self.level3_classes[pred_idx] if pred_idx < len(self.level3_classes) else 'MISCELLANEOUS'
-                results['level3_prediction'] = level3_class
-                results['confidence_scores']['level3'] = confidence
-                results['probability_distributions']['level3'] = prob_dist
-                logger.info(f"Level 3 prediction: {level3_class} (index: {pred_idx}, confidence: {confidence:.3f})")
+                prediction = predict_level('level3')
+                if prediction is None:
+                    skipped.append('level3')
+                else:
+                    pred_idx, confidence, prob_dist = prediction
+                    level3_class = self.level3_classes[pred_idx] if pred_idx < len(self.level3_classes) else 'MISCELLANEOUS'
+                    results['level3_prediction'] = level3_class
+                    results['confidence_scores']['level3'] = confidence
+                    results['probability_distributions']['level3'] = prob_dist
+                    logger.info(f"Level 3 prediction: {level3_class} (index: {pred_idx}, confidence: {confidence:.3f})")
             except Exception as e:
                 logger.error(f"Error in Level 3 prediction: {e}")
                 results['level3_prediction'] = 'MISCELLANEOUS'
@@ -627,9 +1050,179 @@ class SentimentAnalyzer:
         
         # Generate final classification
         results['final_classification'] = self._generate_final_classification(results)
+        results['degradation'] = describe(folds_used, folds_available, skipped)
+        if first_tier is not None:
+            results['first_tier'] = first_tier['first_tier']
+        if results['degradation']['level']:
+            logger.warning(f"Degraded analysis ({results['degradation']['name']}): folds {folds_used}, "
+                           f"skipped {skipped or 'none'}, load {self.load.snapshot()}")
+        if return_embeddings:
+            results['embeddings'] = {level: capture['embedding'] for level, capture in captured.items()
+                                     if capture.get('embedding') is not None}
+        if return_attributions:
+            pieces, special_tokens = self._input_pieces(text, input_ids)
+            results['attributions'] = {'levels': {
+                level: word_attributions(pieces, capture['attributions'], special_tokens)
+                for level, capture in captured.items() if capture.get('attributions') is not None
+            }}
         
         return results
     
+    def _analyze_windowed(self, texts: List[str], return_embeddings: bool, return_attributions: bool,
+                          deadline: Optional[float]) -> List[Dict]:
+        """
+        Hierarchical analysis of a batch of texts in long-text mode
+
+        Each level runs once over the windows of the texts that reached it; the
+        deadline is planned for the whole batch.
+        """
+        noise = {
+            'final_classification': 'NOISE',
+            'level1_prediction': 'NOISE',
+            'level2_prediction': None,
+            'level3_prediction': None,
+            'confidence_scores': {'level1': 1.0, 'level2': 0.0, 'level3': 0.0}
+        }
+        batch = [copy.deepcopy(noise) for _ in texts]
+        selected = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not selected:
+            return batch
+
+        self._ensure_models_loaded()
+        if not any(self.models.values()):
+            logger.warning("No models available, using fallback analysis")
+            for i in selected:
+                batch[i] = self._fallback_analysis(texts[i])
+            return batch
+
+        first_tier = self._first_tier_pass([texts[i].strip() for i in selected])
+        escalated = []
+        for text_index, tier in zip(selected, first_tier):
+            if tier is not None and tier['first_tier']['accepted']:
+                batch[text_index] = tier
+            else:
+                escalated.append((text_index, tier))
+        if not escalated:
+            return batch
+        selected = [text_index for text_index, _ in escalated]
+
+        stripped = [texts[i].strip() for i in selected]
+        windows = self._preprocess_windows(stripped)
+        if windows is None:
+            return batch
+        logger.info(f"Long-text mode: {len(stripped)} texts in {len(windows.owners)} windows of {self.window} tokens")
+
+        results = [{
+            'level1_prediction': None,
+            'level2_prediction': None,
+            'level3_prediction': None,
+            'confidence_scores': {},
+            'probability_distributions': {}
+        } for _ in stripped]
+        requested = {}
+        if return_embeddings:
+            requested['embedding'] = None
+        if return_attributions:
+            requested['attributions'] = None
+        # By-products of each pass per text; a level keeps them only for the texts it classified
+        pass_captures: Dict[str, Dict[int, Dict]] = {}
+        captured = [{} for _ in stripped]
+        folds_used = {}
+        folds_available = {}
+        skipped = []
+
+        def run(levels: Tuple[str, ...], texts_in: List[int], required: bool = True,
+                reserve: float = 0.0) -> Optional[Dict[str, Dict[int, np.ndarray]]]:
+            """{level: {text: probabilities}} for texts_in, or None when the pass does not fit the deadline"""
+            group = 'multihead' if self.model_type == 'multihead' else levels[0]
+            models = self.models[group]
+            subset, rows = windows.select(texts_in)
+            folds = self.load.plan_folds(group, len(models), deadline, required=required, reserve=reserve,
+                                         units=len(rows))
+            if folds == 0 and models:
+                return None
+            folds_used[group], folds_available[group] = folds, len(models)
+            capture = dict(requested) if requested else None
+            started = time.perf_counter()
+            probabilities = self._windowed_predict(models[:folds], subset, levels, capture=capture)
+            self.load.record(group, folds, time.perf_counter() - started, units=len(rows))
+            pass_captures[group] = {text_index: {key: value[position] for key, value in (capture or {}).items()
+                                                 if value is not None}
+                                    for position, text_index in enumerate(texts_in)}
+            return {level: {text_index: level_probabilities[position]
+                            for position, text_index in enumerate(texts_in)}
+                    for level, level_probabilities in probabilities.items()}
+
+        def assign(level: str, classes: List[str], probabilities: Dict[str, Dict[int, np.ndarray]],
+                   texts_in: List[int], default: List[float]):
+            group = 'multihead' if self.model_type == 'multihead' else level
+            for text_index in texts_in:
+                capture = pass_captures.get(group, {}).get(text_index)
+                if capture:
+                    captured[text_index][level] = capture
+                prob_dist = probabilities.get(level, {}).get(text_index)
+                if prob_dist is None:
+                    # No fold produced the level: same result as a failed level in _analyze
+                    prob_dist, confidence = np.array(default), 0.0
+                else:
+                    confidence = float(np.max(prob_dist))
+                results[text_index][f'{level}_prediction'] = classes[int(np.argmax(prob_dist))]
+                results[text_index]['confidence_scores'][level] = confidence
+                results[text_index]['probability_distributions'][level] = [float(p) for p in prob_dist]
+
+        everything = list(range(len(stripped)))
+        if self.model_type == 'multihead':
+            # One pass over all windows gives every head
+            heads = run(('level1', 'level2', 'level3'), everything)
+
+            def level_pass(level, texts_in, required=True, reserve=0.0):
+                return heads
+        else:
+            def level_pass(level, texts_in, required=True, reserve=0.0):
+                return run((level,), texts_in, required, reserve)
+
+        # Level 1 leaves time for one fold of level 2 over the same windows
+        reserve = self.load.fold_cost('level2', units=len(windows.owners)) or 0.0
+        assign('level1', self.level1_classes, level_pass('level1', everything, reserve=reserve), everything,
+               [1.0, 0.0, 0.0])
+
+        subjective = [i for i in everything if results[i]['level1_prediction'] == 'SUBJECTIVE']
+        if subjective:
+            assign('level2', self.level2_classes, level_pass('level2', subjective), subjective, [1.0, 0.0, 0.0])
+
+        neutral = [i for i in subjective if results[i]['level2_prediction'] == 'NEUTRAL']
+        if neutral:
+            probabilities = level_pass('level3', neutral, required=False)
+            if probabilities is None:
+                skipped.append('level3')
+            else:
+                assign('level3', self.level3_classes, probabilities, neutral, [0.0, 0.0, 0.0, 1.0])
+
+        degradation = describe(folds_used, folds_available, skipped)
+        if degradation['level']:
+            logger.warning(f"Degraded analysis ({degradation['name']}): folds {folds_used}, "
+                           f"skipped {skipped or 'none'}, load {self.load.snapshot()}")
+        for text_index, text in enumerate(stripped):
+            text_results = results[text_index]
+            text_results['final_classification'] = self._generate_final_classification(text_results)
+            text_results['degradation'] = dict(degradation)
+            tier = escalated[text_index][1]
+            if tier is not None:
+                text_results['first_tier'] = tier['first_tier']
+            if return_embeddings:
+                text_results['embeddings'] = {level: capture['embedding']
+                                              for level, capture in captured[text_index].items()
+                                              if capture.get('embedding') is not None}
+            if return_attributions:
+                pieces = self.tokenizer.tokenize(text) if self.tokenizer is not None else (
+                    self.fallback_tokenizer.tokenize(text))
+                text_results['attributions'] = {'levels': {
+                    level: word_attributions(pieces, capture['attributions'])
+                    for level, capture in captured[text_index].items() if capture.get('attributions') is not None
+                }}
+            batch[selected[text_index]] = text_results
+        return batch
+
     def _generate_final_classification(self, results: Dict) -> str:
         """Generate human-readable final classification"""
         level1 = results['level1_prediction']
@@ -654,9 +1247,9 @@ class SentimentAnalyzer:
     def _fallback_analysis(self, text: str) -> Dict:
         """
         Fallback analysis when models are not available
-        Uses simple rule-based classification
+        Uses simple rule-based classification over the shared keyword lexicon
         """
-        text_lower = text.lower().strip()
+        lexicon = get_lexicon()
         
         # Simple rule-based classification
         if len(text) < 3:
@@ -669,15 +1262,12 @@ class SentimentAnalyzer:
             }
         
         # Check for question indicators
-        question_words = ['what', 'how', 'when', 'where', 'why', 'who', 'which', '?']
-        is_question = any(text_lower.startswith(word) for word in question_words) or '?' in text
-        
-        # Check for sentiment indicators
-        positive_words = ['good', 'great', 'excellent', 'amazing', 'love', 'like', 'happy', 'positive']
-        negative_words = ['bad', 'terrible', 'awful', 'hate', 'dislike', 'sad', 'negative', 'angry']
+        is_question = lexicon.is_question(text)
         
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
+        # Check for sentiment indicators (one scan for all keywords, each keyword counted once)
+        scores = lexicon.score(text, FALLBACK_CATEGORIES, distinct=True)
+        positive_count = scores['fallback_positive']
+        negative_count = scores['fallback_negative']
         
         # Level 1 classification
         if is_question:
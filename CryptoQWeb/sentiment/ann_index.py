@@ -0,0 +1,344 @@
+"""
+Approximate nearest-neighbor search over the stored analysis vectors.
+
+An inverted-file (IVF) index in plain NumPy, on top of the level-1 pooled
+DeBERTa vectors in the analysis vector store (see vector_store.py):
+
+- Compaction runs spherical k-means on a sample, assigns every current vector
+  to its nearest centroid, and writes the normalized vectors grouped by list
+  into one contiguous float16 file. A query scores the centroids, then only
+  the nprobe nearest lists, so it reads a few thousand rows out of millions.
+- Rows appended to the vector store after the last compaction form the
+  delta. Every process picks them up on the next query and scores them
+  exactly, so new analyses are searchable right away. Once the delta
+  outgrows SIMILARITY_COMPACT_ROWS, a background thread compacts again. A
+  file lock makes sure only one process compacts at a time.
+- Edited analyses (superseded rows) and deleted ones are skipped at query
+  time and dropped at compaction.
+
+    <SIMILARITY_INDEX_DIR>/
+        CURRENT                  name of the active build
+        build-<hex>/  manifest.json  centroids.npy  offsets.npy  ids.npy  rows.npy  vectors.npy (float16)
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .vector_store import VectorFile, get_vector_store
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: no cross-process compaction lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LEVEL = 'level1'
+CURRENT_NAME = 'CURRENT'
+CHUNK_ROWS = 65536
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+KMEANS_MAX_SAMPLE = 200000
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def default_nlist(count: int) -> int:
+    """About 4 * sqrt(N) lists, i.e. a few hundred vectors per list at a million rows"""
+    return max(1, min(count, int(4 * np.sqrt(count))))
+
+
+def _kmeans(sample: np.ndarray, nlist: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means (cosine) on normalized float32 rows"""
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = np.concatenate([np.argmax(chunk @ centroids.T, axis=1)
+                                 for chunk in np.array_split(sample, max(1, len(sample) // CHUNK_ROWS))])
+        counts = np.bincount(labels, minlength=nlist)
+        order = np.argsort(labels, kind='stable')
+        starts = np.searchsorted(labels[order], np.arange(nlist))
+        sums = np.zeros_like(centroids)
+        sums[counts > 0] = np.add.reduceat(sample[order], starts[counts > 0], axis=0)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists with random samples so no centroid is wasted
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def compact(vector_file: VectorFile, directory: str, nlist: Optional[int] = None, seed: int = 42) -> Dict:
+    """
+    Build a new IVF generation from the current vector of every existing analysis
+
+    Returns the manifest of the new build.
+    """
+    from .models import SentimentAnalysis
+
+    keys, rows = vector_file.snapshot()
+    covered = int(rows.max()) + 1 if len(rows) else 0
+    existing = np.fromiter(SentimentAnalysis.objects.values_list('id', flat=True).iterator(chunk_size=10000), dtype=np.int64)
+    keep = np.isin(keys, existing)
+    keys, rows = keys[keep], rows[keep]
+    # Read the memmap in file order
+    order = np.argsort(rows)
+    keys, rows = keys[order], rows[order]
+
+    count = len(keys)
+    nlist = min(nlist or default_nlist(count), max(count, 1))
+    rng = np.random.default_rng(seed)
+    source = vector_file.vectors
+
+    build_name = f"build-{uuid.uuid4().hex[:12]}"
+    build_dir = os.path.join(directory, build_name)
+    os.makedirs(build_dir)
+
+    if count:
+        sample_rows = np.sort(rng.choice(rows, min(count, nlist * KMEANS_SAMPLE_PER_LIST, KMEANS_MAX_SAMPLE), replace=False))
+        centroids = _kmeans(_normalize(source[sample_rows]), nlist, rng)
+        labels = np.empty(count, dtype=np.int64)
+        for start in range(0, count, CHUNK_ROWS):
+            chunk = _normalize(source[rows[start:start + CHUNK_ROWS]])
+            labels[start:start + CHUNK_ROWS] = np.argmax(chunk @ centroids.T, axis=1)
+        by_list = np.argsort(labels, kind='stable')
+        offsets = np.searchsorted(labels[by_list], np.arange(nlist + 1))
+
+        vectors = np.lib.format.open_memmap(os.path.join(build_dir, 'vectors.npy'), mode='w+',
+                                            dtype=np.float16, shape=(count, vector_file.dim))
+        for start in range(0, count, CHUNK_ROWS):
+            selected = by_list[start:start + CHUNK_ROWS]
+            vectors[start:start + len(selected)] = _normalize(source[rows[selected]]).astype(np.float16)
+        vectors.flush()
+        del vectors
+        keys, rows = keys[by_list], rows[by_list]
+    else:
+        centroids = np.zeros((0, vector_file.dim), dtype=np.float32)
+        offsets = np.zeros(1, dtype=np.int64)
+        np.save(os.path.join(build_dir, 'vectors.npy'), np.zeros((0, vector_file.dim), dtype=np.float16))
+
+    np.save(os.path.join(build_dir, 'centroids.npy'), centroids.astype(np.float32))
+    np.save(os.path.join(build_dir, 'offsets.npy'), offsets.astype(np.int64))
+    np.save(os.path.join(build_dir, 'ids.npy'), keys.astype(np.int64))
+    np.save(os.path.join(build_dir, 'rows.npy'), rows.astype(np.int64))
+    manifest = {'count': count, 'nlist': int(len(centroids)), 'covered_rows': covered,
+                'dim': vector_file.dim, 'built_at': time.time()}
+    with open(os.path.join(build_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    # Switch readers over atomically, then drop older builds (open memmaps stay valid)
+    current_path = os.path.join(directory, CURRENT_NAME)
+    with open(current_path + '.tmp', 'w') as f:
+        f.write(build_name)
+    os.replace(current_path + '.tmp', current_path)
+    for name in os.listdir(directory):
+        if name.startswith('build-') and name != build_name:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    logger.info(f"✓ Similarity index compacted: {count} vectors in {manifest['nlist']} lists ({build_dir})")
+    return manifest
+
+
+class IVFBuild:
+    """One compacted, read-only index generation"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.centroids = np.load(os.path.join(directory, 'centroids.npy'))
+        self.offsets = np.load(os.path.join(directory, 'offsets.npy'))
+        self.ids = np.load(os.path.join(directory, 'ids.npy'), mmap_mode='r')
+        self.rows = np.load(os.path.join(directory, 'rows.npy'), mmap_mode='r')
+        self.vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode='r')
+
+    def probe(self, query: np.ndarray, nprobe: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ids, rows, cosine similarities) of the vectors in the nprobe closest lists"""
+        if not len(self.centroids):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        ids, rows, scores = [], [], []
+        for lst in lists:
+            start, end = int(self.offsets[lst]), int(self.offsets[lst + 1])
+            if start == end:
+                continue
+            ids.append(np.asarray(self.ids[start:end]))
+            rows.append(np.asarray(self.rows[start:end]))
+            scores.append(self.vectors[start:end].astype(np.float32) @ query)
+        if not ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(ids), np.concatenate(rows), np.concatenate(scores)
+
+
+class SimilarityIndex:
+    """
+    Compacted IVF build plus an exactly scored delta of newer vectors
+
+    Args:
+        vector_file: the vector store file being indexed
+        directory: where builds and CURRENT live
+        nprobe: lists scanned per query
+        compact_rows: delta size that triggers a background compaction (0 disables it)
+    """
+
+    def __init__(self, vector_file: VectorFile, directory: str, nprobe: int = 16, compact_rows: int = 20000):
+        self.vector_file = vector_file
+        self.directory = directory
+        self.nprobe = nprobe
+        self.compact_rows = compact_rows
+        os.makedirs(directory, exist_ok=True)
+        self.build: Optional[IVFBuild] = None
+        self._build_name = None
+        self._delta_start = 0
+        self._delta_ids = np.zeros(0, dtype=np.int64)
+        self._delta_rows = np.zeros(0, dtype=np.int64)
+        self._delta_vectors = np.zeros((0, vector_file.dim), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._compacting = False
+
+    def _catch_up(self):
+        """Reload a newer build and append vector-store rows beyond it to the delta"""
+        current_path = os.path.join(self.directory, CURRENT_NAME)
+        name = open(current_path).read().strip() if os.path.exists(current_path) else None
+        if name != self._build_name:
+            try:
+                self.build = IVFBuild(os.path.join(self.directory, name)) if name else None
+            except FileNotFoundError:
+                # Replaced again while we were loading; keep the old build until the next query
+                return
+            self._build_name = name
+            self._delta_start = self.build.manifest['covered_rows'] if self.build else 0
+            self._delta_ids = np.zeros(0, dtype=np.int64)
+            self._delta_rows = np.zeros(0, dtype=np.int64)
+            self._delta_vectors = np.zeros((0, self.vector_file.dim), dtype=np.float32)
+
+        start = self._delta_start + len(self._delta_ids)
+        keys, vectors = self.vector_file.read_rows(start)
+        if len(keys):
+            self._delta_ids = np.concatenate([self._delta_ids, keys])
+            self._delta_rows = np.concatenate([self._delta_rows, np.arange(start, start + len(keys), dtype=np.int64)])
+            self._delta_vectors = np.concatenate([self._delta_vectors, _normalize(vectors)])
+
+    def _maybe_compact(self):
+        if not self.compact_rows or self._compacting or len(self._delta_ids) < self.compact_rows:
+            return
+        self._compacting = True
+        threading.Thread(target=self._compact_in_background, name='similarity-compaction', daemon=True).start()
+
+    def _compact_in_background(self):
+        from django.db import connection
+
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"✗ Similarity index compaction failed: {e}")
+        finally:
+            self._compacting = False
+            connection.close()
+
+    def compact(self, nlist: Optional[int] = None) -> Optional[Dict]:
+        """Compact unless another process is already doing it (returns the new manifest or None)"""
+        with open(os.path.join(self.directory, '.compact.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.info("Similarity index compaction already running elsewhere")
+                    return None
+            return compact(self.vector_file, self.directory, nlist)
+
+    def search(self, analysis_id: int, limit: int, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        (analysis_id, cosine similarity) candidates closest to an analysis, best first
+
+        Superseded vectors and the analysis itself are skipped; whether the
+        candidates still exist is checked by the caller.
+        """
+        found = self.vector_file.lookup([analysis_id])
+        if analysis_id not in found:
+            return []
+        query = _normalize(found[analysis_id])
+
+        with self._lock:
+            self._catch_up()
+            self._maybe_compact()
+            build, delta_ids, delta_rows, delta_vectors = self.build, self._delta_ids, self._delta_rows, self._delta_vectors
+
+        if build is not None:
+            ids, rows, scores = build.probe(query, nprobe or self.nprobe)
+        else:
+            ids, rows, scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if len(delta_ids):
+            ids = np.concatenate([ids, delta_ids])
+            rows = np.concatenate([rows, delta_rows])
+            scores = np.concatenate([scores, delta_vectors @ query])
+
+        results = []
+        seen = {analysis_id}
+        order = np.argsort(-scores, kind='stable')
+        for start in range(0, len(order), max(limit * 2, 64)):
+            chunk = order[start:start + max(limit * 2, 64)]
+            latest = self.vector_file.latest_rows([int(i) for i in ids[chunk]])
+            for position in chunk:
+                candidate = int(ids[position])
+                if candidate in seen or latest.get(candidate) != int(rows[position]):
+                    continue
+                seen.add(candidate)
+                results.append((candidate, float(scores[position])))
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+def similarity_index_dir() -> str:
+    return settings.SIMILARITY_INDEX_DIR or os.path.join(settings.ANALYSIS_VECTOR_DIR, 'ivf', LEVEL)
+
+
+def get_similarity_index() -> Optional[SimilarityIndex]:
+    """Process-wide similarity index (None while the vector store is disabled or empty)"""
+    store = get_vector_store()
+    if store is None:
+        return None
+    vector_file = store.file(LEVEL)
+    if vector_file is None:
+        return None
+    directory = similarity_index_dir()
+    with _indexes_lock:
+        if directory not in _indexes:
+            _indexes[directory] = SimilarityIndex(vector_file, directory, nprobe=settings.SIMILARITY_NPROBE,
+                                                  compact_rows=settings.SIMILARITY_COMPACT_ROWS)
+        return _indexes[directory]
+
+
+def similar_analyses(analysis_id: int, k: int = 10, nprobe: Optional[int] = None):
+    """Top-k existing analyses most similar to one analysis (history rows with a `similarity` attribute)"""
+    from .pagination import history_queryset
+
+    index = get_similarity_index()
+    if index is None:
+        return []
+    candidates = index.search(analysis_id, k * 4 + 10, nprobe)
+    rows = history_queryset().in_bulk([candidate for candidate, _ in candidates])
+    results = []
+    for candidate, similarity in candidates:
+        if candidate in rows:
+            rows[candidate].similarity = similarity
+            results.append(rows[candidate])
+            if len(results) >= k:
+                break
+    return results
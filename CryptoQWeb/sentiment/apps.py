@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_fulltext(using, **kwargs):
+    # SQLite rebuilds the table on some schema changes, which drops the FTS triggers
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from .search import install_fulltext
+
+    connection = connections[using]
+    if ('sentiment', '0007_fulltext_index') in MigrationRecorder(connection).applied_migrations():
+        install_fulltext(connection)
 
 
 class SentimentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sentiment'
+
+    def ready(self):
+        post_migrate.connect(ensure_fulltext, sender=self)
@@ -0,0 +1,282 @@
+"""
+Archive of old analyses in date-partitioned, zstd-compressed Parquet files.
+
+    <ANALYSIS_ARCHIVE_DIR>/date=YYYY-MM-DD/part-<hex>.parquet
+
+archive_older_than() writes every UTC day older than the cutoff to its own
+partition (same columns as the Parquet export) and then deletes those rows
+from the hot SentimentAnalysis table. Rows that a near-duplicate staying in
+the hot table points to (duplicate_of) are kept in the hot table, so deleting
+them never nulls a live reference.
+
+Rollup counts are left untouched: /api/stats/ keeps counting archived rows,
+so it keeps covering archived days, and rollups.rebuild() adds the archived
+partitions back in. The pooled vectors, cached token attributions and
+memoized dashboard data of archived rows are discarded. Every run that archived rows touches the LAST_RUN
+file in the archive directory; workers compare it to drop archived analyses
+from their in-process near-duplicate index (views.get_near_duplicate_index).
+
+The history only reads the archive when asked to (see pagination.history_page),
+and at most ANALYSIS_ARCHIVE_HISTORY_PARTITIONS partitions per request.
+"""
+
+import logging
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from . import export
+from .models import SentimentAnalysis
+from .vector_store import get_vector_store
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = 'date='
+COMPRESSION = 'zstd'
+LAST_RUN_NAME = 'LAST_RUN'
+
+
+def archive_dir() -> str:
+    return settings.ANALYSIS_ARCHIVE_DIR
+
+
+def partition_dir(day: date, root: Optional[str] = None) -> str:
+    return os.path.join(root or archive_dir(), f"{PARTITION_PREFIX}{day.isoformat()}")
+
+
+def partition_days(root: Optional[str] = None) -> List[date]:
+    """Archived days, newest first"""
+    root = root or archive_dir()
+    if not os.path.isdir(root):
+        return []
+    days = []
+    for name in os.listdir(root):
+        if name.startswith(PARTITION_PREFIX):
+            try:
+                days.append(date.fromisoformat(name[len(PARTITION_PREFIX):]))
+            except ValueError:
+                continue
+    return sorted(days, reverse=True)
+
+
+def _partition_files(day: date, root: Optional[str] = None) -> List[str]:
+    path = partition_dir(day, root)
+    return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.parquet'))
+
+
+def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def last_run(root: Optional[str] = None) -> Optional[int]:
+    """mtime (ns) of the last archiving run that removed rows, None if there was none"""
+    try:
+        return os.stat(os.path.join(root or archive_dir(), LAST_RUN_NAME)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _mark_run(root: str, cutoff: datetime):
+    path = os.path.join(root, LAST_RUN_NAME)
+    with open(path + '.tmp', 'w') as f:
+        f.write(cutoff.isoformat())
+    os.replace(path + '.tmp', path)
+
+
+def _forget(analysis_ids: List[int]):
+    """Drop archived analyses from the stores and caches keyed by analysis id"""
+    # Imported here: attributions needs torch, the rest of the archive does not
+    from .attributions import discard_attributions
+    from .dashboard import invalidate_dashboard
+
+    store = get_vector_store()
+    if store is not None:
+        store.discard(analysis_ids)
+    for analysis_id in analysis_ids:
+        discard_attributions(analysis_id)
+        invalidate_dashboard(analysis_id)
+
+
+def _referenced_ids(day_queryset, cutoff: datetime, kept: Set[int]) -> Set[int]:
+    """
+    Ids of the day's rows that rows staying in the hot table point to
+
+    Rows stay when they are newer than the cutoff or were kept for the same
+    reason on a newer day; within the day a kept near-duplicate keeps its own
+    original too.
+    """
+    referenced = set(SentimentAnalysis.objects
+                     .filter(duplicate_of__in=day_queryset)
+                     .filter(Q(created_at__gte=cutoff) | Q(id__in=kept))
+                     .values_list('duplicate_of_id', flat=True))
+    links = dict(day_queryset.filter(duplicate_of__isnull=False).values_list('id', 'duplicate_of_id'))
+    pending = list(referenced)
+    while pending:
+        original = links.get(pending.pop())
+        if original is not None and original not in referenced:
+            referenced.add(original)
+            pending.append(original)
+    return referenced
+
+
+def archive_older_than(days: int, root: Optional[str] = None, batch_size: int = 1000, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Move analyses created before the start of (today - days) UTC into the archive
+
+    Days are archived newest first, so the rows kept for a near-duplicate
+    (see _referenced_ids) are known before their originals' days come up.
+
+    Returns:
+        {ISO day: number of archived rows}
+    """
+    root = root or archive_dir()
+    today = datetime.now(dt_timezone.utc).date()
+    cutoff, _ = _day_bounds(today - timedelta(days=days))
+
+    archived = {}
+    kept: Set[int] = set()
+    day_starts = (SentimentAnalysis.objects.filter(created_at__lt=cutoff)
+                  .datetimes('created_at', 'day', order='DESC', tzinfo=dt_timezone.utc))
+    for day_start in day_starts:
+        day = day_start.date()
+        start, end = _day_bounds(day)
+        day_queryset = SentimentAnalysis.objects.filter(created_at__gte=start, created_at__lt=end)
+        referenced = _referenced_ids(day_queryset, cutoff, kept)
+        kept |= referenced
+        queryset = day_queryset.exclude(id__in=referenced).order_by('created_at', 'id')
+        if referenced:
+            logger.info(f"Keeping {len(referenced)} analyses from {day} that near-duplicates still point to")
+        if dry_run:
+            archived[day.isoformat()] = queryset.count()
+            continue
+        if not queryset.exists():
+            continue
+
+        ids = []
+
+        def collect(rows):
+            for row in rows:
+                ids.append(row['id'])
+                yield row
+
+        # Write under a temporary name and rename, so readers never see a partial file
+        os.makedirs(partition_dir(day, root), exist_ok=True)
+        path = os.path.join(partition_dir(day, root), f"part-{uuid.uuid4().hex[:12]}.parquet")
+        export.write_parquet(collect(export.iter_rows(queryset, batch_size)), path + '.tmp', batch_size, compression=COMPRESSION)
+        os.replace(path + '.tmp', path)
+
+        try:
+            with transaction.atomic():
+                for i in range(0, len(ids), batch_size):
+                    SentimentAnalysis.objects.filter(id__in=ids[i:i + batch_size]).delete()
+        except Exception:
+            # Rows are still in the hot table; drop the file so they are not duplicated
+            os.remove(path)
+            raise
+        _forget(ids)
+        archived[day.isoformat()] = len(ids)
+        logger.info(f"✓ Archived {len(ids)} analyses from {day} to {path}")
+    if not dry_run and any(archived.values()):
+        _mark_run(root, cutoff)
+    return archived
+
+
+def _read_partition(day: date, root: Optional[str] = None, filters=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = export.parquet_schema()
+    tables = [pq.read_table(path, filters=filters or None) for path in _partition_files(day, root)]
+    tables = [_with_columns(table, schema) for table in tables if table.num_rows]
+    if not tables:
+        return None
+    return pa.concat_tables(tables)
+
+
+def _with_columns(table, schema):
+    """Table in the current export layout (partitions written before a column was added get nulls)"""
+    import pyarrow as pa
+
+    for field in schema:
+        if field.name not in table.column_names:
+            table = table.append_column(field, pa.nulls(table.num_rows, field.type))
+    return table.select(schema.names)
+
+
+def _to_analysis(row: Dict) -> SentimentAnalysis:
+    """Unsaved, read-only SentimentAnalysis for an archived row (history rendering/serialization)"""
+    analysis = SentimentAnalysis(
+        id=row['id'],
+        uid=row['uid'],
+        created_at=row['created_at'],
+        platform=row['platform'],
+        text=row['text'],
+        level1_prediction=row['level1_prediction'],
+        level2_prediction=row['level2_prediction'],
+        level3_prediction=row['level3_prediction'],
+        final_classification=row['final_classification'],
+        duplicate_of_id=row['duplicate_of_id'],
+        model_version=row['model_version'] or '',
+        confidence_scores={key: row[f'confidence_{key}'] for key in export.CONFIDENCE_KEYS},
+    )
+    analysis.text_preview = (row['text'] or '')[:200]
+    analysis.archived = True
+    return analysis
+
+
+def history_rows(filters: Dict[str, str], before: Optional[Tuple[datetime, int]], limit: int,
+                 root: Optional[str] = None, max_partitions: Optional[int] = None,
+                 ) -> Tuple[List[SentimentAnalysis], Optional[Tuple[datetime, int]]]:
+    """
+    Archived analyses older than the `before` keyset position, newest first
+
+    Partitions are read one day at a time from the cursor's day downwards, and
+    at most max_partitions (default ANALYSIS_ARCHIVE_HISTORY_PARTITIONS) of them,
+    so one request never scans the whole archive.
+
+    Returns:
+        (rows, resume); resume is the keyset position before the last day read
+        when max_partitions stopped the scan short of `limit` with older days left
+    """
+    if not export.PYARROW_AVAILABLE:
+        return [], None
+    max_partitions = max_partitions or settings.ANALYSIS_ARCHIVE_HISTORY_PARTITIONS
+    pyarrow_filters = [(field, '=', value) for field, value in filters.items()]
+    # Ids start at 1, so (day start, 0) sorts before every row of that day
+    days = [day for day in partition_days(root) if before is None or (_day_bounds(day)[0], 0) < before]
+    results: List[SentimentAnalysis] = []
+    for read, day in enumerate(days, 1):
+        table = _read_partition(day, root, pyarrow_filters)
+        if table is not None:
+            seen = set()
+            rows = []
+            for row in table.to_pylist():
+                if row['id'] in seen:
+                    continue
+                seen.add(row['id'])
+                if before is not None and (row['created_at'], row['id']) >= before:
+                    continue
+                rows.append(row)
+            rows.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+            results.extend(_to_analysis(row) for row in rows[:limit - len(results)])
+            if len(results) >= limit:
+                break
+        if read >= max_partitions and read < len(days):
+            return results, (_day_bounds(day)[0], 0)
+    return results, None
+
+
+def iter_archived_rows(root: Optional[str] = None) -> Iterator[Dict]:
+    """Every archived row (export column layout), partition by partition"""
+    if not export.PYARROW_AVAILABLE:
+        return
+    for day in partition_days(root):
+        table = _read_partition(day, root)
+        if table is not None:
+            yield from table.to_pylist()
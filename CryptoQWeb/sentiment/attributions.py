@@ -0,0 +1,155 @@
+"""
+Per-token attributions from the classifiers' own forward pass.
+
+Attention rollout (Abnar & Zuidema, 2020): the head-averaged attention of every
+layer is mixed with the identity for the residual connection, row-normalized
+and multiplied through the layers. The row of the pooled position (the first
+token for the Hugging Face encoder, the mean over tokens for the custom
+encoder, which mean-pools) says how much each input token flows into the
+representation the classifier sees. The attention maps come from the same
+inference pass that produces the prediction, so an explanation costs no extra
+model call. SentimentAnalyzer averages them over folds like the probabilities.
+
+Attributions are cached per analysis id in the 'attributions' cache
+(settings.CACHES) for the dashboards. An analysis the first tier answered ran
+no DeBERTa pass, so it has nothing to explain: it is cached with empty
+attributions and never re-analyzed to explain it. torch is only imported by the rollout
+itself, so the cache helpers stay cheap to import for the views.
+"""
+
+import re
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+import numpy as np
+from django.core.cache import caches
+
+if TYPE_CHECKING:
+    import torch
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'attributions'
+WORD_PATTERN = re.compile(r'\w+')
+SENTENCEPIECE_WORD_START = '▁'
+
+
+def attention_rollout(attentions: Sequence['torch.Tensor'], attention_mask: Optional['torch.Tensor'] = None,
+                      pooling: str = 'first') -> 'torch.Tensor':
+    """
+    (batch, seq) token attributions from per-layer (batch, heads, seq, seq) attention maps
+
+    Args:
+        pooling: 'first' for [CLS] pooling, 'mean' for mean pooling over unmasked tokens
+    """
+    import torch
+
+    batch, _, seq_len, _ = attentions[0].shape
+    identity = torch.eye(seq_len, device=attentions[0].device).expand(batch, seq_len, seq_len)
+    rollout = identity
+    for layer_attention in attentions:
+        mixed = 0.5 * layer_attention.float().mean(dim=1) + 0.5 * identity
+        mixed = mixed / mixed.sum(dim=-1, keepdim=True)
+        rollout = torch.bmm(mixed, rollout)
+
+    mask = attention_mask.float() if attention_mask is not None else torch.ones(batch, seq_len, device=rollout.device)
+    if pooling == 'mean':
+        scores = (rollout * mask.unsqueeze(-1)).sum(dim=1) / mask.sum(dim=1, keepdim=True).clamp(min=1.0)
+    else:
+        scores = rollout[:, 0]
+    return scores * mask
+
+
+def word_attributions(pieces: List[str], scores: np.ndarray, special_tokens: Sequence[str] = ()) -> List[Dict]:
+    """
+    Merge sub-word scores into words ([{'token', 'score'}], scores summed, max word = 1.0)
+
+    SentencePiece pieces starting with '▁' begin a new word; plain word
+    tokens (the hashing fallback) are words already.
+    """
+    subwords = any(piece.startswith(SENTENCEPIECE_WORD_START) for piece in pieces)
+    words = []
+    for piece, score in zip(pieces, scores):
+        if piece in special_tokens:
+            continue
+        if not subwords or piece.startswith(SENTENCEPIECE_WORD_START) or not words:
+            words.append({'token': piece.lstrip(SENTENCEPIECE_WORD_START), 'score': float(score)})
+        else:
+            words[-1]['token'] += piece
+            words[-1]['score'] += float(score)
+    words = [word for word in words if word['token']]
+    top = max((word['score'] for word in words), default=0.0)
+    for word in words:
+        word['score'] = round(word['score'] / top, 4) if top > 0 else 0.0
+    return words
+
+
+def token_importance(attributions: Optional[Dict], predictions: Dict[str, Optional[str]]) -> Dict[str, float]:
+    """
+    Lower-cased word -> importance (0..1) for the dashboards' token heatmap
+
+    Uses the deepest level that was predicted, since that decision produced the
+    final classification.
+    """
+    if not attributions:
+        return {}
+    levels = [level for level in ('level3', 'level2', 'level1')
+              if predictions.get(level) and attributions.get('levels', {}).get(level)]
+    if not levels:
+        return {}
+    importance = {}
+    for word in attributions['levels'][levels[0]]:
+        for token in WORD_PATTERN.findall(word['token'].lower()):
+            importance[token] = max(importance.get(token, 0.0), word['score'])
+    return importance
+
+
+def result_attributions(results: Dict) -> Optional[Dict]:
+    """Attributions to cache for an analysis result (empty ones when the first tier answered it)"""
+    attributions = results.get('attributions')
+    if attributions is None and (results.get('first_tier') or {}).get('accepted'):
+        return {'levels': {}, 'first_tier': True}
+    return attributions
+
+
+def _cache_key(analysis_id: int) -> str:
+    return f"attributions:{analysis_id}"
+
+
+def cache_attributions(analysis_id: int, attributions: Dict):
+    try:
+        caches[CACHE_ALIAS].set(_cache_key(analysis_id), attributions)
+    except Exception as e:
+        logger.error(f"Could not cache attributions of analysis {analysis_id}: {e}")
+
+
+def get_cached_attributions(analysis_id: int) -> Optional[Dict]:
+    try:
+        return caches[CACHE_ALIAS].get(_cache_key(analysis_id))
+    except Exception as e:
+        logger.error(f"Could not read cached attributions of analysis {analysis_id}: {e}")
+        return None
+
+
+def discard_attributions(analysis_id: int):
+    try:
+        caches[CACHE_ALIAS].delete(_cache_key(analysis_id))
+    except Exception as e:
+        logger.error(f"Could not discard attributions of analysis {analysis_id}: {e}")
+
+
+def attributions_for(analysis, analyzer=None) -> Optional[Dict]:
+    """
+    Cached attributions of a saved analysis
+
+    Analyses created without explanations are explained once on first use
+    (one inference pass) when an analyzer is given, then served from the cache;
+    a text the first tier answers again is cached as unexplained.
+    """
+    attributions = get_cached_attributions(analysis.id)
+    if attributions is None and analyzer is not None:
+        results = analyzer.analyze(analysis.text, return_attributions=True)
+        attributions = result_attributions(results)
+        if attributions:
+            cache_attributions(analysis.id, attributions)
+    return attributions
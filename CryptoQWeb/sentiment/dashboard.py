@@ -0,0 +1,189 @@
+"""
+Dashboard data of saved analyses (/dashboard/<id>/ and /api/dashboard/<id>/).
+
+integrate_with_django_analysis() turns a SentimentAnalysis into what the
+dashboards draw: token heatmap rows, word cloud, confidences and predictions.
+dashboard_payload() memoizes it in the 'dashboard' cache (settings.CACHES,
+shared by all workers); edit, delete and archiving drop it with
+invalidate_dashboard().
+
+Placing the text in the UMAP reference needs a sentence embedding plus one
+transform per level, so it never runs inside a request: umap_status() queues
+it on a per-process background thread and reports 'pending' until the result
+is cached, and the dashboard page polls the API until it is 'ready'. The
+cached placement records a digest of the text, predictions and reference
+build it was computed from, so an edit never serves a stale plot.
+"""
+
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .attributions import attributions_for, token_importance
+from .figures import token_rows, word_cloud_rows
+from .umap_reference import empty_plot_data, get_reference_projection, manifest_version, reference_dir
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'dashboard'
+# A placement still pending after this long is assumed lost (worker restart) and queued again
+UMAP_PENDING_TIMEOUT = 300
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def analysis_predictions(analysis) -> Dict[str, Optional[str]]:
+    return {
+        'level1': analysis.level1_prediction,
+        'level2': analysis.level2_prediction,
+        'level3': analysis.level3_prediction,
+    }
+
+
+def integrate_with_django_analysis(analysis_object, analyzer=None) -> Dict:
+    """
+    Convert a SentimentAnalysis to the dashboard format (without the UMAP placement)
+
+    Args:
+        analysis_object: SentimentAnalysis instance
+        analyzer: SentimentAnalyzer used to explain analyses that have no cached
+            attributions yet (None: fall back to keyword importance)
+    """
+    user_text = analysis_object.text
+    confidence_scores = analysis_object.confidence_scores or {}
+    predictions = analysis_predictions(analysis_object)
+
+    # Real per-token attributions (attention rollout), cached per analysis id
+    attributed = token_importance(attributions_for(analysis_object, analyzer), predictions)
+
+    return {
+        'tokens': token_rows(user_text, attributed),
+        'word_cloud': word_cloud_rows(user_text),
+        'confidence': {
+            'level1': confidence_scores.get('level1', 0.83),
+            'level2': confidence_scores.get('level2', 0.78),
+            'level3': confidence_scores.get('level3', 0.82),
+        },
+        'predictions': predictions,
+        'original_text': user_text,
+        'analysis_id': analysis_object.id,
+    }
+
+
+def umap_plot_data(user_text: str, predictions: Dict[str, Optional[str]],
+                   models_dir: Optional[str] = None) -> Dict:
+    """
+    Place the text in the precomputed UMAP reference space of each level it reached
+
+    The reference is fitted once offline ('manage.py build_umap_reference') and
+    loaded once per process; here the text is only embedded and transformed.
+    """
+    reached = {'level1': predictions.get('level1')}
+    if reached['level1'] == 'SUBJECTIVE':
+        reached['level2'] = predictions.get('level2')
+        if reached['level2'] == 'NEUTRAL':
+            reached['level3'] = predictions.get('level3')
+
+    reference = get_reference_projection(models_dir or settings.MODELS_DIR)
+    if reference is None:
+        return empty_plot_data()
+    return reference.plot_data(user_text, reached)
+
+
+def _payload_key(analysis_id: int) -> str:
+    return f"dashboard:{analysis_id}"
+
+
+def _umap_key(analysis_id: int) -> str:
+    return f"dashboard-umap:{analysis_id}"
+
+
+def _umap_pending_key(analysis_id: int) -> str:
+    return f"dashboard-umap-pending:{analysis_id}"
+
+
+def _umap_digest(analysis, reference_version: Optional[str]) -> str:
+    digest = hashlib.sha1()
+    for part in (analysis.text, repr(analysis_predictions(analysis)), reference_version or ''):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Created on first use so the thread belongs to the worker, not the preloading master
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dashboard-umap')
+        return _executor
+
+
+def _place_in_background(analysis_id: int, text: str, predictions: Dict[str, Optional[str]], digest: str):
+    cache = caches[CACHE_ALIAS]
+    try:
+        entry = {'digest': digest, 'status': 'ready', 'data': umap_plot_data(text, predictions)}
+        logger.info(f"✓ UMAP placement of analysis {analysis_id} cached")
+    except Exception as e:
+        logger.error(f"✗ UMAP placement of analysis {analysis_id} failed: {e}")
+        entry = {'digest': digest, 'status': 'failed', 'data': None}
+    try:
+        cache.set(_umap_key(analysis_id), entry)
+        cache.delete(_umap_pending_key(analysis_id))
+    except Exception as e:
+        logger.error(f"Could not cache UMAP placement of analysis {analysis_id}: {e}")
+
+
+def umap_status(analysis) -> Dict:
+    """
+    {'status': 'ready'|'pending'|'failed'|'unavailable', 'data': plot data or None}
+
+    Never computes in the caller: a missing or stale placement is queued on the
+    background thread (once across workers, guarded by a cache.add() marker).
+    """
+    reference_version = manifest_version(reference_dir(settings.MODELS_DIR))
+    if reference_version is None:
+        return {'status': 'unavailable', 'data': empty_plot_data()}
+
+    cache = caches[CACHE_ALIAS]
+    digest = _umap_digest(analysis, reference_version)
+    entry = cache.get(_umap_key(analysis.id))
+    if entry is not None and entry['digest'] == digest:
+        return {'status': entry['status'], 'data': entry['data']}
+
+    if cache.add(_umap_pending_key(analysis.id), digest, timeout=UMAP_PENDING_TIMEOUT):
+        _get_executor().submit(_place_in_background, analysis.id, analysis.text,
+                               analysis_predictions(analysis), digest)
+    return {'status': 'pending', 'data': None}
+
+
+def dashboard_payload(analysis, analyzer=None) -> Dict:
+    """Memoized dashboard data of an analysis plus the current UMAP status"""
+    cache = caches[CACHE_ALIAS]
+    try:
+        payload = cache.get(_payload_key(analysis.id))
+    except Exception as e:
+        logger.error(f"Could not read cached dashboard of analysis {analysis.id}: {e}")
+        payload = None
+    if payload is None:
+        payload = integrate_with_django_analysis(analysis, analyzer)
+        try:
+            cache.set(_payload_key(analysis.id), payload)
+        except Exception as e:
+            logger.error(f"Could not cache dashboard of analysis {analysis.id}: {e}")
+    return {**payload, 'umap': umap_status(analysis)}
+
+
+def invalidate_dashboard(analysis_id: int):
+    """Drop the memoized dashboard data of an edited or deleted analysis"""
+    try:
+        caches[CACHE_ALIAS].delete_many([_payload_key(analysis_id), _umap_key(analysis_id),
+                                         _umap_pending_key(analysis_id)])
+    except Exception as e:
+        logger.error(f"Could not invalidate dashboard of analysis {analysis_id}: {e}")
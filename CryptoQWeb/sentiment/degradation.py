@@ -0,0 +1,111 @@
+"""
+Load-adaptive ensemble degradation.
+
+Every level of the analyzer averages up to 5 fold models. Under a burst of
+traffic that can take longer than the request may wait, so an analysis can
+carry a deadline (a time.monotonic() value) and the analyzer evaluates only
+as many folds of each level as the remaining time allows:
+
+    0 'full'            every fold of every level that ran
+    1 'reduced_folds'   fewer folds on at least one level
+    2 'skipped_level3'  level 3 did not run (the path ends at SUBJECTIVE -> NEUTRAL)
+
+Levels 1 and 2 always run at least one fold. The estimate of what one more
+fold costs comes from the LoadTracker of the analyzer: a moving average of
+the measured per-fold latency of each level, normalized by the number of
+requests that were in flight while it was measured and scaled by the
+number in flight now. When load drops, the estimate drops with it and the
+full ensemble comes back without any reset.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+FULL = 0
+REDUCED_FOLDS = 1
+SKIPPED_LEVEL3 = 2
+LEVEL_NAMES = {FULL: 'full', REDUCED_FOLDS: 'reduced_folds', SKIPPED_LEVEL3: 'skipped_level3'}
+
+
+class LoadTracker:
+    """
+    Requests in flight and per-fold latency of each level, shared by the requests of one analyzer
+
+    Args:
+        smoothing: weight of the newest measurement in the moving average
+        safety: fraction of the remaining time that may be planned for
+    """
+
+    def __init__(self, smoothing: float = 0.2, safety: float = 0.8):
+        self.smoothing = smoothing
+        self.safety = safety
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        # level -> seconds one fold takes for one input of a request running alone
+        self._fold_seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """Count one analysis as in flight while it runs"""
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def record(self, level: str, folds: int, seconds: float, units: int = 1):
+        """Add the measured latency of one level pass over folds models and units inputs (texts or windows)"""
+        if folds <= 0 or units <= 0:
+            return
+        with self._lock:
+            sample = seconds / folds / units / max(1, self.in_flight)
+            previous = self._fold_seconds.get(level)
+            self._fold_seconds[level] = sample if previous is None else (
+                previous + self.smoothing * (sample - previous))
+
+    def fold_cost(self, level: str, units: int = 1) -> Optional[float]:
+        """Expected seconds of one more fold of level over units inputs at the current load (None: not measured yet)"""
+        seconds = self._fold_seconds.get(level)
+        return None if seconds is None else seconds * units * max(1, self.in_flight)
+
+    def plan_folds(self, level: str, available: int, deadline: Optional[float],
+                   required: bool = True, reserve: float = 0.0, units: int = 1) -> int:
+        """
+        Number of folds of level to evaluate before the deadline
+
+        Args:
+            available: folds loaded for the level
+            deadline: time.monotonic() value to finish by (None: no deadline)
+            required: evaluate at least one fold even when it does not fit
+            reserve: seconds to leave for the levels after this one
+            units: inputs of the pass (texts, or windows in long-text mode)
+        """
+        cost = self.fold_cost(level, units)
+        if deadline is None or cost is None or available == 0:
+            return available
+        budget = (deadline - time.monotonic()) * self.safety - reserve
+        folds = int(budget // cost) if budget > 0 else 0
+        return max(1 if required else 0, min(available, folds))
+
+    def snapshot(self) -> Dict:
+        """Current load state, for logs and monitoring"""
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'fold_seconds': {level: round(seconds, 4) for level, seconds in self._fold_seconds.items()},
+            }
+
+
+def describe(folds: Dict[str, int], available: Dict[str, int], skipped: List[str]) -> Dict:
+    """Degradation annotation of one analysis: {'level', 'name', 'folds', 'skipped'}"""
+    if skipped:
+        level = SKIPPED_LEVEL3
+    elif any(folds[name] < available[name] for name in folds):
+        level = REDUCED_FOLDS
+    else:
+        level = FULL
+    return {'level': level, 'name': LEVEL_NAMES[level], 'folds': dict(folds), 'skipped': list(skipped)}
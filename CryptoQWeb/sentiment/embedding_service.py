@@ -0,0 +1,97 @@
+"""
+Shared sentence-embedding service with a persistent on-disk cache.
+
+The SentenceTransformer model is read from models/sentence_encoder/ (vendored
+at build time with 'manage.py vendor_sentence_encoder') once per process.
+Texts are encoded in batches and every vector is appended to a float16
+memory-mapped cache keyed by a 64-bit hash of the text, so repeated texts and
+reference corpora are never encoded twice - across requests, restarts and
+gunicorn workers.
+
+    embedding_cache/<model>/
+        meta.json  vectors.f16  keys.u64  .lock    (see vector_store.VectorFile)
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .vector_store import VectorFile
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+ENCODER_DIR_NAME = 'sentence_encoder'
+CACHE_DIR_NAME = 'embedding_cache'
+DEFAULT_BATCH_SIZE = 64
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def text_key(text: str) -> int:
+    """Stable 64-bit key of a text (same in every process, unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def encoder_dir(models_dir: str) -> str:
+    return os.path.abspath(os.path.join(models_dir, ENCODER_DIR_NAME))
+
+
+class EmbeddingService:
+    """
+    Batched, cached sentence embeddings
+
+    Args:
+        models_dir: directory containing sentence_encoder/ (vendored model) and embedding_cache/
+        batch_size: texts per forward pass for cache misses
+    """
+
+    def __init__(self, models_dir: str = 'models', batch_size: int = DEFAULT_BATCH_SIZE):
+        from sentence_transformers import SentenceTransformer
+
+        path = encoder_dir(models_dir)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No vendored sentence encoder in {path} (run 'manage.py vendor_sentence_encoder')")
+        self.model = SentenceTransformer(path, device='cpu')
+        self.batch_size = batch_size
+        self.dim = self.model.get_sentence_embedding_dimension()
+        slug = EMBEDDING_MODEL.replace('/', '__')
+        self.cache = VectorFile(os.path.join(models_dir, CACHE_DIR_NAME, slug), self.dim, {'model': EMBEDDING_MODEL})
+        logger.info(f"✓ Sentence encoder loaded from {path} ({len(self.cache)} cached embeddings)")
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dim) float32 embeddings; only texts never seen before are encoded"""
+        keys = [text_key(text) for text in texts]
+        found = self.cache.lookup(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            new_vectors = self.model.encode(list(missing.values()), batch_size=self.batch_size,
+                                            show_progress_bar=False, convert_to_numpy=True)
+            self.cache.add(list(missing), new_vectors)
+            found.update(zip(missing, np.asarray(new_vectors, dtype=np.float32)))
+
+        if not keys:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([found[key] for key in keys])
+
+
+def get_embedding_service(models_dir: str = 'models') -> Optional[EmbeddingService]:
+    """Process-wide embedding service (None when sentence-transformers or the model is missing)"""
+    key = os.path.abspath(models_dir)
+    with _services_lock:
+        if key not in _services:
+            try:
+                _services[key] = EmbeddingService(models_dir)
+            except Exception as e:
+                logger.error(f"Embedding service not available: {e}")
+                _services[key] = None
+        return _services[key]
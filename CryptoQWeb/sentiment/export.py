@@ -0,0 +1,161 @@
+"""
+Streaming export of analyses to CSV or Parquet.
+
+Rows are read with a server-side cursor (QuerySet.iterator(chunk_size=...)) and
+written chunk by chunk, so memory use depends on the chunk size only, not on
+the number of rows. confidence_scores is flattened into one float column per
+level. Parquet output needs pyarrow (optional dependency, imported on first use).
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from importlib.util import find_spec
+
+from .models import SentimentAnalysis
+
+# Checked without importing: pyarrow is loaded on the first Parquet export
+PYARROW_AVAILABLE = find_spec('pyarrow') is not None
+
+FORMATS = ('csv', 'parquet')
+DEFAULT_CHUNK_SIZE = 2000
+
+MODEL_COLUMNS = [
+    'id', 'uid', 'created_at', 'platform', 'text',
+    'level1_prediction', 'level2_prediction', 'level3_prediction', 'final_classification', 'duplicate_of_id',
+    'model_version',
+]
+CONFIDENCE_KEYS = ['level1', 'level2', 'level3']
+COLUMNS = MODEL_COLUMNS + [f'confidence_{key}' for key in CONFIDENCE_KEYS]
+
+
+def export_queryset(platform: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Analyses to export, oldest first (uses the created_at/platform indexes)"""
+    queryset = SentimentAnalysis.objects.all()
+    if platform:
+        queryset = queryset.filter(platform=platform)
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset.order_by('created_at', 'id')
+
+
+def iter_rows(queryset, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+    """Flat dict per analysis, fetched chunk_size rows at a time"""
+    for values in queryset.values_list(*MODEL_COLUMNS, 'confidence_scores').iterator(chunk_size=chunk_size):
+        row = dict(zip(MODEL_COLUMNS, values))
+        scores = values[-1] or {}
+        row['uid'] = str(row['uid'])
+        for key in CONFIDENCE_KEYS:
+            row[f'confidence_{key}'] = scores.get(key)
+        yield row
+
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer streaming"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows: Iterable[Dict], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """CSV text, one chunk of rows per yielded string"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for chunk in _chunks(rows, chunk_size):
+        yield ''.join(writer.writerow([row[column] for column in COLUMNS]) for row in chunk)
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('id', pa.int64()),
+        ('uid', pa.string()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+        ('platform', pa.string()),
+        ('text', pa.string()),
+        ('level1_prediction', pa.string()),
+        ('level2_prediction', pa.string()),
+        ('level3_prediction', pa.string()),
+        ('final_classification', pa.string()),
+        ('duplicate_of_id', pa.int64()),
+        ('model_version', pa.string()),
+    ] + [(f'confidence_{key}', pa.float64()) for key in CONFIDENCE_KEYS])
+
+
+def _record_batch(chunk: List[Dict], schema):
+    import pyarrow as pa
+
+    return pa.RecordBatch.from_pydict({column: [row[column] for row in chunk] for column in schema.names}, schema=schema)
+
+
+def write_parquet(rows: Iterable[Dict], sink, chunk_size: int = DEFAULT_CHUNK_SIZE, compression: str = 'snappy') -> int:
+    """Write rows to a Parquet file/path, one row group per chunk; returns the row count"""
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    total = 0
+    with pq.ParquetWriter(sink, schema, compression=compression) as writer:
+        for chunk in _chunks(rows, chunk_size):
+            writer.write_batch(_record_batch(chunk, schema))
+            total += len(chunk)
+    return total
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file that hands written bytes to the HTTP response generator"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def iter_parquet(rows: Iterable[Dict], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Parquet bytes, yielded after every row group (the footer comes last)"""
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            writer.write_batch(_record_batch(chunk, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
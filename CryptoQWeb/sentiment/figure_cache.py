@@ -0,0 +1,176 @@
+"""
+Two-tier cache of rendered dashboard figures.
+
+A figure is a pure function of the analysis (text, predictions, confidences,
+attributions) and the model version, so it is rendered once and then served
+from:
+
+    memory  per-process LRU of the most recently served figures
+    disk    <FIGURE_CACHE_DIR>/<key[:2]>/<key>.<json|png>, shared by all
+            gunicorn workers and kept across restarts
+
+Keys are hashes of everything the figure depends on, so an edited analysis or
+a new model version simply produces new keys; stale files are never served
+and are pruned oldest-first once the directory holds more than max_files.
+The file's mtime is the figure's Last-Modified time and the key its ETag.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {'json': 'application/json', 'png': 'image/png'}
+PRUNE_EVERY = 100
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class CachedFigure(NamedTuple):
+    content: bytes
+    content_type: str
+    etag: str
+    built_at: float
+
+
+def figure_key(*parts) -> str:
+    """Cache key (also the ETag) of a figure: sha1 of its inputs"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class FigureCache:
+    """
+    LRU memory tier in front of a file-per-figure disk tier
+
+    Args:
+        memory_items: figures kept in this process (0 disables the memory tier)
+        directory: disk tier location (None disables the disk tier)
+        max_files: disk tier size before the oldest files are pruned
+    """
+
+    def __init__(self, memory_items: int = 256, directory: Optional[str] = None, max_files: int = 20000):
+        self.memory_items = memory_items
+        self.directory = directory
+        self.max_files = max_files
+        self._memory: 'OrderedDict[str, CachedFigure]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{ext}")
+
+    def _remember(self, key: str, entry: CachedFigure):
+        if self.memory_items <= 0:
+            return
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str, ext: str) -> Optional[CachedFigure]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+        if not self.directory:
+            return None
+        path = self._path(key, ext)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            entry = CachedFigure(content, CONTENT_TYPES[ext], key, os.path.getmtime(path))
+        except OSError:
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, ext: str, content: bytes) -> CachedFigure:
+        built_at = None
+        if self.directory:
+            path = self._path(key, ext)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write to a temporary file and rename: readers never see a partial figure
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+                built_at = os.path.getmtime(path)
+            except OSError as e:
+                logger.error(f"Could not write figure {path}: {e}")
+            self._maybe_prune()
+        if built_at is None:
+            built_at = time.time()
+        entry = CachedFigure(content, CONTENT_TYPES[ext], key, built_at)
+        self._remember(key, entry)
+        return entry
+
+    def get_or_build(self, key: str, ext: str, build: Callable[[], bytes]) -> CachedFigure:
+        """Cached figure, rendered with build() on a miss"""
+        entry = self.get(key, ext)
+        if entry is None:
+            entry = self.put(key, ext, build())
+        return entry
+
+    def _maybe_prune(self):
+        with self._lock:
+            self._writes += 1
+            if self._writes % PRUNE_EVERY:
+                return
+        self.prune()
+
+    def prune(self) -> int:
+        """Delete the oldest disk figures beyond max_files; returns how many were removed"""
+        if not self.directory:
+            return 0
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        excess = len(files) - self.max_files
+        if excess <= 0:
+            return 0
+        files.sort()
+        removed = 0
+        for _, path in files[:excess]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+        logger.info(f"✓ Pruned {removed} cached figures from {self.directory}")
+        return removed
+
+
+def get_figure_cache() -> FigureCache:
+    """Process-wide figure cache configured from settings"""
+    directory = settings.FIGURE_CACHE_DIR or None
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = FigureCache(
+                memory_items=settings.FIGURE_CACHE_MEMORY_ITEMS,
+                directory=directory,
+                max_files=settings.FIGURE_CACHE_MAX_FILES,
+            )
+        return _caches[directory]
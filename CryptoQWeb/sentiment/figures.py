@@ -0,0 +1,422 @@
+"""
+Plotly figures for an analysis (token heatmap, word cloud, confidence gauges,
+UMAP projection, decision flow), shared by the Django figure endpoints and the
+Dash dashboard.
+
+Figure builders return plotly Figures; the Django side serves them as JSON (and
+the word cloud also as a PNG) through the figure cache in figure_cache.py.
+plotly and wordcloud are optional dependencies, imported on first use.
+"""
+
+import io
+import re
+from collections import Counter
+from importlib.util import find_spec
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .lexicon import get_lexicon
+
+# Checked without importing: plotly and wordcloud are loaded on the first figure
+PLOTLY_AVAILABLE = find_spec('plotly') is not None
+WORDCLOUD_AVAILABLE = find_spec('wordcloud') is not None
+
+# Color scheme for the 3-level hierarchy
+COLORS = {
+    'level1': {
+        'NOISE': '#dc3545',      # Red
+        'OBJECTIVE': '#0d6efd',  # Blue  
+        'SUBJECTIVE': '#198754'  # Green
+    },
+    'level2': {
+        'NEUTRAL': '#6c757d',    # Gray
+        'NEGATIVE': '#dc3545',   # Red
+        'POSITIVE': '#28a745'    # Green
+    },
+    'level3': {
+        'NEUTRAL_SENTIMENTS': '#6c757d',  # Gray
+        'QUESTIONS': '#0dcaf0',           # Cyan
+        'ADVERTISEMENTS': '#fd7e14',      # Orange
+        'MISCELLANEOUS': '#6f42c1',       # Purple
+        # Model/reference label names
+        'NEUTRAL_SENTIMENT': '#6c757d',
+        'QUESTION': '#0dcaf0',
+        'ADVERTISEMENT': '#fd7e14'
+    }
+}
+
+SENTIMENT_COLORS = {'positive': '#28a745', 'negative': '#dc3545', 'neutral': '#6c757d'}
+
+
+def _graph_objects():
+    import plotly.graph_objects as go
+    return go
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r'\b\w+\b', text.lower())
+
+
+def word_sentiment(word: str) -> str:
+    return get_lexicon().sentiment(word)
+
+
+def token_rows(text: str, importance: Optional[Dict[str, float]] = None) -> List[Dict]:
+    """
+    Token heatmap rows: keyword sentiment colour plus importance
+
+    importance is the attention-rollout map from attributions.token_importance;
+    without it a fixed keyword-based importance is used.
+    """
+    rows = []
+    for token in tokenize(text):
+        sentiment = word_sentiment(token)
+        if importance:
+            value = importance.get(token, 0.0)
+        elif sentiment != 'neutral':
+            value = 0.9
+        elif get_lexicon().is_function_word(token):
+            value = 0.25
+        else:
+            # Unknown words get medium importance
+            value = 0.6
+        rows.append({'token': token, 'sentiment': sentiment, 'importance': value})
+    return rows
+
+
+def word_cloud_rows(text: str, limit: int = 25) -> List[Dict]:
+    """Most frequent words (longer than 2 characters) with their keyword sentiment"""
+    return [
+        {'word': word, 'count': count, 'sentiment': word_sentiment(word)}
+        for word, count in Counter(tokenize(text)).most_common(limit)
+        if len(word) > 2
+    ]
+
+
+def word_cloud_png(word_cloud: List[Dict], width: int = 800, height: int = 400) -> bytes:
+    """Word cloud image (PNG bytes), words coloured by sentiment"""
+    if not WORDCLOUD_AVAILABLE:
+        raise ImportError("The word cloud image requires wordcloud (pip install wordcloud)")
+    frequencies = {row['word']: row['count'] for row in word_cloud} or {'-': 1}
+    colors = {row['word']: SENTIMENT_COLORS[row['sentiment']] for row in word_cloud}
+    from wordcloud import WordCloud
+
+    cloud = WordCloud(width=width, height=height, background_color='white', random_state=42,
+                      color_func=lambda word, **kwargs: colors.get(word, SENTIMENT_COLORS['neutral']))
+    buffer = io.BytesIO()
+    cloud.generate_from_frequencies(frequencies).to_image().save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def create_token_heatmap_figure(token_data):
+    """
+    Create token importance heatmap visualization
+    """
+    go = _graph_objects()
+    fig = go.Figure()
+    
+    x_positions = []
+    y_positions = []
+    colors = []
+    texts = []
+    hover_texts = []
+    
+    x_pos = 0
+    y_pos = 0
+    max_width = 10
+    
+    for i, token_info in enumerate(token_data):
+        x_positions.append(x_pos)
+        y_positions.append(y_pos)
+        
+        # Color based on sentiment
+        if token_info['sentiment'] == 'positive':
+            color = '#28a745'
+        elif token_info['sentiment'] == 'negative':
+            color = '#dc3545'
+        else:
+            color = '#6c757d'
+            
+        colors.append(color)
+        texts.append(token_info['token'])
+        
+        hover_texts.append(f"Token: {token_info['token']}<br>"
+                          f"Sentiment: {token_info['sentiment']}<br>"
+                          f"Importance: {token_info['importance']:.2f}")
+        
+        x_pos += 1
+        if x_pos >= max_width:
+            x_pos = 0
+            y_pos += 1
+    
+    fig.add_trace(go.Scatter(
+        x=x_positions,
+        y=y_positions,
+        mode='markers+text',
+        marker=dict(
+            size=30,
+            color=colors,
+            line=dict(width=2, color='white')
+        ),
+        text=texts,
+        textposition="middle center",
+        hovertext=hover_texts,
+        hoverinfo='text'
+    ))
+    
+    fig.update_layout(
+        title="Token Importance Heatmap",
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        plot_bgcolor='white',
+        height=300
+    )
+    
+    return fig
+
+
+def create_word_cloud_figure(word_cloud_data):
+    """
+    Create word cloud visualization
+    """
+    go = _graph_objects()
+    if not word_cloud_data:
+        return go.Figure().add_annotation(
+            text="No significant words found",
+            xref="paper", yref="paper",
+            x=0.5, y=0.5, showarrow=False
+        )
+    
+    fig = go.Figure()
+    
+    x_positions = []
+    y_positions = []
+    sizes = []
+    colors = []
+    texts = []
+    
+    # Generate random positions for words (fixed seed: same text, same figure)
+    rng = np.random.RandomState(42)
+    for i, word_info in enumerate(word_cloud_data):
+        x_positions.append(rng.uniform(0, 10))
+        y_positions.append(rng.uniform(0, 10))
+        sizes.append(word_info['count'] * 20)
+        
+        if word_info['sentiment'] == 'positive':
+            colors.append('#28a745')
+        elif word_info['sentiment'] == 'negative':
+            colors.append('#dc3545')
+        else:
+            colors.append('#6c757d')
+            
+        texts.append(word_info['word'])
+    
+    fig.add_trace(go.Scatter(
+        x=x_positions,
+        y=y_positions,
+        mode='markers+text',
+        marker=dict(
+            size=sizes,
+            color=colors,
+            opacity=0.7,
+            line=dict(width=1, color='white')
+        ),
+        text=texts,
+        textposition="middle center",
+        hovertext=[f"Word: {w['word']}<br>Count: {w['count']}<br>Sentiment: {w['sentiment']}" 
+                  for w in word_cloud_data],
+        hoverinfo='text'
+    ))
+    
+    fig.update_layout(
+        title="Sentiment-Weighted Word Cloud",
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        plot_bgcolor='#f8f9fa',
+        height=300
+    )
+    
+    return fig
+
+
+def create_confidence_gauge(level, confidence, prediction):
+    """
+    Create confidence gauge for each level
+    """
+    go = _graph_objects()
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number+delta",
+        value = confidence * 100,
+        domain = {'x': [0, 1], 'y': [0, 1]},
+        title = {'text': f"Level {level}"},
+        delta = {'reference': 50},
+        gauge = {
+            'axis': {'range': [None, 100]},
+            'bar': {'color': "darkblue"},
+            'steps': [
+                {'range': [0, 50], 'color': "lightgray"},
+                {'range': [50, 75], 'color': "yellow"},
+                {'range': [75, 100], 'color': "green"}
+            ],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': 90
+            }
+        }
+    ))
+    
+    fig.update_layout(
+        height=300,
+        font={'color': "darkblue", 'family': "Arial"}
+    )
+    
+    return fig
+
+
+def create_umap_figure(level, umap_data, level_name):
+    """
+    Create UMAP visualization for each level
+    """
+    go = _graph_objects()
+    data = umap_data[level]
+    
+    fig = go.Figure()
+    
+    # Get unique labels and their colors
+    unique_labels = list(set(data['labels']))
+    colors = COLORS[level_name]
+    
+    for label in unique_labels:
+        # Get indices for this label
+        indices = [i for i, l in enumerate(data['labels']) if l == label]
+        
+        x_vals = [data['x'][i] for i in indices]
+        y_vals = [data['y'][i] for i in indices]
+        texts = [data['texts'][i] for i in indices]
+        
+        # Check if user text is in this label
+        is_user = [i in data['user_indices'] for i in indices]
+        
+        fig.add_trace(go.Scatter(
+            x=x_vals,
+            y=y_vals,
+            mode='markers',
+            name=label,
+            marker=dict(
+                size=[20 if user else 10 for user in is_user],
+                color=colors.get(label, '#6c757d'),
+                opacity=0.7,
+                line=dict(width=2, color='white')
+            ),
+            text=texts,
+            hovertemplate='<b>%{text}</b><br>Label: ' + label + '<extra></extra>'
+        ))
+    
+    fig.update_layout(
+        title=f"UMAP Visualization - Level {level}",
+        xaxis_title="UMAP Dimension 1",
+        yaxis_title="UMAP Dimension 2",
+        height=400,
+        showlegend=True
+    )
+    
+    return fig
+
+
+def create_decision_flow_figure(predictions):
+    """
+    Create decision flow diagram
+    """
+    go = _graph_objects()
+    fig = go.Figure()
+    
+    # Define flow steps
+    steps = [
+        {'name': 'Input Tokens', 'x': 0, 'y': 0},
+        {'name': 'Transformer Encoder', 'x': 2, 'y': 0},
+        {'name': 'Pooled Embedding', 'x': 4, 'y': 0},
+        {'name': 'Classification Head', 'x': 6, 'y': 0},
+        {'name': f'Final Output: {predictions.get("level1", "SUBJECTIVE")}', 'x': 8, 'y': 0}
+    ]
+    
+    # Add step boxes
+    for step in steps:
+        fig.add_trace(go.Scatter(
+            x=[step['x']],
+            y=[step['y']],
+            mode='markers+text',
+            marker=dict(size=100, color='#4F46E5', opacity=0.8),
+            text=[step['name']],
+            textposition="middle center",
+            showlegend=False,
+            hoverinfo='skip'
+        ))
+    
+    # Add arrows
+    for i in range(len(steps) - 1):
+        fig.add_annotation(
+            x=steps[i]['x'] + 1,
+            y=steps[i]['y'],
+            ax=steps[i]['x'] + 0.5,
+            ay=steps[i]['y'],
+            xref="x", yref="y",
+            axref="x", ayref="y",
+            showarrow=True,
+            arrowhead=2,
+            arrowsize=1,
+            arrowwidth=2,
+            arrowcolor="#4F46E5"
+        )
+    
+    fig.update_layout(
+        title="Decision Flow Visualization",
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, range=[-0.5, 8.5]),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False, range=[-0.5, 0.5]),
+        plot_bgcolor='white',
+        height=200
+    )
+    
+    return fig
+
+
+FIGURES = (
+    'tokens', 'wordcloud', 'wordcloud_png', 'decision_flow',
+    'gauge_level1', 'gauge_level2', 'gauge_level3',
+    'umap_level1', 'umap_level2', 'umap_level3',
+)
+
+
+def figure_content_type(figure: str) -> str:
+    return 'image/png' if figure == 'wordcloud_png' else 'application/json'
+
+
+def render_figure(figure: str, text: str, predictions: Dict[str, Optional[str]], confidence: Dict[str, float],
+                  importance: Optional[Dict[str, float]] = None,
+                  umap_data: Optional[Callable[[], Dict]] = None) -> bytes:
+    """
+    Serialized figure: plotly JSON, or PNG bytes for 'wordcloud_png'
+
+    umap_data is only called for the UMAP figures (embedding + transform).
+    """
+    if figure == 'wordcloud_png':
+        return word_cloud_png(word_cloud_rows(text))
+    if not PLOTLY_AVAILABLE:
+        raise ImportError("Dashboard figures require plotly (pip install plotly)")
+
+    if figure == 'tokens':
+        fig = create_token_heatmap_figure(token_rows(text, importance))
+    elif figure == 'wordcloud':
+        fig = create_word_cloud_figure(word_cloud_rows(text))
+    elif figure == 'decision_flow':
+        fig = create_decision_flow_figure(predictions)
+    elif figure.startswith('gauge_'):
+        level = figure[len('gauge_'):]
+        fig = create_confidence_gauge(level[-1], confidence.get(level) or 0.0, predictions.get(level))
+    elif figure.startswith('umap_'):
+        level = figure[len('umap_'):]
+        fig = create_umap_figure(level, umap_data(), level)
+    else:
+        raise ValueError(f"Unknown figure '{figure}', expected one of {FIGURES}")
+    return fig.to_json().encode('utf-8')
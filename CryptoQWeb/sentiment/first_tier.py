@@ -0,0 +1,297 @@
+"""
+Linear first tier of the analysis cascade.
+
+Many inputs are easy: emoji-only, URL-only, a couple of words, blatant
+ads. A linear model over hashed features answers those in microseconds, and
+only the texts it is not sure about go on to the DeBERTa ensemble:
+
+    text -> first tier -> confidence >= threshold -> result (no DeBERTa pass)
+                       -> otherwise               -> level 1-3 ensemble
+
+Features are word unigrams and bigrams (URLs and @mentions replaced by
+placeholders), emojis, and a few shape and lexicon flags (url_only,
+emoji_only, word-count bucket, sentiment keyword counts, question). Each one
+is hashed with FNV-1a into n_features columns, and a row holds its distinct
+features with value 1/sqrt(count) (an L2-normalized binary vector).
+
+The model is one softmax over the 8 complete paths of the hierarchy (NOISE,
+OBJECTIVE, SUBJECTIVE -> NEGATIVE, ...), so a confident answer is a whole
+result. Per-level predictions are decoded greedily from the path
+probabilities, like the ensemble does level by level, and the confidence of
+the answer is the probability of the decoded path.
+
+Weights live next to the fold checkpoints in FirstTier/model.npz (trained
+with 'manage.py train_first_tier'), together with the threshold chosen on
+the validation split. 'manage.py first_tier_report' measures escalation
+rate and agreement with the ensemble.
+
+Trade-off: an answered text runs no DeBERTa pass, so it gets no pooled
+embeddings and no attention attributions. It is not added to the vector store
+(the similar-analyses search never returns it) and the dashboards show its
+token heatmap empty instead of re-analyzing it to explain it. Serving those
+too would mean a level-1 fold pass per answered text, most of the compute the
+first tier saves.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .hashing_tokenizer import fnv1a_64
+from .lexicon import get_lexicon
+
+MODEL_FILE = os.path.join('FirstTier', 'model.npz')
+DEFAULT_FEATURES = 2 ** 18
+DEFAULT_THRESHOLD = 0.9
+
+LEVEL1_CLASSES = ['NOISE', 'OBJECTIVE', 'SUBJECTIVE']
+LEVEL2_CLASSES = ['NEUTRAL', 'NEGATIVE', 'POSITIVE']
+LEVEL3_CLASSES = ['NEUTRAL_SENTIMENT', 'QUESTION', 'ADVERTISEMENT', 'MISCELLANEOUS']
+
+# (level 1, level 2, level 3) of every class of the model
+PATHS = (
+    ('NOISE', None, None),
+    ('OBJECTIVE', None, None),
+    ('SUBJECTIVE', 'NEGATIVE', None),
+    ('SUBJECTIVE', 'POSITIVE', None),
+    ('SUBJECTIVE', 'NEUTRAL', 'NEUTRAL_SENTIMENT'),
+    ('SUBJECTIVE', 'NEUTRAL', 'QUESTION'),
+    ('SUBJECTIVE', 'NEUTRAL', 'ADVERTISEMENT'),
+    ('SUBJECTIVE', 'NEUTRAL', 'MISCELLANEOUS'),
+)
+SUBJECTIVE_PATHS = slice(2, 8)
+NEUTRAL_PATHS = slice(4, 8)
+
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
+MENTION_PATTERN = re.compile(r'@\w+')
+EMOJI_PATTERN = re.compile('[\U0001F000-\U0001FAFF\u2600-\u27BF]')
+TOKEN_PATTERN = re.compile(r'\w+|[$#!?]')
+WORD_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+def _bucket(value: int, edges: Sequence[int]) -> int:
+    """Largest edge not above value"""
+    return max(edge for edge in edges if edge <= value)
+
+
+def text_features(text: str, keyword_counts: Dict[str, int], is_question: bool) -> List[str]:
+    """Distinct feature names of one text (keyword_counts and is_question from the lexicon)"""
+    lowered = text.lower()
+    urls = URL_PATTERN.findall(lowered)
+    emojis = EMOJI_PATTERN.findall(lowered)
+    rest = MENTION_PATTERN.sub(' __user__ ', URL_PATTERN.sub(' __url__ ', lowered))
+    tokens = TOKEN_PATTERN.findall(rest)
+    words = [token for token in tokens if token[0].isalnum() and not token.startswith('__')]
+
+    features = {f'w:{token}' for token in tokens}
+    features.update(f'b:{first} {second}' for first, second in zip(tokens, tokens[1:]))
+    features.update(f'e:{emoji}' for emoji in emojis)
+    features.add(f'words:{_bucket(len(words), WORD_BUCKETS)}')
+    features.add(f'urls:{min(len(urls), 3)}')
+    features.add(f'emojis:{min(len(emojis), 3)}')
+    if urls and not words:
+        features.add('url_only')
+    if emojis and not words:
+        features.add('emoji_only')
+    letters = [char for char in text if char.isalpha()]
+    if len(letters) >= 4 and sum(char.isupper() for char in letters) > 0.6 * len(letters):
+        features.add('shouting')
+    for category in ('positive', 'negative'):
+        features.add(f'lex:{category}:{min(keyword_counts[category], 3)}')
+    if is_question:
+        features.add('question')
+    return sorted(features)
+
+
+def featurize(texts: List[str], n_features: int = DEFAULT_FEATURES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Hashed feature rows of a batch in CSR form
+
+    Returns:
+        (indptr (n_texts + 1,), column indices, float32 values)
+    """
+    lexicon = get_lexicon()
+    keyword_counts = lexicon.score_batch(texts)
+    per_text = [text_features(text, counts, lexicon.is_question(text))
+                for text, counts in zip(texts, keyword_counts)]
+    counts = np.array([len(features) for features in per_text], dtype=np.int64)
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+
+    names = np.array([name for features in per_text for name in features], dtype=str)
+    if len(names) == 0:
+        return indptr, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    # Hash each distinct feature once, as the hashing tokenizer does for words
+    unique_names, inverse = np.unique(names, return_inverse=True)
+    columns = (fnv1a_64(unique_names) % np.uint64(n_features)).astype(np.int64)[inverse.reshape(-1)]
+    values = np.repeat(1.0 / np.sqrt(np.maximum(counts, 1)), counts).astype(np.float32)
+    return indptr, columns, values
+
+
+def path_index(level1: int, level2: Optional[float], level3: Optional[float]) -> Optional[int]:
+    """Class of a labeled Task-1 row (level_N encoded as in the notebooks), None when its labels are incomplete"""
+    if level1 in (0, 1):
+        return int(level1)
+    if level1 != 2 or level2 is None or np.isnan(level2):
+        return None
+    if level2 == 1:
+        return 2
+    if level2 == 2:
+        return 3
+    if level3 is None or np.isnan(level3):
+        return None
+    return 4 + int(level3)
+
+
+def path_results(probabilities: np.ndarray) -> Dict:
+    """Analyzer-style results decoded level by level from the 8 path probabilities"""
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    subjective = probabilities[SUBJECTIVE_PATHS].sum()
+    level1 = np.array([probabilities[0], probabilities[1], subjective])
+    results = {
+        'level1_prediction': LEVEL1_CLASSES[int(np.argmax(level1))],
+        'level2_prediction': None,
+        'level3_prediction': None,
+        'confidence_scores': {'level1': float(level1.max())},
+        'probability_distributions': {'level1': [float(p) for p in level1]},
+    }
+    confidence = level1.max()
+    if results['level1_prediction'] == 'SUBJECTIVE':
+        neutral = probabilities[NEUTRAL_PATHS].sum()
+        level2 = np.array([neutral, probabilities[2], probabilities[3]]) / max(subjective, 1e-12)
+        results['level2_prediction'] = LEVEL2_CLASSES[int(np.argmax(level2))]
+        results['confidence_scores']['level2'] = float(level2.max())
+        results['probability_distributions']['level2'] = [float(p) for p in level2]
+        confidence *= level2.max()
+        if results['level2_prediction'] == 'NEUTRAL':
+            level3 = probabilities[NEUTRAL_PATHS] / max(neutral, 1e-12)
+            results['level3_prediction'] = LEVEL3_CLASSES[int(np.argmax(level3))]
+            results['confidence_scores']['level3'] = float(level3.max())
+            results['probability_distributions']['level3'] = [float(p) for p in level3]
+            confidence *= level3.max()
+    levels = (results['level1_prediction'], results['level2_prediction'], results['level3_prediction'])
+    results['final_classification'] = ' -> '.join(level for level in levels if level)
+    results['first_tier'] = {'confidence': float(confidence)}
+    return results
+
+
+class FirstTierModel:
+    """
+    Softmax regression over hashed features
+
+    Args:
+        weights: (n_features, len(PATHS)) float32
+        bias: (len(PATHS),) float32
+        threshold: confidence from which a result skips the ensemble
+    """
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, threshold: float = DEFAULT_THRESHOLD):
+        if weights.shape[1] != len(PATHS) or bias.shape != (len(PATHS),):
+            raise ValueError(f"Expected weights for {len(PATHS)} paths, got {weights.shape} and {bias.shape}")
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.threshold = float(threshold)
+
+    @property
+    def n_features(self) -> int:
+        return self.weights.shape[0]
+
+    @classmethod
+    def load(cls, path: str) -> 'FirstTierModel':
+        with np.load(path) as data:
+            return cls(data['weights'], data['bias'], float(data['threshold']))
+
+    def save(self, path: str):
+        """Write the model; a worker loading it sees the old or the new file, never a partial one"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, weights=self.weights, bias=self.bias, threshold=np.float32(self.threshold))
+        os.replace(tmp_path, path)
+
+    def logits(self, texts: List[str]) -> np.ndarray:
+        indptr, columns, values = featurize(texts, self.n_features)
+        rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+        scores = np.tile(self.bias, (len(texts), 1))
+        np.add.at(scores, rows, self.weights[columns] * values[:, None])
+        return scores
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """(n_texts, len(PATHS)) path probabilities"""
+        if not texts:
+            return np.zeros((0, len(PATHS)), dtype=np.float32)
+        scores = self.logits(texts)
+        scores -= scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def confidences(self, texts: List[str]) -> Tuple[np.ndarray, List[Dict]]:
+        """(confidence of the decoded path, decoded results) for each text"""
+        decoded = [path_results(probabilities) for probabilities in self.predict_proba(texts)]
+        return np.array([results['first_tier']['confidence'] for results in decoded]), decoded
+
+
+def labeled_paths(df) -> Tuple[List[str], np.ndarray]:
+    """(texts, path classes) of the Task-1 dataframe rows with complete labels (text, level_1, level_2, level_3)"""
+    import pandas as pd
+
+    df = df.dropna(subset=['text', 'level_1'])
+    level2 = pd.to_numeric(df['level_2'], errors='coerce').to_numpy()
+    level3 = pd.to_numeric(df['level_3'], errors='coerce').to_numpy()
+    targets = [path_index(int(l1), l2, l3) for l1, l2, l3 in zip(df['level_1'].astype(int), level2, level3)]
+    keep = np.array([target is not None for target in targets], dtype=bool)
+    texts = df['text'].astype(str).to_numpy()[keep].tolist()
+    return texts, np.array([target for target in targets if target is not None], dtype=np.int64)
+
+
+def fit(texts: List[str], targets: np.ndarray, n_features: int = DEFAULT_FEATURES, C: float = 10.0,
+        max_iter: int = 200) -> FirstTierModel:
+    """Fit the softmax regression (scikit-learn, offline only) and return it as a FirstTierModel"""
+    from scipy.sparse import csr_matrix
+    from sklearn.linear_model import LogisticRegression
+
+    indptr, columns, values = featurize(texts, n_features)
+    features = csr_matrix((values, columns, indptr), shape=(len(texts), n_features))
+    classifier = LogisticRegression(C=C, max_iter=max_iter)
+    classifier.fit(features, targets)
+
+    coef, intercept = classifier.coef_, classifier.intercept_
+    if len(classifier.classes_) == 2:
+        # Binary fit: p(second class) = sigmoid(z) = softmax([0, z])
+        coef = np.vstack([np.zeros_like(coef[0]), coef[0]])
+        intercept = np.array([0.0, intercept[0]])
+    # Paths absent from the training data get a logit no text can overcome
+    weights = np.zeros((n_features, len(PATHS)), dtype=np.float32)
+    bias = np.full(len(PATHS), -30.0, dtype=np.float32)
+    for column, path in enumerate(classifier.classes_):
+        weights[:, path] = coef[column]
+        bias[path] = intercept[column]
+    return FirstTierModel(weights, bias)
+
+
+def sweep(confidences: np.ndarray, correct: np.ndarray, thresholds: Sequence[float]) -> List[Dict]:
+    """
+    Escalation rate and accuracy of the accepted texts for each threshold
+
+    Args:
+        confidences: confidence of the first tier for each text
+        correct: whether its answer matches the reference (gold labels or the ensemble)
+    """
+    rows = []
+    for threshold in thresholds:
+        accepted = confidences >= threshold
+        rows.append({
+            'threshold': float(threshold),
+            'escalation_rate': float(1.0 - accepted.mean()) if len(accepted) else 1.0,
+            'accepted': int(accepted.sum()),
+            'accepted_accuracy': float(correct[accepted].mean()) if accepted.any() else None,
+        })
+    return rows
+
+
+def choose_threshold(rows: List[Dict], target_accuracy: float) -> float:
+    """Lowest threshold whose accepted texts reach target_accuracy (1.0, i.e. always escalate, if none does)"""
+    for row in sorted(rows, key=lambda row: row['threshold']):
+        if row['accepted_accuracy'] is not None and row['accepted_accuracy'] >= target_accuracy:
+            return row['threshold']
+    return 1.0
@@ -0,0 +1,122 @@
+"""
+Deterministic hashing tokenizer for the no-transformers fallback path.
+
+Words are mapped to ids with a 64-bit FNV-1a hash computed over their UTF-8
+bytes, so the same text always gets the same ids in every process, gunicorn
+worker and restart (unlike Python's salted ``hash()``). A whole batch is
+encoded with NumPy array operations: each distinct word is hashed once, column
+by column over a byte matrix, and the padded id / mask matrices are filled with
+a single scatter.
+"""
+
+import re
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+
+FNV_OFFSET_BASIS = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+
+
+def fnv1a_64(words: np.ndarray) -> np.ndarray:
+    """
+    Vectorized 64-bit FNV-1a hash of an array of strings
+
+    Args:
+        words: 1-D array of str
+
+    Returns:
+        uint64 array of hashes, one per word
+    """
+    if len(words) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    encoded = np.char.encode(words.astype(str), 'utf-8')
+    width = encoded.dtype.itemsize
+    byte_matrix = np.frombuffer(encoded.tobytes(), dtype=np.uint8).reshape(len(words), width)
+
+    hashes = np.full(len(words), FNV_OFFSET_BASIS, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for column in range(width):
+            column_bytes = byte_matrix[:, column]
+            # Zero bytes are padding of shorter words (\w never matches NUL)
+            active = column_bytes != 0
+            if not active.any():
+                break
+            hashes[active] = (hashes[active] ^ column_bytes[active].astype(np.uint64)) * FNV_PRIME
+    return hashes
+
+
+class HashingTokenizer:
+    """
+    Word-level tokenizer with stable hashed ids
+
+    Ids fall in [offset, offset + vocab_size) so they stay clear of the special
+    token range of the DeBERTa vocabulary; padding uses pad_token_id.
+    """
+
+    def __init__(self, vocab_size: int = 50000, offset: int = 1000, max_length: int = 100, pad_token_id: int = 0):
+        self.vocab_size = vocab_size
+        self.offset = offset
+        self.max_length = max_length
+        self.pad_token_id = pad_token_id
+
+    def tokenize(self, text: str) -> List[str]:
+        """Lower-case word split used by the fallback path"""
+        return WORD_PATTERN.findall(text.strip().lower())
+
+    def _hash_texts(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(flat int64 ids of all words of all texts, words per text)"""
+        words_per_text = [self.tokenize(text) for text in texts]
+        counts = np.array([len(words) for words in words_per_text], dtype=np.int64)
+
+        all_words = np.array([word for words in words_per_text for word in words], dtype=str)
+        # Hash each distinct word once, then broadcast back to every occurrence
+        unique_words, inverse = np.unique(all_words, return_inverse=True)
+        unique_ids = (fnv1a_64(unique_words) % np.uint64(self.vocab_size)).astype(np.int64) + self.offset
+        token_ids = unique_ids[inverse.reshape(-1)] if len(all_words) else np.zeros(0, dtype=np.int64)
+        return token_ids, counts
+
+    def token_ids(self, texts: List[str]) -> List[np.ndarray]:
+        """Untruncated ids of every word of each text (for windowing long texts)"""
+        if not texts:
+            return []
+        token_ids, counts = self._hash_texts(texts)
+        return np.split(token_ids, np.cumsum(counts)[:-1])
+
+    def encode_batch(self, texts: List[str], max_length: int = None) -> Dict[str, np.ndarray]:
+        """
+        Encode a batch of texts into padded int64 id and mask matrices
+
+        Returns:
+            Dictionary with 'input_ids' and 'attention_mask' arrays of shape (batch, max_length)
+        """
+        max_length = max_length or self.max_length
+        token_ids, counts = self._hash_texts(texts)
+
+        # Scatter the first max_length ids of every text into the padded matrix
+        kept = np.minimum(counts, max_length)
+        text_starts = np.cumsum(counts) - counts
+        kept_starts = np.cumsum(kept) - kept
+        rows = np.repeat(np.arange(len(texts)), kept)
+        cols = np.arange(kept.sum()) - np.repeat(kept_starts, kept)
+        source = np.repeat(text_starts, kept) + cols
+
+        input_ids = np.full((len(texts), max_length), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(texts), max_length), dtype=np.int64)
+        input_ids[rows, cols] = token_ids[source]
+        attention_mask[rows, cols] = 1
+
+        return {'input_ids': input_ids, 'attention_mask': attention_mask}
+
+    def __call__(self, texts: Union[str, List[str]], max_length: int = None, return_tensors: str = 'pt'):
+        """Encode one text or a batch; returns torch tensors by default like a Hugging Face tokenizer"""
+        if isinstance(texts, str):
+            texts = [texts]
+        encoded = self.encode_batch(texts, max_length=max_length)
+        if return_tensors == 'pt':
+            import torch
+
+            return {key: torch.from_numpy(value) for key, value in encoded.items()}
+        return encoded
@@ -0,0 +1,147 @@
+"""
+Keyword lexicon shared by the rule-based fallback analysis and the dashboards.
+
+The word lists live in lexicon.json (or the file named by the
+SENTIMENT_LEXICON_PATH env var):
+
+    positive, negative   dashboard sentiment keywords (single words or phrases)
+    neutral              function words, drawn with low importance
+    fallback_positive,   the smaller word lists of the rule-based fallback
+    fallback_negative    analysis, kept apart from the dashboard keywords
+    question             words that make a text a question when it starts with one
+
+The keywords of a set of categories are compiled into one regex alternation
+with a named group per category, so a text is scanned once whatever the size
+of the lexicon (instead of one substring scan per keyword), and a batch of
+texts is scanned as one joined string. Keywords match whole words only ('like'
+does not match 'likely'). Single-word lookups for the dashboards go through a
+dict.
+
+The fallback analysis used to find its keywords as substrings, so whole-word
+matching changes some of its predictions: 'loved' no longer counts as 'love',
+'unhappy' no longer as 'happy', 'dislike' no longer also as 'like', and a text
+starting with 'whatever' is no longer a question ('what').
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicon.json')
+SCORED_CATEGORIES = ('positive', 'negative', 'neutral')
+FALLBACK_CATEGORIES = ('fallback_positive', 'fallback_negative')
+# Joins the texts of a batch; never part of a keyword match
+SEPARATOR = '\n'
+NEXT_TEXT = 'next_text'
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+
+class Lexicon:
+    """
+    Compiled keyword matcher
+
+    Args:
+        categories: {'positive': [...], 'negative': [...], 'neutral': [...], 'question': [...], ...}
+    """
+
+    def __init__(self, categories: Dict[str, List[str]]):
+        self.categories = {name: [word.lower() for word in categories.get(name, [])]
+                           for name in SCORED_CATEGORIES + FALLBACK_CATEGORIES + ('question',)}
+
+        # Word -> dashboard category; the first category listing a word wins, as in the regex
+        self.words = {}
+        for name in SCORED_CATEGORIES:
+            for word in self.categories[name]:
+                self.words.setdefault(word, name)
+
+        self._patterns = {names: self._compile(names) for names in (SCORED_CATEGORIES, FALLBACK_CATEGORIES)}
+
+        questions = sorted(self.categories['question'], key=len, reverse=True)
+        self.question_pattern = re.compile(
+            rf"^\s*(?:{'|'.join(re.escape(word) for word in questions)})\b") if questions else None
+
+    def _compile(self, names: Sequence[str]) -> re.Pattern:
+        """One alternation over the keywords of the categories names, a named group per category"""
+        owners = {}
+        for name in names:
+            for word in self.categories[name]:
+                owners.setdefault(word, name)
+
+        # Longest keywords first, so a phrase wins over the word it starts with
+        groups = []
+        for name in names:
+            keywords = sorted((word for word, owner in owners.items() if owner == name), key=len, reverse=True)
+            if keywords:
+                groups.append(f"(?P<{name}>{'|'.join(re.escape(word) for word in keywords)})")
+        # The separator between the texts of a batch is matched too, to move on to the next text
+        alternatives = [f"(?P<{NEXT_TEXT}>{re.escape(SEPARATOR)})"]
+        if groups:
+            alternatives.append(rf"\b(?:{'|'.join(groups)})\b")
+        return re.compile('|'.join(alternatives))
+
+    @classmethod
+    def from_file(cls, path: str) -> 'Lexicon':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def sentiment(self, word: str) -> str:
+        """'positive', 'negative' or 'neutral' for one lower-cased word"""
+        category = self.words.get(word)
+        return category if category in ('positive', 'negative') else 'neutral'
+
+    def is_function_word(self, word: str) -> bool:
+        return self.words.get(word) == 'neutral'
+
+    def is_question(self, text: str) -> bool:
+        """Starts with a question word or contains a question mark"""
+        text = text.lower()
+        return '?' in text or (self.question_pattern is not None and bool(self.question_pattern.match(text)))
+
+    def score(self, text: str, categories: Sequence[str] = SCORED_CATEGORIES,
+              distinct: bool = False) -> Dict[str, int]:
+        """Keyword occurrences per category (see score_batch)"""
+        return self.score_batch([text], categories, distinct)[0]
+
+    def score_batch(self, texts: List[str], categories: Sequence[str] = SCORED_CATEGORIES,
+                    distinct: bool = False) -> List[Dict[str, int]]:
+        """
+        Keyword occurrences per category for each text, all texts scanned in one pass
+
+        Args:
+            categories: SCORED_CATEGORIES (dashboards) or FALLBACK_CATEGORIES
+            distinct: count the distinct keywords present instead of every occurrence
+        """
+        categories = tuple(categories)
+        scores = [dict.fromkeys(categories, 0) for _ in texts]
+        if not texts:
+            return scores
+        pattern = self._patterns[categories]
+        joined = SEPARATOR.join(text.replace(SEPARATOR, ' ').lower() for text in texts)
+        index = 0
+        seen = set()
+        for match in pattern.finditer(joined):
+            if match.lastgroup == NEXT_TEXT:
+                index += 1
+                seen = set()
+            elif not distinct or match.group() not in seen:
+                seen.add(match.group())
+                scores[index][match.lastgroup] += 1
+        return scores
+
+
+def get_lexicon() -> Lexicon:
+    """Process-wide lexicon, compiled on first use"""
+    global _lexicon
+    with _lexicon_lock:
+        if _lexicon is None:
+            path = os.environ.get('SENTIMENT_LEXICON_PATH') or DEFAULT_PATH
+            _lexicon = Lexicon.from_file(path)
+            logger.info(f"✓ Lexicon loaded from {path} ({len(_lexicon.words)} words)")
+        return _lexicon
@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment.model_registry import current_version, list_versions, load_version, set_current_version
+
+
+class Command(BaseCommand):
+    help = ('Check a model version (models/<version>/LevelN/FoldM/model.pth) and make it the served one; '
+            'running workers swap to it in the background without a restart')
+
+    def add_arguments(self, parser):
+        parser.add_argument('version', nargs='?', help='Version to activate (omit to list installed versions)')
+        parser.add_argument('--models-dir', type=str, default=settings.MODELS_DIR, help='Models directory path')
+        parser.add_argument('--skip-check', action='store_true',
+                            help='Do not load and warm up the version here before activating it')
+
+    def handle(self, *args, **options):
+        models_dir = options['models_dir']
+        versions = list_versions(models_dir)
+        active = current_version(models_dir)
+
+        if not options['version']:
+            if not versions:
+                self.stdout.write(f"No model versions in {models_dir} (unversioned layout is served)")
+            for version in versions:
+                self.stdout.write(f"{'*' if version == active else ' '} {version}")
+            return
+
+        version = options['version']
+        if version not in versions:
+            raise CommandError(f"No model version '{version}' in {models_dir} (installed: {', '.join(versions) or 'none'})")
+        if version == active:
+            self.stdout.write(f"Model version {version} is already active")
+            return
+
+        if not options['skip_check']:
+            self.stdout.write(f"Loading and warming up {version}...")
+            started = time.perf_counter()
+            try:
+                analyzer = load_version(version, models_dir)
+            except Exception as e:
+                raise CommandError(f"Model version {version} is not usable, CURRENT unchanged: {e}")
+            loaded = {level: len(models) for level, models in analyzer.models.items()}
+            self.stdout.write(f"Loaded {loaded} in {time.perf_counter() - started:.1f}s")
+
+        set_current_version(version, models_dir)
+        self.stdout.write(self.style.SUCCESS(
+            f"Activated model version {version} (was {active or 'unversioned'}); workers swap within "
+            f"{settings.MODEL_VERSION_CHECK_INTERVAL:g}s"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment import archive, export
+
+
+class Command(BaseCommand):
+    help = 'Move analyses older than N days into date-partitioned zstd Parquet files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, required=True, help='Keep this many days in the database')
+        parser.add_argument('--archive-dir', type=str, default=None, help='Defaults to settings.ANALYSIS_ARCHIVE_DIR')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows read/deleted per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be archived')
+
+    def handle(self, *args, **options):
+        if not export.PYARROW_AVAILABLE:
+            raise CommandError("Archiving requires pyarrow (pip install pyarrow)")
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1")
+
+        archived = archive.archive_older_than(
+            options['days'], options['archive_dir'], options['batch_size'], dry_run=options['dry_run'],
+        )
+        for day, count in archived.items():
+            self.stdout.write(f"  {day}: {count} analyses")
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {sum(archived.values())} analyses from {len(archived)} days"))
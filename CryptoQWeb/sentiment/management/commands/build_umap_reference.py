@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment.umap_reference import reference_dir, select_reference_samples, fit_reference
+
+
+class Command(BaseCommand):
+    help = 'Embed labeled training samples and fit the per-level UMAP reference projection (offline, run once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('data', type=str, help='Task-1 training CSV (text, level_1, level_2, level_3)')
+        parser.add_argument('--models-dir', type=str, default=settings.MODELS_DIR, help='Models directory path')
+        parser.add_argument('--samples-per-class', type=int, default=200, help='Reference points per class')
+        parser.add_argument('--n-neighbors', type=int, default=15, help='UMAP n_neighbors')
+        parser.add_argument('--min-dist', type=float, default=0.1, help='UMAP min_dist')
+
+    def handle(self, *args, **options):
+        try:
+            import pandas as pd
+            import umap  # noqa: F401
+            import sentence_transformers  # noqa: F401
+        except ImportError as e:
+            raise CommandError(f"pandas, umap-learn and sentence-transformers are required: {e}")
+
+        df = pd.read_csv(options['data'])
+        missing = {'text', 'level_1', 'level_2', 'level_3'} - set(df.columns)
+        if missing:
+            raise CommandError(f"Missing columns in {options['data']}: {sorted(missing)}")
+
+        output_dir = reference_dir(options['models_dir'])
+        samples = select_reference_samples(df, options['samples_per_class'])
+        counts = fit_reference(samples, output_dir, n_neighbors=options['n_neighbors'], min_dist=options['min_dist'])
+        for level, count in counts.items():
+            self.stdout.write(f"  {level}: {count} reference points")
+        self.stdout.write(self.style.SUCCESS(f"UMAP reference saved to {output_dir}"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment.ann_index import get_similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the similar-posts IVF index from the current analysis vectors (run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nlist', type=int, default=None, help='Number of inverted lists (default ~4*sqrt(N))')
+
+    def handle(self, *args, **options):
+        index = get_similarity_index()
+        if index is None:
+            raise CommandError("No analysis vectors stored yet (or ANALYSIS_VECTOR_STORE_ENABLED is False)")
+        manifest = index.compact(options['nlist'])
+        if manifest is None:
+            raise CommandError("Another process is compacting the index")
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {manifest['count']} vectors in {manifest['nlist']} lists ({index.directory})"))
@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment import export
+from sentiment.pagination import parse_platform, parse_time_range
+
+
+class Command(BaseCommand):
+    help = 'Stream analyses to a CSV or Parquet file (constant memory, server-side cursor)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help="Output file path ('-' for stdout, CSV only)")
+        parser.add_argument('--format', choices=export.FORMATS, default=None, help='Defaults to the output file extension')
+        parser.add_argument('--platform', type=str, default='', help='Only export this platform')
+        parser.add_argument('--since', type=str, default='', help='ISO date/datetime, inclusive')
+        parser.add_argument('--until', type=str, default='', help='ISO date/datetime, exclusive')
+        parser.add_argument('--chunk-size', type=int, default=export.DEFAULT_CHUNK_SIZE, help='Rows fetched and written per chunk')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file_format = options['format'] or ('parquet' if output.endswith('.parquet') else 'csv')
+        try:
+            queryset = export.export_queryset(parse_platform(options), **parse_time_range(options))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunk_size = options['chunk_size']
+        counter = {'rows': 0}
+
+        def counted_rows():
+            for row in export.iter_rows(queryset, chunk_size):
+                counter['rows'] += 1
+                yield row
+
+        if file_format == 'parquet':
+            if output == '-':
+                raise CommandError("Parquet output needs a file path")
+            if not export.PYARROW_AVAILABLE:
+                raise CommandError("Parquet export requires pyarrow (pip install pyarrow)")
+            export.write_parquet(counted_rows(), output, chunk_size)
+        else:
+            stream = sys.stdout if output == '-' else open(output, 'w', newline='', encoding='utf-8')
+            try:
+                for text in export.iter_csv(counted_rows(), chunk_size):
+                    stream.write(text)
+            finally:
+                if stream is not sys.stdout:
+                    stream.close()
+
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS(f"Exported {counter['rows']} analyses to {output}"))
@@ -0,0 +1,117 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment.ai_analyzer import SentimentAnalyzer
+from sentiment.first_tier import MODEL_FILE, PATHS, FirstTierModel, labeled_paths, sweep
+from sentiment.model_registry import current_version
+
+THRESHOLDS = '0.5,0.6,0.7,0.8,0.85,0.9,0.95,0.97,0.99'
+
+
+class Command(BaseCommand):
+    help = ('Compare the first tier with the DeBERTa ensemble on a CSV of texts: escalation rate, agreement '
+            'and compute per confidence threshold (plus accuracy when the CSV has Task-1 labels)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('data', type=str, help='CSV with a text column (level_1, level_2, level_3 optional)')
+        parser.add_argument('--models-dir', type=str, default=settings.MODELS_DIR, help='Models directory path')
+        parser.add_argument('--model-version', type=str, default=None, help='Model version (default: the CURRENT one)')
+        parser.add_argument('--limit', type=int, default=500, help='Rows to evaluate (the ensemble runs on each)')
+        parser.add_argument('--thresholds', type=str, default=THRESHOLDS, help='Comma-separated thresholds')
+        parser.add_argument('--output', type=str, default=None, help='Also write the report as JSON here')
+
+    def handle(self, *args, **options):
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise CommandError(f"pandas is required: {e}")
+        try:
+            thresholds = [float(value) for value in options['thresholds'].split(',')]
+        except ValueError:
+            raise CommandError(f"Invalid thresholds: {options['thresholds']}")
+
+        df = pd.read_csv(options['data'])
+        if 'text' not in df.columns:
+            raise CommandError(f"No text column in {options['data']}")
+        df = df.dropna(subset=['text']).head(options['limit'])
+        gold = None
+        if {'level_1', 'level_2', 'level_3'} <= set(df.columns):
+            texts, targets = labeled_paths(df)
+            gold = [' -> '.join(level for level in PATHS[target] if level) for target in targets]
+        else:
+            texts = df['text'].astype(str).tolist()
+        if not texts:
+            raise CommandError(f"No texts to evaluate in {options['data']}")
+
+        version = options['model_version'] or current_version(options['models_dir'])
+        # Threshold 1: the analyzer always escalates, i.e. serves the plain ensemble
+        analyzer = SentimentAnalyzer(models_dir=options['models_dir'], version=version, first_tier_threshold=1.0)
+        path = os.path.join(analyzer.checkpoints_dir, MODEL_FILE)
+        if not os.path.exists(path):
+            raise CommandError(f"No first tier at {path} (run 'manage.py train_first_tier')")
+        model = FirstTierModel.load(path)
+        if not analyzer.warm_up():
+            raise CommandError(f"No ensemble checkpoints could be loaded from {analyzer.checkpoints_dir}")
+
+        started = time.perf_counter()
+        confidences, decoded = model.confidences(texts)
+        tier_seconds = time.perf_counter() - started
+
+        self.stdout.write(f"Running the ensemble on {len(texts)} texts...")
+        ensemble, ensemble_seconds = [], []
+        for text in texts:
+            started = time.perf_counter()
+            ensemble.append(analyzer.analyze(text)['final_classification'])
+            ensemble_seconds.append(time.perf_counter() - started)
+        ensemble_seconds = np.array(ensemble_seconds)
+
+        first_tier = [results['final_classification'] for results in decoded]
+        agrees = np.array([tier == reference for tier, reference in zip(first_tier, ensemble)])
+        rows = sweep(confidences, agrees, thresholds)
+        for row in rows:
+            accepted = confidences >= row['threshold']
+            row['agreement'] = row.pop('accepted_accuracy')
+            # Answered texts keep the first-tier result, the others the ensemble's
+            row['cascade_agreement'] = float(np.mean(~accepted | agrees))
+            row['compute'] = float((tier_seconds + ensemble_seconds[~accepted].sum()) / ensemble_seconds.sum())
+            if gold is not None:
+                cascade = [tier if answered else reference
+                           for tier, reference, answered in zip(first_tier, ensemble, accepted)]
+                row['cascade_accuracy'] = float(np.mean([label == reference for label, reference in zip(cascade, gold)]))
+
+        report = {
+            'texts': len(texts),
+            'model_threshold': model.threshold,
+            'first_tier_ms': round(1000 * tier_seconds / len(texts), 3),
+            'ensemble_ms': round(1000 * float(ensemble_seconds.mean()), 1),
+            'sweep': rows,
+        }
+        if gold is not None:
+            report['ensemble_accuracy'] = float(np.mean([label == reference for label, reference in zip(ensemble, gold)]))
+            report['first_tier_accuracy'] = float(np.mean([label == reference for label, reference in zip(first_tier, gold)]))
+
+        self.stdout.write(f"First tier {report['first_tier_ms']} ms/text, ensemble {report['ensemble_ms']} ms/text; "
+                          f"model threshold {model.threshold:.2f}")
+        if gold is not None:
+            self.stdout.write(f"Accuracy: ensemble {report['ensemble_accuracy']:.3f}, "
+                              f"first tier alone {report['first_tier_accuracy']:.3f}")
+        header = f"{'threshold':>10} {'escalated':>10} {'agreement':>10} {'cascade agr':>12} {'compute':>8}"
+        self.stdout.write(header + (f" {'cascade acc':>12}" if gold is not None else ''))
+        for row in rows:
+            agreement = f"{row['agreement']:.3f}" if row['agreement'] is not None else '-'
+            line = (f"{row['threshold']:>10.2f} {row['escalation_rate']:>10.1%} {agreement:>10} "
+                    f"{row['cascade_agreement']:>12.3f} {row['compute']:>8.1%}")
+            if gold is not None:
+                line += f" {row['cascade_accuracy']:>12.3f}"
+            self.stdout.write(line)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
@@ -0,0 +1,70 @@
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Must only be imported on the first inference or visualization, never at startup
+HEAVY_MODULES = (
+    'torch', 'transformers', 'sentence_transformers', 'umap', 'numba', 'sklearn',
+    'plotly', 'wordcloud', 'matplotlib', 'pyarrow', 'pandas', 'joblib',
+)
+DEFAULT_TARGET = 'sentiment.urls'
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|\s+(\S+)$')
+
+
+class Command(BaseCommand):
+    help = 'Show what importing the app costs at startup, per module (python -X importtime in a fresh process)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', type=str, default=DEFAULT_TARGET,
+                            help=f'Module imported after django.setup() (default {DEFAULT_TARGET})')
+        parser.add_argument('--limit', type=int, default=25, help='Number of slowest modules to list')
+        parser.add_argument('--fail-on-heavy', action='store_true',
+                            help='Exit with an error if an ML/visualization module is imported at startup')
+
+    def handle(self, *args, **options):
+        code = (
+            "import django; django.setup(); "
+            f"import importlib; importlib.import_module({options['target']!r})"
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'CryptoQWeb.settings')}
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=str(settings.BASE_DIR),
+                                env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(f"Importing {options['target']} failed:\n{result.stderr[-2000:]}")
+
+        # (self µs, cumulative µs, module) in import order
+        modules = []
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                modules.append((int(match.group(1)), int(match.group(2)), match.group(3)))
+        if not modules:
+            raise CommandError("No import timings were reported")
+
+        total = sum(module[0] for module in modules)
+        self.stdout.write(f"{len(modules)} modules imported in {total / 1000:.0f} ms for django.setup() + "
+                          f"{options['target']}\n")
+
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for self_us, cumulative_us, name in sorted(modules, key=lambda module: -module[1])[:options['limit']]:
+            self.stdout.write(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+        # Top-level packages and the time spent in all of their submodules
+        package_us = {}
+        for self_us, _, name in modules:
+            package = name.split('.')[0]
+            package_us[package] = package_us.get(package, 0) + self_us
+        heavy = {package: package_us[package] for package in HEAVY_MODULES if package in package_us}
+
+        self.stdout.write('')
+        if not heavy:
+            self.stdout.write(self.style.SUCCESS("✓ No ML/visualization modules imported at startup"))
+            return
+        for package, self_us in sorted(heavy.items(), key=lambda item: -item[1]):
+            self.stdout.write(self.style.WARNING(f"✗ {package} imported at startup ({self_us / 1000:.0f} ms)"))
+        if options['fail_on_heavy']:
+            raise CommandError(f"Heavy modules imported at startup: {', '.join(sorted(heavy))}")
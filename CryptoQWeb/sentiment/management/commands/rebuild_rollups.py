@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from sentiment.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the hourly/daily SentimentRollup counts from all SentimentAnalysis rows'
+
+    def handle(self, *args, **options):
+        buckets = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} rollup buckets"))
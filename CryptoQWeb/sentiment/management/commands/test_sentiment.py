@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from sentiment.ai_analyzer import SentimentAnalyzer
 
@@ -5,28 +6,36 @@ class Command(BaseCommand):
     help = 'Test the sentiment analyzer with sample text'
 
     def add_arguments(self, parser):
-        parser.add_argument('--text', type=str, help='Text to analyze')
-        parser.add_argument('--models-dir', type=str, default='models', help='Models directory path')
+        parser.add_argument('--text', type=str, action='append',
+                            help='Text to analyze (repeat to analyze several texts as one batch)')
+        parser.add_argument('--models-dir', type=str, default=settings.MODELS_DIR, help='Models directory path')
+        parser.add_argument('--model-type', type=str, choices=['ensemble', 'multihead'], default=None,
+                            help='Model type (defaults to SENTIMENT_MODEL_TYPE or ensemble)')
+        parser.add_argument('--window', type=int, default=None,
+                            help='Long-text mode window in tokens (defaults to SENTIMENT_LONG_TEXT_WINDOW; 0 = truncate)')
+        parser.add_argument('--overlap', type=int, default=None,
+                            help='Tokens shared by consecutive windows (defaults to SENTIMENT_LONG_TEXT_OVERLAP)')
 
     def handle(self, *args, **options):
-        text = options.get('text', 'This is a great cryptocurrency! I love Bitcoin.')
-        
-        self.stdout.write(f"Testing sentiment analyzer with text: '{text}'")
+        texts = options.get('text') or ['This is a great cryptocurrency! I love Bitcoin.']
         
         try:
-            analyzer = SentimentAnalyzer(models_dir=options['models_dir'])
-            results = analyzer.analyze(text)
+            analyzer = SentimentAnalyzer(models_dir=options['models_dir'], model_type=options['model_type'],
+                                         window=options['window'], overlap=options['overlap'])
+            batch = analyzer.analyze_batch(texts)
             
             self.stdout.write(self.style.SUCCESS("Analysis completed successfully!"))
-            self.stdout.write(f"Final Classification: {results['final_classification']}")
-            self.stdout.write(f"Level 1: {results.get('level1_prediction', 'N/A')}")
-            self.stdout.write(f"Level 2: {results.get('level2_prediction', 'N/A')}")
-            self.stdout.write(f"Level 3: {results.get('level3_prediction', 'N/A')}")
-            
-            if results.get('confidence_scores'):
-                self.stdout.write("Confidence Scores:")
-                for level, score in results['confidence_scores'].items():
-                    self.stdout.write(f"  {level}: {score:.3f}")
+            for text, results in zip(texts, batch):
+                self.stdout.write(f"\nText: '{text}'")
+                self.stdout.write(f"Final Classification: {results['final_classification']}")
+                self.stdout.write(f"Level 1: {results.get('level1_prediction', 'N/A')}")
+                self.stdout.write(f"Level 2: {results.get('level2_prediction', 'N/A')}")
+                self.stdout.write(f"Level 3: {results.get('level3_prediction', 'N/A')}")
+                
+                if results.get('confidence_scores'):
+                    self.stdout.write("Confidence Scores:")
+                    for level, score in results['confidence_scores'].items():
+                        self.stdout.write(f"  {level}: {score:.3f}")
                     
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Error: {e}"))
@@ -0,0 +1,85 @@
+import json
+import os
+
+import numpy as np
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment.first_tier import (DEFAULT_FEATURES, MODEL_FILE, PATHS, choose_threshold, fit, labeled_paths,
+                                  sweep)
+from sentiment.model_registry import current_version
+
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.97, 0.99]
+
+
+class Command(BaseCommand):
+    help = ('Train the linear first tier that answers easy texts before the DeBERTa ensemble, '
+            'and pick its confidence threshold on the validation split (offline, run once per model version)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('data', type=str, help='Task-1 training CSV (text, level_1, level_2, level_3)')
+        parser.add_argument('--val', type=str, default=None,
+                            help='Task-1 validation CSV (default: hold out --val-fraction of the training rows)')
+        parser.add_argument('--val-fraction', type=float, default=0.1, help='Held-out fraction without --val')
+        parser.add_argument('--models-dir', type=str, default=settings.MODELS_DIR, help='Models directory path')
+        parser.add_argument('--model-version', type=str, default=None,
+                            help='Model version to install into (default: the CURRENT one, if any)')
+        parser.add_argument('--n-features', type=int, default=DEFAULT_FEATURES, help='Hashed feature columns')
+        parser.add_argument('--C', type=float, default=10.0, help='Inverse L2 regularization strength')
+        parser.add_argument('--target-accuracy', type=float, default=0.9,
+                            help='Validation accuracy the answered texts must reach at the chosen threshold')
+        parser.add_argument('--report', type=str, default=None, help='Also write the threshold sweep as JSON here')
+
+    def handle(self, *args, **options):
+        try:
+            import pandas as pd
+            import sklearn  # noqa: F401
+        except ImportError as e:
+            raise CommandError(f"pandas and scikit-learn are required: {e}")
+
+        frames = {'train': pd.read_csv(options['data'])}
+        if options['val']:
+            frames['val'] = pd.read_csv(options['val'])
+        for name, df in frames.items():
+            missing = {'text', 'level_1', 'level_2', 'level_3'} - set(df.columns)
+            if missing:
+                raise CommandError(f"Missing columns in the {name} CSV: {sorted(missing)}")
+        if 'val' not in frames:
+            val = frames['train'].sample(frac=options['val_fraction'], random_state=42)
+            frames = {'train': frames['train'].drop(val.index), 'val': val}
+
+        train_texts, train_targets = labeled_paths(frames['train'])
+        val_texts, val_targets = labeled_paths(frames['val'])
+        if not train_texts or not val_texts:
+            raise CommandError("No rows with complete labels to train or validate on")
+        self.stdout.write(f"Training on {len(train_texts)} rows, validating on {len(val_texts)}...")
+
+        model = fit(train_texts, train_targets, n_features=options['n_features'], C=options['C'])
+        confidences, decoded = model.confidences(val_texts)
+        gold = [' -> '.join(level for level in PATHS[target] if level) for target in val_targets]
+        correct = np.array([results['final_classification'] == label for results, label in zip(decoded, gold)])
+        rows = sweep(confidences, correct, THRESHOLDS)
+        model.threshold = choose_threshold(rows, options['target_accuracy'])
+
+        self.stdout.write(f"Validation accuracy on every text: {correct.mean():.3f}")
+        self.stdout.write(f"{'threshold':>10} {'escalated':>10} {'answered':>9} {'accuracy':>9}")
+        for row in rows:
+            accuracy = f"{row['accepted_accuracy']:.3f}" if row['accepted_accuracy'] is not None else '-'
+            self.stdout.write(f"{row['threshold']:>10.2f} {row['escalation_rate']:>10.1%} "
+                              f"{row['accepted']:>9} {accuracy:>9}")
+
+        version = options['model_version'] or current_version(options['models_dir'])
+        path = os.path.join(options['models_dir'], version or '', MODEL_FILE)
+        model.save(path)
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump({'validation_accuracy': float(correct.mean()), 'threshold': model.threshold,
+                           'sweep': rows}, f, indent=2)
+
+        if model.threshold >= 1:
+            self.stdout.write(self.style.WARNING(
+                f"No threshold reaches {options['target_accuracy']:.0%} accuracy; every text will be escalated"))
+        self.stdout.write(self.style.SUCCESS(
+            f"First tier saved to {path} (threshold {model.threshold:.2f}); workers load it when they "
+            f"restart or swap to this model version"))
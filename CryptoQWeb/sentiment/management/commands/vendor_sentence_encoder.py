@@ -0,0 +1,32 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment.embedding_service import EMBEDDING_MODEL, encoder_dir
+
+
+class Command(BaseCommand):
+    help = 'Download the sentence-embedding model into models/sentence_encoder (build time only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models-dir', type=str, default=settings.MODELS_DIR, help='Models directory path')
+        parser.add_argument('--force', action='store_true', help='Re-download even if already vendored')
+
+    def handle(self, *args, **options):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise CommandError(f"sentence-transformers is required to vendor the encoder: {e}")
+
+        target = encoder_dir(options['models_dir'])
+        if os.path.isdir(target) and os.listdir(target) and not options['force']:
+            self.stdout.write(f"Sentence encoder already vendored in {target}")
+            return
+
+        self.stdout.write(f"Downloading {EMBEDDING_MODEL} to {target}")
+        model = SentenceTransformer(EMBEDDING_MODEL, device='cpu')
+        os.makedirs(target, exist_ok=True)
+        model.save(target)
+        self.stdout.write(self.style.SUCCESS(
+            f"Vendored {EMBEDDING_MODEL} ({model.get_sentence_embedding_dimension()}-d) in {target}"))
@@ -0,0 +1,70 @@
+import os
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment.tokenizer_store import (
+    TOKENIZER_NAME, MANIFEST_NAME, COMMIT_SHA, PIN_FILE, tokenizer_dir, read_manifest,
+    pinned_revision, pin_revision,
+)
+
+
+class Command(BaseCommand):
+    help = 'Download the pinned DeBERTa tokenizer and encoder config into models/tokenizer (build time only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models-dir', type=str, default=settings.MODELS_DIR, help='Models directory path')
+        parser.add_argument('--revision', type=str, default=None,
+                            help='Hugging Face commit sha to vendor and pin (default: the pinned commit)')
+        parser.add_argument('--force', action='store_true', help='Re-download even if already vendored')
+
+    def handle(self, *args, **options):
+        try:
+            pinned = pinned_revision()
+        except ValueError as e:
+            raise CommandError(str(e))
+        revision = options['revision'] or pinned
+        if revision is None:
+            raise CommandError(f"No {TOKENIZER_NAME} commit is pinned in {PIN_FILE}; run with "
+                               f"--revision <commit sha the checkpoints were trained with> and commit the pin")
+        if not COMMIT_SHA.match(revision):
+            raise CommandError(f"--revision must be a full commit sha, not '{revision}' (branches move)")
+
+        try:
+            import transformers
+            from transformers import AutoConfig, AutoTokenizer
+        except ImportError as e:
+            raise CommandError(f"transformers is required to vendor the tokenizer: {e}")
+
+        models_dir = options['models_dir']
+        target = tokenizer_dir(models_dir)
+        manifest = read_manifest(models_dir)
+        if (manifest and manifest.get('name') == TOKENIZER_NAME and manifest.get('revision') == revision
+                and not options['force']):
+            self.stdout.write(f"Tokenizer already vendored in {target} ({revision})")
+            return
+
+        self.stdout.write(f"Downloading {TOKENIZER_NAME}@{revision} tokenizer to {target}")
+        tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME, revision=revision, use_fast=True)
+        if not tokenizer.is_fast:
+            raise CommandError("Could not build a fast tokenizer (install 'tokenizers' and 'sentencepiece')")
+        config = AutoConfig.from_pretrained(TOKENIZER_NAME, revision=revision)
+
+        os.makedirs(target, exist_ok=True)
+        tokenizer.save_pretrained(target)
+        config.save_pretrained(target)
+
+        with open(os.path.join(target, MANIFEST_NAME), 'w') as f:
+            json.dump({
+                'name': TOKENIZER_NAME,
+                'revision': revision,
+                'transformers_version': transformers.__version__,
+                'vocab_size': len(tokenizer),
+            }, f, indent=2)
+
+        if revision != pinned:
+            pin_revision(revision)
+            self.stdout.write(self.style.WARNING(
+                f"Pinned {TOKENIZER_NAME}@{revision} in {PIN_FILE}; commit it so every build vendors this commit"))
+        self.stdout.write(self.style.SUCCESS(f"Vendored {TOKENIZER_NAME}@{revision} in {target}"))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sentiment', '0002_sentimentanalysis_platform'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sentimentanalysis',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Earlier analysis whose prediction was reused for this near-duplicate text', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='near_duplicates', to='sentiment.sentimentanalysis'),
+        ),
+    ]
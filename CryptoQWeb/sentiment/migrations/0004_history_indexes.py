@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sentiment', '0003_sentimentanalysis_duplicate_of'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='sentimentanalysis',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'Sentiment Analysis', 'verbose_name_plural': 'Sentiment Analyses'},
+        ),
+        migrations.AddIndex(
+            model_name='sentimentanalysis',
+            index=models.Index(fields=['-created_at', '-id'], name='analysis_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentimentanalysis',
+            index=models.Index(fields=['platform', '-created_at', '-id'], name='analysis_platform_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentimentanalysis',
+            index=models.Index(fields=['level1_prediction', '-created_at', '-id'], name='analysis_level1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentimentanalysis',
+            index=models.Index(fields=['level2_prediction', '-created_at', '-id'], name='analysis_level2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentimentanalysis',
+            index=models.Index(fields=['level3_prediction', '-created_at', '-id'], name='analysis_level3_idx'),
+        ),
+    ]
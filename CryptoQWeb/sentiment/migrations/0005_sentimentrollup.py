@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:10
+
+from datetime import timezone as dt_timezone
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncHour
+
+LEVEL_FIELDS = ('level1_prediction', 'level2_prediction', 'level3_prediction')
+
+
+def build_rollups(apps, schema_editor):
+    """Count the existing analyses into HOUR and DAY buckets (a frozen copy of rollups.rebuild as of this migration)"""
+    SentimentAnalysis = apps.get_model('sentiment', 'SentimentAnalysis')
+    SentimentRollup = apps.get_model('sentiment', 'SentimentRollup')
+    db_alias = schema_editor.connection.alias
+    rollups = []
+    for granularity, trunc in (('HOUR', TruncHour), ('DAY', TruncDay)):
+        rows = (SentimentAnalysis.objects.using(db_alias)
+                .annotate(bucket=trunc('created_at', tzinfo=dt_timezone.utc))
+                .values('bucket', 'platform', *LEVEL_FIELDS)
+                .annotate(total=Count('id'))
+                .order_by())
+        for row in rows:
+            rollups.append(SentimentRollup(
+                granularity=granularity,
+                bucket_start=row['bucket'],
+                platform=row['platform'],
+                count=row['total'],
+                **{field: row[field] or '' for field in LEVEL_FIELDS},
+            ))
+    SentimentRollup.objects.using(db_alias).all().delete()
+    SentimentRollup.objects.using(db_alias).bulk_create(rollups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sentiment', '0004_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentimentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hour'), ('DAY', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField(help_text='Start of the UTC hour/day bucket')),
+                ('platform', models.CharField(max_length=20)),
+                ('level1_prediction', models.CharField(blank=True, default='', max_length=20)),
+                ('level2_prediction', models.CharField(blank=True, default='', max_length=20)),
+                ('level3_prediction', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['granularity', 'bucket_start'],
+                'indexes': [models.Index(fields=['granularity', 'platform', 'bucket_start'], name='rollup_platform_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket_start', 'platform', 'level1_prediction', 'level2_prediction', 'level3_prediction'), name='unique_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:20
+
+import uuid
+
+from django.db import migrations, models
+
+
+def populate_uids(apps, schema_editor):
+    SentimentAnalysis = apps.get_model('sentiment', 'SentimentAnalysis')
+    analyses = list(SentimentAnalysis.objects.only('id'))
+    for analysis in analyses:
+        analysis.uid = uuid.uuid4()
+    SentimentAnalysis.objects.bulk_update(analyses, ['uid'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sentiment', '0005_sentimentrollup'),
+    ]
+
+    operations = [
+        # Nullable first so existing rows can get distinct values before the unique constraint
+        migrations.AddField(
+            model_name='sentimentanalysis',
+            name='uid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_uids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='sentimentanalysis',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, help_text='Stable id handed out before the row is written (write-behind buffer)', unique=True),
+        ),
+    ]
@@ -0,0 +1,70 @@
+import logging
+
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+# Frozen copy of sentiment/search.py as of this migration; the module may change later
+FTS_TABLE = 'sentiment_analysis_fts'
+PG_INDEX = 'sentiment_text_fts_idx'
+
+SQLITE_SETUP = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='{{table}}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {{table}} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {{table}} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF text ON {{table}} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+
+def create_fulltext(apps, schema_editor):
+    conn = schema_editor.connection
+    table = apps.get_model('sentiment', 'SentimentAnalysis')._meta.db_table
+    try:
+        with transaction.atomic(using=conn.alias):
+            with conn.cursor() as cursor:
+                if conn.vendor == 'sqlite':
+                    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                    created = cursor.fetchone() is None
+                    for statement in SQLITE_SETUP:
+                        cursor.execute(statement.format(table=table))
+                    if created:
+                        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+                elif conn.vendor == 'postgresql':
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {table} USING GIN (to_tsvector('simple', text))"
+                    )
+    except DatabaseError as e:
+        # e.g. SQLite built without FTS5: search falls back to a LIKE scan
+        logger.warning(f"✗ Full-text index not available, search will scan the table: {e}")
+
+
+def drop_fulltext(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+class Migration(migrations.Migration):
+    """SQLite FTS5 table + sync triggers, or a PostgreSQL GIN tsvector index (see sentiment/search.py)"""
+
+    dependencies = [
+        ('sentiment', '0006_sentimentanalysis_uid'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext, drop_fulltext),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sentiment', '0007_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sentimentanalysis',
+            name='model_version',
+            field=models.CharField(blank=True, default='', help_text="Model registry version that produced the prediction ('fallback' for rule-based)", max_length=64),
+        ),
+    ]
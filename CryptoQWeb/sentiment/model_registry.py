@@ -0,0 +1,246 @@
+"""
+Versioned model checkpoints with hot swapping.
+
+Checkpoints of a model version live in their own directory; CURRENT names the
+version every worker should serve:
+
+    models/
+        CURRENT                         "2026-10-19" (written atomically)
+        2026-10-19/Level1/Fold1/model.pth ... Level3/Fold5/model.pth
+        2026-09-01/...
+        tokenizer, sentence encoder, ...  (shared by all versions)
+
+A tree without CURRENT (checkpoints directly in models/, as the download
+scripts write them) is served as the unversioned layout.
+
+'manage.py activate_model_version <version>' loads and warms up the version
+once to check it, then repoints CURRENT. Each worker's ModelRegistry notices
+the change (one stat() every MODEL_VERSION_CHECK_INTERVAL seconds), loads and
+warms up the new version on a background thread while the old one keeps
+serving, and swaps the two under a lock. Requests run inside lease(), so the
+retired version's weights are released once the last in-flight request
+using it has finished. A version that fails to load is retried when its
+files change (e.g. a re-uploaded checkpoint) or after
+MODEL_VERSION_RETRY_INTERVAL seconds, whichever comes first.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = 'CURRENT'
+CHECKPOINT_DIRS = ('Level1', 'Level2', 'Level3', 'MultiHead')
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def has_checkpoints(directory: str) -> bool:
+    """Whether directory holds fold checkpoints (nested LevelN/FoldM or flat levelN_foldM.pth)"""
+    if not os.path.isdir(directory):
+        return False
+    return any(
+        os.path.isdir(os.path.join(directory, name)) if name in CHECKPOINT_DIRS else name.endswith('.pth')
+        for name in os.listdir(directory)
+    )
+
+
+def list_versions(models_dir: Optional[str] = None) -> List[str]:
+    """Installed model versions, sorted by name"""
+    models_dir = models_dir or settings.MODELS_DIR
+    if not os.path.isdir(models_dir):
+        return []
+    return sorted(name for name in os.listdir(models_dir)
+                  if has_checkpoints(os.path.join(models_dir, name)))
+
+
+def current_version(models_dir: Optional[str] = None) -> Optional[str]:
+    """Version named by CURRENT (None: unversioned layout)"""
+    models_dir = models_dir or settings.MODELS_DIR
+    try:
+        with open(os.path.join(models_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def set_current_version(version: str, models_dir: Optional[str] = None):
+    """Point CURRENT at an installed version; readers see the old or the new name, never a partial one"""
+    models_dir = models_dir or settings.MODELS_DIR
+    if version not in list_versions(models_dir):
+        raise ValueError(f"No model version '{version}' in {models_dir}")
+    path = os.path.join(models_dir, CURRENT_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(version + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def version_stamp(version: Optional[str], models_dir: Optional[str] = None) -> float:
+    """Newest mtime under a version's checkpoint directories (changes when a checkpoint is added or replaced)"""
+    models_dir = models_dir or settings.MODELS_DIR
+    root = os.path.join(models_dir, version) if version else models_dir
+    if not os.path.isdir(root):
+        return 0.0
+    stamp = os.path.getmtime(root)
+    for name in CHECKPOINT_DIRS:
+        for dirpath, _, filenames in os.walk(os.path.join(root, name)):
+            for path in [dirpath] + [os.path.join(dirpath, filename) for filename in filenames]:
+                try:
+                    stamp = max(stamp, os.path.getmtime(path))
+                except OSError:
+                    pass
+    return stamp
+
+
+def load_version(version: Optional[str], models_dir: Optional[str] = None, warm_up: bool = True):
+    """A SentimentAnalyzer for a version (None: unversioned layout), optionally loaded and warmed up"""
+    from .ai_analyzer import SentimentAnalyzer
+
+    analyzer = SentimentAnalyzer(models_dir=models_dir or settings.MODELS_DIR, version=version)
+    if warm_up and not analyzer.warm_up():
+        raise RuntimeError(f"No checkpoints could be loaded for model version {version or '(unversioned)'}")
+    return analyzer
+
+
+class _Handle:
+    """An analyzer plus the number of requests currently using it"""
+
+    def __init__(self, analyzer, version: Optional[str]):
+        self.analyzer = analyzer
+        self.version = version
+        self.in_flight = 0
+        self.retired = False
+
+
+class ModelRegistry:
+    """
+    The analyzer this process serves, swapped when CURRENT changes
+
+    Args:
+        models_dir: registry root (versions, CURRENT, shared tokenizer; default settings.MODELS_DIR)
+        check_interval: seconds between checks of CURRENT (0: every call)
+        retry_interval: seconds before a version that failed to load is tried again
+    """
+
+    def __init__(self, models_dir: Optional[str] = None, check_interval: float = 10.0,
+                 retry_interval: float = 300.0):
+        self.models_dir = models_dir or settings.MODELS_DIR
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._active: Optional[_Handle] = None
+        self._loading: Optional[str] = None
+        self._failed: Optional[str] = None
+        self._failed_stamp = 0.0
+        self._failed_at = 0.0
+        self._checked_at = 0.0
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._active.version if self._active is not None else None
+
+    def analyzer(self):
+        """The analyzer to serve with (None if it could not be created)"""
+        self._maybe_swap()
+        handle = self._active
+        return handle.analyzer if handle is not None else None
+
+    @contextmanager
+    def lease(self) -> Iterator:
+        """Serve one request with the active analyzer; a swap waits for the lease before releasing it"""
+        self._maybe_swap()
+        with self._lock:
+            handle = self._active
+            if handle is not None:
+                handle.in_flight += 1
+        try:
+            yield handle.analyzer if handle is not None else None
+        finally:
+            if handle is not None:
+                with self._lock:
+                    handle.in_flight -= 1
+                    drained = handle.retired and handle.in_flight == 0
+                if drained:
+                    self._release(handle)
+
+    def _maybe_swap(self):
+        now = time.monotonic()
+        if self._active is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        wanted = current_version(self.models_dir)
+
+        if self._active is None:
+            # First use: the weights load lazily on the first analysis, as before
+            with self._lock:
+                if self._active is None:
+                    try:
+                        self._active = _Handle(load_version(wanted, self.models_dir, warm_up=False), wanted)
+                        logger.info(f"✓ Serving model version {wanted or '(unversioned)'}")
+                    except Exception as e:
+                        logger.error(f"✗ Could not create the analyzer for model version {wanted}: {e}")
+            return
+
+        with self._lock:
+            if wanted == self._active.version or wanted == self._loading:
+                return
+            if wanted == self._failed and not self._should_retry(wanted, now):
+                return
+            self._loading = wanted
+        threading.Thread(target=self._swap_in_background, args=(wanted,), name='model-swap', daemon=True).start()
+
+    def _should_retry(self, version: Optional[str], now: float) -> bool:
+        """Whether a version that failed to load has changed on disk or waited out retry_interval"""
+        if now - self._failed_at >= self.retry_interval:
+            return True
+        return version_stamp(version, self.models_dir) != self._failed_stamp
+
+    def _swap_in_background(self, version: Optional[str]):
+        started = time.perf_counter()
+        stamp = version_stamp(version, self.models_dir)
+        try:
+            analyzer = load_version(version, self.models_dir)
+        except Exception as e:
+            logger.error(f"✗ Model version {version} failed to load, still serving {self.version}: {e}")
+            with self._lock:
+                self._loading = None
+                self._failed = version
+                self._failed_stamp = stamp
+                self._failed_at = time.monotonic()
+            return
+
+        with self._lock:
+            old = self._active
+            self._active = _Handle(analyzer, version)
+            self._loading = None
+            self._failed = None
+            old.retired = True
+            drained = old.in_flight == 0
+        logger.info(f"✓ Swapped model version {old.version} -> {version} "
+                    f"(loaded and warmed up in {time.perf_counter() - started:.1f}s)")
+        if drained:
+            self._release(old)
+
+    def _release(self, handle: _Handle):
+        handle.analyzer.release()
+        logger.info(f"✓ Released model version {handle.version or '(unversioned)'}")
+
+
+def get_model_registry() -> ModelRegistry:
+    """Process-wide model registry (created on first use, i.e. after the gunicorn fork)"""
+    models_dir = settings.MODELS_DIR
+    with _registries_lock:
+        if models_dir not in _registries:
+            _registries[models_dir] = ModelRegistry(models_dir, settings.MODEL_VERSION_CHECK_INTERVAL,
+                                                    settings.MODEL_VERSION_RETRY_INTERVAL)
+        return _registries[models_dir]
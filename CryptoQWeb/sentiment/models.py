@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.utils import timezone
 
@@ -10,6 +12,8 @@ class SentimentAnalysis(models.Model):
         ('YOUTUBE', 'YouTube'),
     ]
     
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False,
+                           help_text="Stable id handed out before the row is written (write-behind buffer)")
     text = models.TextField(help_text="The input text to analyze")
     platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES, default='REDDIT', help_text="Platform source of the text")
     level1_prediction = models.CharField(max_length=20, choices=[
@@ -31,11 +35,56 @@ class SentimentAnalysis(models.Model):
     final_classification = models.CharField(max_length=100, help_text="Human-readable final classification")
     confidence_scores = models.JSONField(default=dict, help_text="Confidence scores for each level")
     created_at = models.DateTimeField(default=timezone.now)
+    duplicate_of = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='near_duplicates',
+                                     help_text="Earlier analysis whose prediction was reused for this near-duplicate text")
+    model_version = models.CharField(max_length=64, blank=True, default='',
+                                     help_text="Model registry version that produced the prediction ('fallback' for rule-based)")
     
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        # Composite (filter, created_at, id) indexes back the keyset-paginated history
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='analysis_created_idx'),
+            models.Index(fields=['platform', '-created_at', '-id'], name='analysis_platform_idx'),
+            models.Index(fields=['level1_prediction', '-created_at', '-id'], name='analysis_level1_idx'),
+            models.Index(fields=['level2_prediction', '-created_at', '-id'], name='analysis_level2_idx'),
+            models.Index(fields=['level3_prediction', '-created_at', '-id'], name='analysis_level3_idx'),
+        ]
         verbose_name = "Sentiment Analysis"
         verbose_name_plural = "Sentiment Analyses"
     
     def __str__(self):
         return f"Analysis of '{self.text[:50]}...' - {self.final_classification}"
+
+
+class SentimentRollup(models.Model):
+    """Pre-aggregated analysis counts per time bucket x platform x level predictions"""
+
+    GRANULARITY_CHOICES = [
+        ('HOUR', 'Hour'),
+        ('DAY', 'Day'),
+    ]
+
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField(help_text="Start of the UTC hour/day bucket")
+    platform = models.CharField(max_length=20)
+    # Empty string instead of NULL so the unique constraint also covers skipped levels
+    level1_prediction = models.CharField(max_length=20, blank=True, default='')
+    level2_prediction = models.CharField(max_length=20, blank=True, default='')
+    level3_prediction = models.CharField(max_length=20, blank=True, default='')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['granularity', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'platform', 'level1_prediction', 'level2_prediction', 'level3_prediction'],
+                name='unique_rollup_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'platform', 'bucket_start'], name='rollup_platform_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start:%Y-%m-%d %H:%M} {self.platform} {self.level1_prediction}/{self.level2_prediction}/{self.level3_prediction}: {self.count}"
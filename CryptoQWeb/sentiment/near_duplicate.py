@@ -0,0 +1,159 @@
+"""
+Near-duplicate detection in front of SentimentAnalyzer.
+
+Spam and shill posts arrive as near-copies that only differ in emojis, tickers,
+URLs or handles. Texts are normalized, reduced to a 64-bit SimHash over word
+shingles and looked up among recently analyzed signatures. When a stored
+signature is similar enough, its prediction is reused instead of running the
+transformer ensemble again.
+
+Lookups use LSH banding: the 64 bits are split into `max_distance + 1` bands,
+so by the pigeonhole principle any signature within `max_distance` bits shares
+at least one band value with the query, and only those candidates are compared.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from .hashing_tokenizer import fnv1a_64
+
+URL_PATTERN = re.compile(r'(https?://\S+|www\.\S+)')
+HANDLE_PATTERN = re.compile(r'@\w+')
+TICKER_PATTERN = re.compile(r'\$[a-zA-Z]{1,10}\b')
+NUMBER_PATTERN = re.compile(r'\d+([.,]\d+)*[a-z]*')
+WORD_PATTERN = re.compile(r'[a-z]+')
+
+SIGNATURE_BITS = 64
+BIT_WEIGHTS = np.uint64(1) << np.arange(SIGNATURE_BITS, dtype=np.uint64)
+
+
+def normalize_text(text: str) -> List[str]:
+    """Lower-case words with URLs, handles, tickers, numbers, emojis and punctuation removed"""
+    text = text.lower()
+    text = URL_PATTERN.sub(' ', text)
+    text = HANDLE_PATTERN.sub(' ', text)
+    text = TICKER_PATTERN.sub(' ', text)
+    text = NUMBER_PATTERN.sub(' ', text)
+    return WORD_PATTERN.findall(text)
+
+
+def simhash(words: List[str], shingle_size: int = 2) -> Optional[int]:
+    """
+    64-bit SimHash of word shingles (plus single words, so short texts still match)
+
+    Returns None for texts with no usable words.
+    """
+    if not words:
+        return None
+    features = list(words)
+    features.extend(' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1))
+    hashes = fnv1a_64(np.array(features, dtype=str))
+
+    # Per bit: +1 when the feature hash has it set, -1 otherwise
+    bits = ((hashes[:, None] >> np.arange(SIGNATURE_BITS, dtype=np.uint64)) & np.uint64(1)).astype(np.int64)
+    votes = (2 * bits - 1).sum(axis=0)
+    return int((BIT_WEIGHTS * (votes > 0).astype(np.uint64)).sum())
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateMatch(NamedTuple):
+    analysis_id: int
+    similarity: float
+    results: Dict
+
+
+class NearDuplicateIndex:
+    """
+    Bounded in-process index of recent signatures -> (analysis id, prediction)
+
+    Args:
+        threshold: minimum similarity (1 - hamming / 64) to reuse a prediction
+        capacity: number of recent signatures kept (oldest evicted first)
+        min_words: texts with fewer normalized words are never matched
+    """
+
+    def __init__(self, threshold: float = 0.9, capacity: int = 10000, min_words: int = 3):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.min_words = min_words
+        self.max_distance = int((1.0 - threshold) * SIGNATURE_BITS)
+        self.num_bands = self.max_distance + 1
+        self.band_bits = SIGNATURE_BITS // self.num_bands
+        self._entries = OrderedDict()  # analysis_id -> (signature, results)
+        self._bands = [dict() for _ in range(self.num_bands)]  # band value -> set of analysis ids
+        self._lock = threading.Lock()
+
+    def signature(self, text: str) -> Optional[int]:
+        words = normalize_text(text)
+        if len(words) < self.min_words:
+            return None
+        return simhash(words)
+
+    def _band_values(self, signature: int):
+        mask = (1 << self.band_bits) - 1
+        return [(signature >> (band * self.band_bits)) & mask for band in range(self.num_bands)]
+
+    def lookup(self, signature: Optional[int]) -> Optional[NearDuplicateMatch]:
+        """Most similar stored prediction above the threshold, if any"""
+        if signature is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for band, value in enumerate(self._band_values(signature)):
+                candidates.update(self._bands[band].get(value, ()))
+
+            best_id, best_distance = None, self.max_distance + 1
+            for analysis_id in candidates:
+                distance = hamming_distance(signature, self._entries[analysis_id][0])
+                if distance < best_distance:
+                    best_id, best_distance = analysis_id, distance
+            if best_id is None:
+                return None
+            self._entries.move_to_end(best_id)
+            return NearDuplicateMatch(
+                analysis_id=best_id,
+                similarity=1.0 - best_distance / SIGNATURE_BITS,
+                results=self._entries[best_id][1],
+            )
+
+    def add(self, signature: Optional[int], analysis_id: int, results: Dict):
+        """Remember the prediction of a freshly analyzed text"""
+        if signature is None:
+            return
+        with self._lock:
+            self._remove(analysis_id)
+            self._entries[analysis_id] = (signature, results)
+            for band, value in enumerate(self._band_values(signature)):
+                self._bands[band].setdefault(value, set()).add(analysis_id)
+            while len(self._entries) > self.capacity:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, analysis_id: int):
+        """Forget an analysis (e.g. after it was edited or deleted)"""
+        with self._lock:
+            self._remove(analysis_id)
+
+    def analysis_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._entries)
+
+    def _remove(self, analysis_id: int):
+        entry = self._entries.pop(analysis_id, None)
+        if entry is None:
+            return
+        for band, value in enumerate(self._band_values(entry[0])):
+            bucket = self._bands[band].get(value)
+            if bucket is not None:
+                bucket.discard(analysis_id)
+                if not bucket:
+                    del self._bands[band][value]
+
+    def __len__(self):
+        return len(self._entries)
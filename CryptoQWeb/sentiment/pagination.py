@@ -0,0 +1,187 @@
+"""
+Keyset (cursor) pagination for the analysis history.
+
+Pages are ordered by (created_at, id) descending, which matches the composite
+indexes on SentimentAnalysis. The next page is fetched with
+"WHERE (created_at, id) < (last created_at, last id)" instead of OFFSET, so
+every page is an index range scan of `limit` rows no matter how deep it is or
+how large the table grows.
+
+Archived analyses (see archive.py) are only listed when the client asks for
+them with include_archive; they then follow the hot rows and the cursor itself
+records that it points into the archive.
+"""
+
+import base64
+import json
+from datetime import datetime, time, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Q
+from django.db.models.functions import Substr
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import archive
+from .models import SentimentAnalysis
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+PREVIEW_LENGTH = 200
+
+# Query parameter -> model field; values are validated against the field choices
+FILTER_FIELDS = {
+    'platform': 'platform',
+    'level1': 'level1_prediction',
+    'level2': 'level2_prediction',
+    'level3': 'level3_prediction',
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+ARCHIVE_MARK = 'archive'
+
+
+def encode_position(position: Optional[Tuple[datetime, int]], archived: bool = False) -> str:
+    """Opaque cursor pointing just after a (created_at, id) keyset position"""
+    payload = [position[0].isoformat(), position[1]] if position else [None, None]
+    if archived:
+        payload.append(ARCHIVE_MARK)
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def encode_cursor(analysis, archived: bool = False) -> str:
+    """Opaque cursor pointing just after the given row"""
+    return encode_position((analysis.created_at, analysis.id), archived)
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[Tuple[datetime, int]], bool]:
+    """(keyset position or None for the newest archived row, whether it points into the archive)"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        archived = len(payload) == 3 and payload[2] == ARCHIVE_MARK
+        if len(payload) != 2 + archived:
+            raise ValueError("unexpected length")
+        created_at, analysis_id = payload[:2]
+        if created_at is None and archived:
+            return None, True
+        return (datetime.fromisoformat(created_at), int(analysis_id)), archived
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+
+def parse_filters(params) -> Dict[str, str]:
+    """Known, valid filters from request GET parameters (unknown values are rejected)"""
+    filters = {}
+    for param, field_name in FILTER_FIELDS.items():
+        value = params.get(param, '').strip().upper()
+        if not value:
+            continue
+        choices = dict(SentimentAnalysis._meta.get_field(field_name).choices)
+        if value not in choices:
+            raise ValueError(f"Invalid {param}: {value}")
+        filters[field_name] = value
+    return filters
+
+
+def parse_platform(params) -> Optional[str]:
+    platform = params.get('platform', '').strip().upper() or None
+    if platform and platform not in dict(SentimentAnalysis.PLATFORM_CHOICES):
+        raise ValueError(f"Invalid platform: {platform}")
+    return platform
+
+
+def parse_time_range(params) -> Dict[str, datetime]:
+    """'since'/'until' ISO 8601 datetimes or dates (UTC when no offset is given)"""
+    bounds = {}
+    for param in ('since', 'until'):
+        value = params.get(param, '').strip()
+        if not value:
+            continue
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(f"Invalid {param}: expected ISO 8601 date or datetime")
+            parsed = datetime.combine(day, time.min)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=dt_timezone.utc)
+        bounds[param] = parsed
+    return bounds
+
+
+def parse_include_archive(params) -> bool:
+    return params.get('include_archive', '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def parse_limit(value, default: int = DEFAULT_PAGE_SIZE) -> int:
+    try:
+        limit = int(value) if value else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def history_queryset(filters: Optional[Dict[str, str]] = None):
+    """List query: heavy columns deferred, text replaced by a short preview"""
+    return (SentimentAnalysis.objects
+            .filter(**(filters or {}))
+            .defer('text', 'confidence_scores')
+            .annotate(text_preview=Substr('text', 1, PREVIEW_LENGTH))
+            .order_by('-created_at', '-id'))
+
+
+def history_page(filters: Optional[Dict[str, str]] = None, cursor: Optional[str] = None,
+                 limit: int = DEFAULT_PAGE_SIZE, include_archive: bool = False) -> Tuple[List[SentimentAnalysis], Optional[str]]:
+    """
+    One page of history rows, newest first
+
+    With include_archive (or a cursor that already points into the archive)
+    archived rows follow once the hot table is exhausted, starting from the
+    newest partition. An archive page reads a bounded number of partitions, so
+    it can hold fewer than `limit` rows, or none, and still have a cursor that
+    resumes at the next older day.
+
+    Returns:
+        (rows, next_cursor); next_cursor is None on the last page
+    """
+    before, in_archive = decode_cursor(cursor) if cursor else (None, False)
+    rows: List[SentimentAnalysis] = []
+    if not in_archive:
+        queryset = history_queryset(filters)
+        if before:
+            created_at, analysis_id = before
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=analysis_id))
+
+        # Fetch one extra row to know whether another page exists
+        rows = list(queryset[:limit + 1])
+        if len(rows) > limit:
+            return rows[:limit], encode_cursor(rows[limit - 1])
+        if not include_archive or not archive.partition_days():
+            return rows, None
+        if len(rows) == limit:
+            return rows, encode_position(None, archived=True)
+        before = None
+
+    archived, resume = archive.history_rows(filters or {}, before, limit + 1 - len(rows))
+    rows.extend(archived)
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1], archived=True)
+    return rows, encode_position(resume, archived=True) if resume else None
+
+
+def serialize_row(analysis) -> Dict:
+    return {
+        'id': analysis.id,
+        'text_preview': analysis.text_preview,
+        'platform': analysis.platform,
+        'classification': analysis.final_classification,
+        'level1': analysis.level1_prediction,
+        'level2': analysis.level2_prediction,
+        'level3': analysis.level3_prediction,
+        'created_at': analysis.created_at.isoformat(),
+        'duplicate_of': analysis.duplicate_of_id,
+        'archived': getattr(analysis, 'archived', False),
+    }
@@ -0,0 +1,181 @@
+"""
+Incrementally maintained analytics rollups.
+
+Every SentimentAnalysis row is counted in one HOUR and one DAY SentimentRollup
+bucket keyed by (platform, level1, level2, level3). The analyze/edit/delete
+views call record_created / record_updated / record_deleted inside the same
+transaction as the row change, so counts per bucket stay exact and dashboard
+statistics are read from O(buckets) rows instead of scanning every analysis.
+
+rebuild() recomputes everything from SentimentAnalysis plus the archived
+partitions (used by the rebuild_rollups command; the initial data migration keeps
+its own frozen copy of the hot-table part).
+Archiving rows does not decrement rollups: stats keep counting archived rows,
+so they keep covering archived days.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+from .models import SentimentAnalysis, SentimentRollup
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('HOUR', 'DAY')
+LEVEL_FIELDS = ('level1_prediction', 'level2_prediction', 'level3_prediction')
+
+
+def bucket_start(created_at: datetime, granularity: str) -> datetime:
+    """Start of the UTC hour/day containing created_at"""
+    created_at = created_at.astimezone(dt_timezone.utc)
+    if granularity == 'DAY':
+        return created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return created_at.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_key(analysis) -> Tuple:
+    """Snapshot of the fields that decide an analysis' buckets (take it before editing)"""
+    return (analysis.created_at, analysis.platform) + tuple(getattr(analysis, field) or '' for field in LEVEL_FIELDS)
+
+
+def _buckets(key: Tuple):
+    """Hashable (granularity, bucket_start, platform, level1, level2, level3) buckets of a rollup key"""
+    created_at, platform = key[0], key[1]
+    return [(granularity, bucket_start(created_at, granularity), platform) + tuple(key[2:]) for granularity in GRANULARITIES]
+
+
+def _apply_bucket(bucket: Tuple, delta: int):
+    bucket = dict(zip(('granularity', 'bucket_start', 'platform') + LEVEL_FIELDS, bucket))
+    if SentimentRollup.objects.filter(**bucket).update(count=F('count') + delta):
+        return
+    if delta < 0:
+        logger.warning(f"Rollup bucket missing for {bucket}; run 'manage.py rebuild_rollups'")
+        return
+    try:
+        # Savepoint, so a concurrent insert of the same bucket doesn't break the outer transaction
+        with transaction.atomic():
+            SentimentRollup.objects.create(count=delta, **bucket)
+    except IntegrityError:
+        SentimentRollup.objects.filter(**bucket).update(count=F('count') + delta)
+
+
+def _apply(key: Tuple, delta: int):
+    for bucket in _buckets(key):
+        _apply_bucket(bucket, delta)
+
+
+def record_created(analysis):
+    _apply(rollup_key(analysis), 1)
+
+
+def record_created_many(analyses):
+    """Count a batch of new analyses with one update per distinct bucket"""
+    deltas = Counter(bucket for analysis in analyses for bucket in _buckets(rollup_key(analysis)))
+    for bucket, delta in deltas.items():
+        _apply_bucket(bucket, delta)
+
+
+def record_deleted(analysis):
+    _apply(rollup_key(analysis), -1)
+
+
+def record_updated(old_key: Tuple, analysis):
+    new_key = rollup_key(analysis)
+    if new_key != old_key:
+        _apply(old_key, -1)
+        _apply(new_key, 1)
+
+
+def rebuild(analysis_model=SentimentAnalysis, rollup_model=SentimentRollup, include_archive: bool = True) -> int:
+    """Recompute all rollups from the analyses table and archive; returns the number of buckets"""
+    rollups = []
+    for granularity, trunc in (('HOUR', TruncHour), ('DAY', TruncDay)):
+        rows = (analysis_model.objects
+                .annotate(bucket=trunc('created_at', tzinfo=dt_timezone.utc))
+                .values('bucket', 'platform', *LEVEL_FIELDS)
+                .annotate(total=Count('id'))
+                .order_by())
+        for row in rows:
+            rollups.append(rollup_model(
+                granularity=granularity,
+                bucket_start=row['bucket'],
+                platform=row['platform'],
+                count=row['total'],
+                **{field: row[field] or '' for field in LEVEL_FIELDS},
+            ))
+
+    if include_archive:
+        from .archive import iter_archived_rows
+
+        archived = Counter(
+            bucket
+            for row in iter_archived_rows()
+            for bucket in _buckets((row['created_at'], row['platform']) + tuple(row[field] or '' for field in LEVEL_FIELDS))
+        )
+        for bucket, total in archived.items():
+            rollups.append(rollup_model(count=total, **dict(zip(('granularity', 'bucket_start', 'platform') + LEVEL_FIELDS, bucket))))
+        rollups = _merge_duplicates(rollups)
+
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        rollup_model.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def _merge_duplicates(rollups):
+    """Sum rollups for the same bucket (a day can be partly archived and partly hot)"""
+    merged = {}
+    for rollup in rollups:
+        key = (rollup.granularity, rollup.bucket_start, rollup.platform) + tuple(getattr(rollup, field) for field in LEVEL_FIELDS)
+        if key in merged:
+            merged[key].count += rollup.count
+        else:
+            merged[key] = rollup
+    return list(merged.values())
+
+
+def get_stats(granularity: str = 'DAY', platform: Optional[str] = None,
+              since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict:
+    """
+    Counts per bucket and per level prediction, read from the rollup table
+
+    since/until are a half-open range [since, until) widened to whole buckets:
+    the bucket containing since is included, a bucket starting exactly at until
+    is not.
+
+    Returns:
+        {'granularity', 'buckets': [{'bucket_start', 'total', 'level1': {...}, 'level2': {...}, 'level3': {...}}], 'totals': {...}}
+    """
+    queryset = SentimentRollup.objects.filter(granularity=granularity)
+    if platform:
+        queryset = queryset.filter(platform=platform)
+    if since:
+        queryset = queryset.filter(bucket_start__gte=bucket_start(since, granularity))
+    if until:
+        queryset = queryset.filter(bucket_start__lt=until)
+
+    rows = (queryset
+            .values('bucket_start', *LEVEL_FIELDS)
+            .annotate(total=Sum('count'))
+            .order_by('bucket_start'))
+
+    buckets: List[Dict] = []
+    totals = {'total': 0, 'level1': {}, 'level2': {}, 'level3': {}}
+    for row in rows:
+        if not row['total']:
+            continue
+        if not buckets or buckets[-1]['bucket_start'] != row['bucket_start'].isoformat():
+            buckets.append({'bucket_start': row['bucket_start'].isoformat(), 'total': 0, 'level1': {}, 'level2': {}, 'level3': {}})
+        for counts in (buckets[-1], totals):
+            counts['total'] += row['total']
+            for level, field in zip(('level1', 'level2', 'level3'), LEVEL_FIELDS):
+                if row[field]:
+                    counts[level][row[field]] = counts[level].get(row[field], 0) + row['total']
+
+    return {'granularity': granularity, 'buckets': buckets, 'totals': totals}
@@ -0,0 +1,170 @@
+"""
+Full-text search over analyzed texts.
+
+SQLite: an external-content FTS5 table (sentiment_analysis_fts, rowid = analysis
+id) kept in sync by AFTER INSERT/UPDATE/DELETE triggers, ranked with bm25.
+PostgreSQL: a GIN index on to_tsvector('simple', text), ranked with ts_rank.
+Both are maintained by the database itself, so bulk_create and the write-behind
+buffer stay in sync too. Other backends fall back to a LIKE scan.
+
+install_fulltext() is idempotent; it runs after every migrate, because SQLite
+table rebuilds (AlterField) drop triggers. Migration 0007 creates the index with
+its own frozen copy of the statements below.
+"""
+
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import SentimentAnalysis
+from .pagination import history_queryset
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'sentiment_analysis_fts'
+PG_INDEX = 'sentiment_text_fts_idx'
+PG_CONFIG = 'simple'  # no stemming/stop words, so tickers and slang stay searchable
+
+TERM_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+WORD_PATTERN = re.compile(r'\w+')
+
+SQLITE_SETUP = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='{{table}}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {{table}} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {{table}} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF text ON {{table}} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+
+def _table(model=SentimentAnalysis) -> str:
+    return model._meta.db_table
+
+
+def install_fulltext(conn=None, model=SentimentAnalysis):
+    """Create the full-text index for the connection's backend (no-op if present or unsupported)"""
+    conn = conn or connection
+    table = _table(model)
+    try:
+        with transaction.atomic(using=conn.alias):
+            with conn.cursor() as cursor:
+                if conn.vendor == 'sqlite':
+                    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                    created = cursor.fetchone() is None
+                    for statement in SQLITE_SETUP:
+                        cursor.execute(statement.format(table=table))
+                    if created:
+                        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+                elif conn.vendor == 'postgresql':
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {table} "
+                        f"USING GIN (to_tsvector('{PG_CONFIG}', text))"
+                    )
+    except DatabaseError as e:
+        logger.warning(f"✗ Full-text index not available, search will scan the table: {e}")
+
+
+def uninstall_fulltext(conn=None, model=SentimentAnalysis):
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+def fulltext_available() -> bool:
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def to_fts5_query(query: str) -> str:
+    """
+    Turn free user input into a safe FTS5 query
+
+    Words are ANDed, "quoted phrases" stay phrases and a trailing * keeps prefix
+    matching; all other FTS5 syntax (and punctuation such as $ in tickers) is dropped.
+    """
+    terms = []
+    for phrase, word in TERM_PATTERN.findall(query):
+        words = WORD_PATTERN.findall(phrase or word)
+        if not words:
+            continue
+        term = '"' + ' '.join(words) + '"'
+        if word and word.endswith('*') and len(words) == 1:
+            term += '*'
+        terms.append(term)
+    return ' '.join(terms)
+
+
+def matching_ids(query: str) -> Optional[RawSQL]:
+    """Subquery of analysis ids matching the query, for filter(id__in=...); None when not indexed"""
+    if connection.vendor == 'postgresql':
+        return RawSQL(
+            f"SELECT id FROM {_table()} WHERE to_tsvector('{PG_CONFIG}', text) @@ websearch_to_tsquery('{PG_CONFIG}', %s)",
+            [query],
+        )
+    if fulltext_available():
+        return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [to_fts5_query(query) or '""'])
+    return None
+
+
+def ranked_ids(query: str, limit: int = 50) -> List[Tuple[int, float]]:
+    """
+    Best matching (analysis id, score) pairs, higher score = more relevant
+
+    Falls back to a LIKE scan ordered by recency on backends without an index.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"SELECT id, ts_rank(to_tsvector('{PG_CONFIG}', text), q) AS score "
+                f"FROM {_table()}, websearch_to_tsquery('{PG_CONFIG}', %s) AS q "
+                f"WHERE to_tsvector('{PG_CONFIG}', text) @@ q ORDER BY score DESC LIMIT %s",
+                [query, limit],
+            )
+            return [(row[0], float(row[1])) for row in cursor.fetchall()]
+        if fulltext_available():
+            fts_query = to_fts5_query(query)
+            if not fts_query:
+                return []
+            # bm25() is lower-is-better; negate it so every backend sorts descending
+            cursor.execute(
+                f"SELECT rowid, -bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}) LIMIT %s",
+                [fts_query, limit],
+            )
+            return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+    ids = SentimentAnalysis.objects.filter(text__icontains=query).values_list('id', flat=True)[:limit]
+    return [(analysis_id, 0.0) for analysis_id in ids]
+
+
+def search_analyses(query: str, limit: int = 50):
+    """Ranked history rows (deferred columns + text_preview) with a `score` attribute"""
+    ranked = ranked_ids(query, limit)
+    rows = history_queryset().in_bulk([analysis_id for analysis_id, _ in ranked])
+    results = []
+    for analysis_id, score in ranked:
+        if analysis_id in rows:
+            rows[analysis_id].score = score
+            results.append(rows[analysis_id])
+    return results
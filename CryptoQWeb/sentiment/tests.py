@@ -1,3 +1,782 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.contrib import admin
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import archive, degradation, export, first_tier, model_registry, rollups, tokenizer_store
+from .hashing_tokenizer import HashingTokenizer, fnv1a_64
+from .lexicon import DEFAULT_PATH as LEXICON_PATH, FALLBACK_CATEGORIES, Lexicon
+from .models import SentimentAnalysis, SentimentRollup
+from .near_duplicate import NearDuplicateIndex, normalize_text
+from .admin import SentimentAnalysisAdmin
+from .ann_index import SimilarityIndex
+from .attributions import result_attributions
+from .pagination import InvalidCursor, decode_cursor, history_page, parse_filters, parse_limit
+from .search import fulltext_available, ranked_ids, search_analyses, to_fts5_query
+from .vector_store import VectorFile, get_vector_store
+from .windowing import aggregate, build_windows, stitch, window_spans
+from .write_buffer import AnalysisWriteBuffer, WriteBufferFull
+
+CLS, SEP, PAD = 1, 2, 0
+
+
+class HashingTokenizerTests(SimpleTestCase):
+
+    def test_fnv1a_matches_the_reference_hashes(self):
+        hashes = fnv1a_64(np.array(['a', 'foobar', 'ünï']))
+        self.assertEqual(int(hashes[0]), 0xaf63dc4c8601ec8c)
+        self.assertEqual(int(hashes[1]), 0x85944171f73967e8)
+        # Multi-byte characters are hashed over their UTF-8 bytes
+        expected = 0xcbf29ce484222325
+        for byte in 'ünï'.encode('utf-8'):
+            expected = ((expected ^ byte) * 0x100000001b3) % 2 ** 64
+        self.assertEqual(int(hashes[2]), expected)
+
+    def test_batch_is_padded_truncated_and_stable(self):
+        tokenizer = HashingTokenizer(vocab_size=1000, offset=10, max_length=4)
+        encoded = tokenizer.encode_batch(['Moon moon!', '', 'one two three four five'])
+        np.testing.assert_array_equal(encoded['attention_mask'], [[1, 1, 0, 0], [0, 0, 0, 0], [1, 1, 1, 1]])
+        ids = encoded['input_ids']
+        self.assertEqual(ids[0, 0], ids[0, 1])
+        self.assertTrue(((ids[encoded['attention_mask'] == 1] >= 10) & (ids[encoded['attention_mask'] == 1] < 1010)).all())
+        self.assertTrue((ids[encoded['attention_mask'] == 0] == tokenizer.pad_token_id).all())
+        # Same ids whatever else is in the batch
+        alone = tokenizer.encode_batch(['one two three four five'])['input_ids']
+        np.testing.assert_array_equal(alone[0], ids[2])
+
+
+class TokenizerPinTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.pin_file = os.path.join(self.directory, 'tokenizer_revision.json')
+        patcher = mock.patch.object(tokenizer_store, 'PIN_FILE', self.pin_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.makedirs(tokenizer_store.tokenizer_dir(self.directory))
+        with open(os.path.join(tokenizer_store.tokenizer_dir(self.directory), tokenizer_store.MANIFEST_NAME), 'w') as f:
+            json.dump({'name': tokenizer_store.TOKENIZER_NAME, 'revision': 'a' * 40}, f)
+
+    def test_unpinned_tokenizer_is_not_loaded(self):
+        self.assertIsNone(tokenizer_store.pinned_revision())
+        with self.assertLogs('sentiment.tokenizer_store', 'ERROR'):
+            self.assertFalse(tokenizer_store._check_manifest(self.directory))
+
+    def test_only_the_pinned_commit_is_loaded(self):
+        tokenizer_store.pin_revision('a' * 40)
+        self.assertTrue(tokenizer_store._check_manifest(self.directory))
+        tokenizer_store.pin_revision('b' * 40)
+        with self.assertLogs('sentiment.tokenizer_store', 'ERROR'):
+            self.assertFalse(tokenizer_store._check_manifest(self.directory))
+
+    def test_vendoring_needs_a_pinned_commit(self):
+        with self.assertRaisesMessage(CommandError, 'No microsoft/deberta-v3-small commit is pinned'):
+            call_command('vendor_tokenizer', models_dir=self.directory)
+        with self.assertRaisesMessage(CommandError, 'must be a full commit sha'):
+            call_command('vendor_tokenizer', models_dir=self.directory, revision='main')
+
+
+class NearDuplicateTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = NearDuplicateIndex(threshold=0.9, capacity=3)
+
+    def test_normalization_drops_urls_handles_tickers_and_numbers(self):
+        self.assertEqual(normalize_text('BUY $BTC now @whale https://x.io/a 100x 🚀 Moon!'), ['buy', 'now', 'moon'])
+
+    def test_near_copies_reuse_the_prediction(self):
+        text = 'Huge giveaway today, send your coins to double them instantly'
+        self.index.add(self.index.signature(text), 1, {'final_classification': 'SUBJECTIVE'})
+        match = self.index.lookup(self.index.signature(text.upper() + ' $DOGE @bot https://t.co/x 🚀'))
+        self.assertEqual((match.analysis_id, match.similarity), (1, 1.0))
+        self.assertEqual(match.results, {'final_classification': 'SUBJECTIVE'})
+        self.assertIsNone(self.index.lookup(self.index.signature('The central bank kept interest rates unchanged')))
+        self.assertIsNone(self.index.signature('too short'))
+
+    def test_every_signature_within_the_threshold_is_found(self):
+        rng = np.random.default_rng(0)
+        signature = int(rng.integers(0, 2 ** 63))
+        self.index.add(signature, 1, {})
+        for _ in range(200):
+            flipped = rng.choice(64, self.index.max_distance, replace=False)
+            self.assertEqual(self.index.lookup(signature ^ sum(1 << int(bit) for bit in flipped)).analysis_id, 1)
+
+    def test_oldest_entries_are_evicted_and_discard_forgets(self):
+        # Far apart signatures: each one only matches itself
+        signatures = {1: 0, 2: 2 ** 64 - 1, 3: 0x00000000ffffffff, 4: 0xffffffff00000000}
+        for analysis_id, signature in signatures.items():
+            self.index.add(signature, analysis_id, {})
+        self.assertEqual(len(self.index), 3)
+        self.assertIsNone(self.index.lookup(signatures[1]))
+        self.index.discard(4)
+        self.assertIsNone(self.index.lookup(signatures[4]))
+        self.assertEqual(self.index.lookup(signatures[3]).analysis_id, 3)
+
+
+def create_analysis(created_at, platform='REDDIT', level1='NOISE', text='some text', **fields):
+    return SentimentAnalysis.objects.create(text=text, platform=platform, level1_prediction=level1,
+                                            final_classification=level1, created_at=created_at, **fields)
+
+
+class HistoryPaginationTests(TestCase):
+
+    def setUp(self):
+        start = datetime(2026, 10, 1, tzinfo=dt_timezone.utc)
+        # Pairs of rows share a timestamp, so the id breaks ties
+        self.rows = [create_analysis(start + timedelta(minutes=i // 2), platform='TWITTER' if i % 3 else 'REDDIT')
+                     for i in range(11)]
+
+    def walk(self, filters=None, limit=3):
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                rows, cursor = history_page(filters, cursor, limit)
+            seen.extend(row.id for row in rows)
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_every_row_once_newest_first(self):
+        expected = [row.id for row in sorted(self.rows, key=lambda row: (row.created_at, row.id), reverse=True)]
+        self.assertEqual(self.walk(), expected)
+        self.assertEqual(self.walk(limit=11), expected)
+
+    def test_filters_apply_to_every_page(self):
+        expected = [row.id for row in sorted(self.rows, key=lambda row: (row.created_at, row.id), reverse=True)
+                    if row.platform == 'REDDIT']
+        self.assertEqual(self.walk(parse_filters({'platform': 'reddit'}), limit=2), expected)
+
+    def test_invalid_input_is_rejected_or_clamped(self):
+        with self.assertRaises(ValueError):
+            parse_filters({'level1': 'bogus'})
+        with self.assertRaises(InvalidCursor):
+            history_page(cursor='not-a-cursor')
+        self.assertEqual([parse_limit(None), parse_limit('0'), parse_limit('10000'), parse_limit('x')], [50, 1, 200, 50])
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.start = datetime(2026, 10, 1, tzinfo=dt_timezone.utc)
+
+    def snapshot(self):
+        return sorted(SentimentRollup.objects.filter(count__gt=0)
+                      .values_list('granularity', 'bucket_start', 'platform', *rollups.LEVEL_FIELDS, 'count'))
+
+    def test_incremental_counts_match_a_rebuild(self):
+        rows = []
+        for hours, platform, level1 in ((0, 'REDDIT', 'NOISE'), (1, 'REDDIT', 'NOISE'), (1, 'TWITTER', 'OBJECTIVE'), (30, 'REDDIT', 'NOISE')):
+            rows.append(create_analysis(self.start + timedelta(hours=hours), platform=platform, level1=level1))
+            rollups.record_created(rows[-1])
+        old_key = rollups.rollup_key(rows[0])
+        rows[0].level1_prediction = 'SUBJECTIVE'
+        rows[0].save()
+        rollups.record_updated(old_key, rows[0])
+        rollups.record_deleted(rows[1])
+        rows[1].delete()
+
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+        stats = rollups.get_stats('DAY')
+        self.assertEqual(stats['totals']['total'], 3)
+        self.assertEqual(stats['totals']['level1'], {'SUBJECTIVE': 1, 'OBJECTIVE': 1, 'NOISE': 1})
+
+    def test_ranges_are_half_open_over_whole_buckets(self):
+        for hours in (0, 23, 24, 47):
+            rollups.record_created(create_analysis(self.start + timedelta(hours=hours)))
+        first_day = rollups.get_stats('DAY', since=self.start, until=self.start + timedelta(days=1))
+        self.assertEqual([bucket['total'] for bucket in first_day['buckets']], [2])
+        # A bound inside a bucket takes the whole bucket
+        both_days = rollups.get_stats('DAY', since=self.start + timedelta(hours=12), until=self.start + timedelta(hours=25))
+        self.assertEqual([bucket['total'] for bucket in both_days['buckets']], [2, 2])
+        hours = rollups.get_stats('HOUR', since=self.start + timedelta(hours=23), until=self.start + timedelta(hours=24))
+        self.assertEqual(hours['totals']['total'], 1)
+
+
+class WriteBufferTests(TestCase):
+
+    def setUp(self):
+        # The worker thread never flushes on its own here; the tests flush explicitly
+        self.buffer = AnalysisWriteBuffer(max_batch=1000, flush_interval=3600, max_pending=6, max_attempts=3)
+        self.addCleanup(self.buffer.close)
+        self.saved = []
+
+    def submit(self, text='some text'):
+        analysis = SentimentAnalysis(text=text, platform='REDDIT', level1_prediction='NOISE', final_classification='NOISE')
+        self.buffer.submit(analysis, on_saved=self.saved.append)
+        return analysis
+
+    def test_a_bad_row_is_isolated_then_dead_lettered(self):
+        good = [self.submit() for _ in range(2)]
+        bad = self.submit(text=None)
+        good += [self.submit() for _ in range(2)]
+        with self.assertLogs('sentiment.write_buffer', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(self.saved, good)
+        self.assertEqual(SentimentAnalysis.objects.count(), 4)
+        self.assertEqual(rollups.get_stats('DAY')['totals']['total'], 4)
+        self.assertEqual(len(self.buffer), 1)
+
+        with self.assertLogs('sentiment.write_buffer', 'ERROR') as logs:
+            self.buffer.flush()
+            self.buffer.flush()
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual([analysis for analysis, _ in self.buffer.dead_letters], [bad])
+        self.assertIn(f'Dropped analysis {bad.uid} after 3 failed writes', '\n'.join(logs.output))
+
+    def test_rows_are_kept_while_nothing_can_be_written(self):
+        for _ in range(3):
+            self.submit()
+        with mock.patch.object(rollups, 'record_created_many', side_effect=RuntimeError('database is locked')):
+            with self.assertLogs('sentiment.write_buffer', 'ERROR'):
+                for _ in range(5):
+                    self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual((len(self.buffer), len(self.buffer.dead_letters)), (3, 0))
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(SentimentAnalysis.objects.count(), 3)
+
+    def test_submit_refuses_beyond_max_pending(self):
+        for _ in range(6):
+            self.submit()
+        with self.assertRaises(WriteBufferFull):
+            self.submit()
+        self.buffer.flush()
+
+
+class FullTextSearchTests(TestCase):
+
+    def setUp(self):
+        self.now = datetime(2026, 10, 1, tzinfo=dt_timezone.utc)
+
+    def matches(self, query):
+        return sorted(analysis_id for analysis_id, _ in ranked_ids(query))
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        self.assertTrue(fulltext_available())
+        first = create_analysis(self.now, text='Bitcoin breaks resistance, bulls are back')
+        second = create_analysis(self.now, text='Ethereum gas fees are painful today')
+        SentimentAnalysis.objects.bulk_create([SentimentAnalysis(text='More bitcoin whales accumulating', created_at=self.now)])
+        bulk = SentimentAnalysis.objects.get(text__startswith='More').id
+        self.assertEqual(self.matches('bitcoin'), [first.id, bulk])
+
+        first.text = 'Solana validators restarted'
+        first.save()
+        self.assertEqual(self.matches('bitcoin'), [bulk])
+        self.assertEqual(self.matches('solana'), [first.id])
+        second.delete()
+        self.assertEqual(self.matches('ethereum'), [])
+        self.assertEqual([row.id for row in search_analyses('whales')], [bulk])
+
+    def test_user_input_cannot_inject_fts_syntax(self):
+        self.assertEqual(to_fts5_query('$BTC "to the moon" eth* OR NEAR( -'), '"BTC" "to the moon" "eth"* "OR" "NEAR"')
+        create_analysis(self.now, text='BTC to the moon')
+        self.assertEqual(len(ranked_ids('$BTC "to the moon" eth* OR NEAR( -')), 0)
+        self.assertEqual(len(ranked_ids('$btc "to the moon"')), 1)
+
+    def test_admin_search_still_matches_the_class(self):
+        by_text = create_analysis(self.now, text='objective market report', level1='SUBJECTIVE')
+        by_class = create_analysis(self.now, text='plain statement', level1='OBJECTIVE')
+        model_admin = SentimentAnalysisAdmin(SentimentAnalysis, admin.site)
+        results, _ = model_admin.get_search_results(None, SentimentAnalysis.objects.all(), 'objective')
+        self.assertEqual(sorted(row.id for row in results), [by_text.id, by_class.id])
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        start = datetime(2026, 10, 1, tzinfo=dt_timezone.utc)
+        self.rows = [create_analysis(start + timedelta(hours=hours), text=f'text, "quoted" {hours}\nsecond line',
+                                     confidence_scores={'level1': 0.75})
+                     for hours in (0, 12, 24, 36)]
+        self.range = {'since': start + timedelta(hours=12), 'until': start + timedelta(hours=36)}
+
+    def test_csv_round_trips_the_selected_range(self):
+        rows = export.iter_rows(export.export_queryset(**self.range), chunk_size=1)
+        chunks = list(export.iter_csv(rows, chunk_size=1))
+        self.assertEqual(len(chunks), 3)
+        records = list(csv.DictReader(io.StringIO(''.join(chunks))))
+        self.assertEqual([int(record['id']) for record in records], [self.rows[1].id, self.rows[2].id])
+        self.assertEqual(records[0]['text'], self.rows[1].text)
+        self.assertEqual(records[0]['uid'], str(self.rows[1].uid))
+        self.assertEqual((records[0]['confidence_level1'], records[0]['confidence_level2']), ('0.75', ''))
+
+    @unittest.skipUnless(export.PYARROW_AVAILABLE, 'pyarrow is not installed')
+    def test_parquet_stream_is_a_readable_file(self):
+        import pyarrow.parquet as pq
+        data = b''.join(export.iter_parquet(export.iter_rows(export.export_queryset()), chunk_size=3))
+        table = pq.read_table(io.BytesIO(data))
+        self.assertEqual(table.column_names, export.COLUMNS)
+        self.assertEqual(table.column('id').to_pylist(), [row.id for row in self.rows])
+        self.assertEqual(table.column('created_at').to_pylist()[-1], self.rows[-1].created_at)
+        self.assertEqual(pq.ParquetFile(io.BytesIO(data)).num_row_groups, 2)
+
+
+@unittest.skipUnless(export.PYARROW_AVAILABLE, 'pyarrow is not installed')
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        patcher = override_settings(ANALYSIS_ARCHIVE_DIR=self.root)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.today = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def analysis(self, days_ago, **fields):
+        analysis = create_analysis(self.today - timedelta(days=days_ago), **fields)
+        rollups.record_created(analysis)
+        return analysis
+
+    def test_rows_referenced_by_hot_near_duplicates_stay(self):
+        original = self.analysis(10)
+        chained_original = self.analysis(10)
+        chained = self.analysis(10, duplicate_of=chained_original)
+        alone = self.analysis(10)
+        archived_duplicate = self.analysis(9, duplicate_of=alone)
+        hot = [self.analysis(0, duplicate_of=original), self.analysis(0, duplicate_of=chained)]
+        stats = rollups.get_stats('DAY')
+
+        self.assertEqual(sum(archive.archive_older_than(5, dry_run=True).values()), 2)
+        self.assertIsNone(archive.last_run())
+        self.assertEqual(sum(archive.archive_older_than(5).values()), 2)
+
+        self.assertEqual(set(SentimentAnalysis.objects.values_list('id', flat=True)),
+                         {original.id, chained_original.id, chained.id} | {row.id for row in hot})
+        self.assertEqual([row.duplicate_of_id for row in SentimentAnalysis.objects.filter(id__in=[hot[0].id, hot[1].id, chained.id]).order_by('id')],
+                         [chained_original.id, original.id, chained.id])
+        archived = {row['id']: row for row in archive.iter_archived_rows()}
+        self.assertEqual(set(archived), {alone.id, archived_duplicate.id})
+        self.assertEqual(archived[archived_duplicate.id]['duplicate_of_id'], alone.id)
+        # Rollups keep counting archived rows
+        self.assertEqual(rollups.get_stats('DAY'), stats)
+        self.assertIsNotNone(archive.last_run())
+
+    def test_history_reads_the_archive_only_when_asked(self):
+        archived = [self.analysis(days) for days in (10, 10, 12)]
+        hot = [self.analysis(0), self.analysis(1)]
+        archive.archive_older_than(5)
+
+        rows, cursor = history_page(limit=10)
+        self.assertEqual(([row.id for row in rows], cursor), ([hot[0].id, hot[1].id], None))
+
+        rows, cursor = history_page(limit=3, include_archive=True)
+        self.assertEqual([row.id for row in rows], [hot[0].id, hot[1].id, archived[1].id])
+        self.assertTrue(rows[2].archived)
+        self.assertTrue(decode_cursor(cursor)[1])
+        # The cursor keeps reading the archive without include_archive
+        rows, cursor = history_page(cursor=cursor, limit=3)
+        self.assertEqual(([row.id for row in rows], cursor), ([archived[0].id, archived[2].id], None))
+
+    def test_archived_rows_leave_nothing_behind(self):
+        from .attributions import cache_attributions, get_cached_attributions
+        from .dashboard import CACHE_ALIAS, _payload_key
+        dashboards = caches[CACHE_ALIAS]
+
+        with override_settings(ANALYSIS_VECTOR_DIR=os.path.join(self.root, 'vectors')):
+            store = get_vector_store()
+            archived, hot = self.analysis(10), self.analysis(0)
+            for analysis in (archived, hot):
+                store.add(analysis.id, {'level1': np.ones(4)})
+                cache_attributions(analysis.id, {'level1': []})
+                dashboards.set(_payload_key(analysis.id), {'text': 't'})
+            archive.archive_older_than(5)
+            self.assertEqual(store.get(archived.id), {})
+            self.assertEqual(list(store.get(hot.id)), ['level1'])
+            self.assertIsNone(get_cached_attributions(archived.id))
+            self.assertEqual(get_cached_attributions(hot.id), {'level1': []})
+            self.assertEqual([dashboards.get(_payload_key(analysis.id)) for analysis in (archived, hot)], [None, {'text': 't'}])
+
+    @override_settings(ANALYSIS_ARCHIVE_HISTORY_PARTITIONS=2)
+    def test_archive_pages_read_a_bounded_number_of_partitions(self):
+        matching = self.analysis(30, platform='TWITTER')
+        for days in range(10, 16):
+            self.analysis(days)
+        archive.archive_older_than(5)
+        self.assertEqual(len(archive.partition_days()), 7)
+
+        filters = parse_filters({'platform': 'twitter'})
+        pages = []
+        cursor = history_page(filters, include_archive=True)[1]
+        while cursor:
+            with mock.patch.object(archive, '_read_partition', wraps=archive._read_partition) as read:
+                rows, cursor = history_page(filters, cursor)
+            self.assertLessEqual(read.call_count, 2)
+            pages.append([row.id for row in rows])
+        self.assertEqual(pages, [[], [], [matching.id]])
+
+
+class VectorFileTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_latest_row_wins(self):
+        vectors = VectorFile(self.directory, dim=3)
+        vectors.add([1, 2], np.array([[1, 0, 0], [0, 1, 0]]))
+        vectors.add([1], np.array([[0, 0, 1]]))
+        np.testing.assert_array_equal(vectors.lookup([1])[1], [0, 0, 1])
+        self.assertEqual(vectors.latest_rows([1, 2]), {1: 2, 2: 1})
+        keys, rows = vectors.snapshot()
+        self.assertEqual(dict(zip(keys.tolist(), rows.tolist())), {1: 2, 2: 1})
+        # Another reader of the same files sees the same
+        np.testing.assert_array_equal(VectorFile(self.directory).lookup([1])[1], [0, 0, 1])
+
+    def test_discarded_keys_stay_hidden_until_added_again(self):
+        vectors = VectorFile(self.directory, dim=2)
+        reader = VectorFile(self.directory)
+        vectors.add([1, 2, 3], np.eye(3, 2))
+        self.assertEqual(len(reader.lookup([1, 2, 3])), 3)
+        vectors.discard([1, 2])
+        self.assertEqual(list(reader.lookup([1, 2, 3])), [3])
+        self.assertEqual(reader.snapshot()[0].tolist(), [3])
+
+        vectors.add([2], np.array([[5, 5]]))
+        np.testing.assert_array_equal(reader.lookup([2])[2], [5, 5])
+        self.assertEqual(sorted(VectorFile(self.directory).lookup([1, 2, 3])), [2, 3])
+
+
+class SimilarityIndexTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.vectors = VectorFile(f"{self.directory}/vectors", dim=8)
+        self.rng = np.random.default_rng(0)
+
+    def add(self, count):
+        ids = [SentimentAnalysis.objects.create(text='t', final_classification='NOISE').id for _ in range(count)]
+        self.vectors.add(ids, self.rng.normal(size=(count, 8)))
+        return ids
+
+    def exact(self, analysis_id, ids):
+        query = self.vectors.lookup([analysis_id])[analysis_id]
+        stored = self.vectors.lookup(ids)
+        scores = {i: float(vector @ query / np.linalg.norm(vector) / np.linalg.norm(query))
+                  for i, vector in stored.items() if i != analysis_id}
+        return sorted(scores, key=scores.get, reverse=True)
+
+    def test_compacted_build_and_delta_are_searched_together(self):
+        compacted = self.add(40)
+        index = SimilarityIndex(self.vectors, f"{self.directory}/ivf", nprobe=4, compact_rows=0)
+        manifest = index.compact(nlist=4)
+        self.assertEqual((manifest['count'], manifest['covered_rows']), (40, 40))
+
+        delta = self.add(10)
+        # An edit appends a new row for the same analysis; only the new one may be returned
+        self.vectors.add([compacted[0]], self.rng.normal(size=(1, 8)))
+        ids = compacted + delta
+        for analysis_id in (compacted[0], compacted[5], delta[0]):
+            found = index.search(analysis_id, limit=len(ids))
+            self.assertEqual([i for i, _ in found], self.exact(analysis_id, ids)[:len(found)])
+            self.assertEqual(len(found), len(ids) - 1)
+
+        # Compacting again moves the delta into the build and drops deleted analyses
+        SentimentAnalysis.objects.filter(id=delta[1]).delete()
+        manifest = index.compact(nlist=4)
+        self.assertEqual((manifest['count'], manifest['covered_rows']), (len(ids) - 1, len(self.vectors)))
+        found = index.search(delta[0], limit=len(ids))
+        self.assertNotIn(delta[1], [i for i, _ in found])
+        self.assertEqual(len(found), len(ids) - 2)
+
+        # Discarded vectors (archived analyses) are skipped before the next compaction
+        self.vectors.discard([compacted[5]])
+        found = index.search(delta[0], limit=len(ids))
+        self.assertNotIn(compacted[5], [i for i, _ in found])
+        self.assertEqual(len(found), len(ids) - 3)
+
+
+class FakeAnalyzer:
+
+    def __init__(self, version):
+        self.version = version
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.models_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.models_dir)
+        self.loaded = []
+        patcher = mock.patch.object(model_registry, 'load_version', side_effect=self.load_version)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry = model_registry.ModelRegistry(self.models_dir, check_interval=0, retry_interval=300)
+        self.activate('v1')
+
+    def load_version(self, version, models_dir=None, warm_up=True):
+        self.loaded.append((version, warm_up))
+        if version == 'broken':
+            raise RuntimeError('no checkpoints')
+        return FakeAnalyzer(version)
+
+    def activate(self, version):
+        with open(os.path.join(self.models_dir, model_registry.CURRENT_FILE), 'w') as f:
+            f.write(version)
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, 'background swap did not finish')
+            time.sleep(0.01)
+
+    def test_new_version_is_swapped_in_and_the_old_one_drained(self):
+        with self.assertLogs('sentiment.model_registry', 'INFO'):
+            with self.registry.lease() as first:
+                self.assertEqual(first.version, 'v1')
+                self.activate('v2')
+                self.registry.analyzer()
+                self.wait_for(lambda: self.registry.version == 'v2')
+                # The request in flight keeps its analyzer until it is done
+                self.assertFalse(first.released)
+                with self.registry.lease() as second:
+                    self.assertEqual(second.version, 'v2')
+            self.assertTrue(first.released)
+            self.assertFalse(second.released)
+        # Lazy first load, warmed-up swap
+        self.assertEqual(self.loaded, [('v1', False), ('v2', True)])
+
+    def test_a_broken_version_keeps_the_old_one_until_its_files_change(self):
+        with self.assertLogs('sentiment.model_registry', 'INFO'):
+            self.assertEqual(self.registry.analyzer().version, 'v1')
+        self.activate('broken')
+        with self.assertLogs('sentiment.model_registry', 'ERROR'):
+            self.registry.analyzer()
+            self.wait_for(lambda: len(self.loaded) == 2 and self.registry._loading is None)
+        self.assertEqual(self.registry.analyzer().version, 'v1')
+        self.assertEqual(len(self.loaded), 2)
+
+        os.makedirs(os.path.join(self.models_dir, 'broken', 'Level1'))
+        with self.assertLogs('sentiment.model_registry', 'ERROR'):
+            self.registry.analyzer()
+            self.wait_for(lambda: len(self.loaded) == 3 and self.registry._loading is None)
+        self.assertEqual(self.registry.analyzer().version, 'v1')
+
+
+class DegradationTests(SimpleTestCase):
+
+    def test_unmeasured_levels_and_no_deadline_run_every_fold(self):
+        tracker = degradation.LoadTracker()
+        self.assertEqual(tracker.plan_folds('level1', 5, time.monotonic() + 0.001), 5)
+        tracker.record('level1', 5, 1.0)
+        self.assertEqual(tracker.plan_folds('level1', 5, None), 5)
+
+    def test_fold_cost_is_normalized_by_load(self):
+        tracker = degradation.LoadTracker(smoothing=0.5)
+        with tracker.request(), tracker.request():
+            # Two requests in flight: 1s over 5 folds is 0.1s per fold alone
+            tracker.record('level1', 5, 1.0)
+            self.assertAlmostEqual(tracker.fold_cost('level1'), 0.2)
+        self.assertEqual(tracker.in_flight, 0)
+        self.assertAlmostEqual(tracker.fold_cost('level1'), 0.1)
+        tracker.record('level1', 1, 0.3)
+        self.assertAlmostEqual(tracker.fold_cost('level1'), 0.2)
+        self.assertEqual(tracker.snapshot(), {'in_flight': 0, 'fold_seconds': {'level1': 0.2}})
+
+    def test_folds_are_fitted_to_the_remaining_time(self):
+        tracker = degradation.LoadTracker(safety=1.0)
+        tracker.record('level2', 1, 1.0)
+        with mock.patch.object(degradation.time, 'monotonic', return_value=100.0):
+            self.assertEqual(tracker.plan_folds('level2', 5, 103.5), 3)
+            self.assertEqual(tracker.plan_folds('level2', 5, 110.0), 5)
+            self.assertEqual(tracker.plan_folds('level2', 5, 103.5, reserve=2.0), 1)
+            # A required level runs one fold past the deadline, an optional one is skipped
+            self.assertEqual(tracker.plan_folds('level2', 5, 99.0), 1)
+            self.assertEqual(tracker.plan_folds('level2', 5, 99.0, required=False), 0)
+
+    def test_describe_reports_the_worst_degradation(self):
+        available = {'level1': 5, 'level2': 5}
+        full = degradation.describe({'level1': 5, 'level2': 5}, available, [])
+        self.assertEqual((full['level'], full['name']), (degradation.FULL, 'full'))
+        reduced = degradation.describe({'level1': 5, 'level2': 2}, available, [])
+        self.assertEqual(reduced['name'], 'reduced_folds')
+        skipped = degradation.describe({'level1': 5, 'level2': 2}, available, ['level3'])
+        self.assertEqual(skipped, {'level': degradation.SKIPPED_LEVEL3, 'name': 'skipped_level3',
+                                   'folds': {'level1': 5, 'level2': 2}, 'skipped': ['level3']})
+
+
+class WindowingTests(SimpleTestCase):
+
+    def test_spans_cover_the_text_with_the_overlap(self):
+        for length in range(1, 60):
+            spans = window_spans(length, size=10, overlap=3)
+            self.assertEqual(spans[0][0], 0)
+            self.assertEqual(spans[-1][1], length)
+            covered = set()
+            for start, end in spans:
+                self.assertLessEqual(end - start, 10)
+                covered.update(range(start, end))
+            self.assertEqual(covered, set(range(length)))
+            for (_, previous_end), (start, _) in zip(spans, spans[1:]):
+                self.assertGreaterEqual(previous_end - start, 3)
+
+    def test_windows_hold_the_tokens_at_their_positions(self):
+        sequence = list(range(100, 130))
+        windows = build_windows([sequence], window=12, overlap=4, pad_token_id=PAD, cls_token_id=CLS, sep_token_id=SEP)
+        for row in range(len(windows.input_ids)):
+            slots = windows.positions[row] >= 0
+            np.testing.assert_array_equal(windows.input_ids[row][slots], np.array(sequence)[windows.positions[row][slots]])
+            self.assertEqual(windows.input_ids[row, 0], CLS)
+            self.assertEqual(windows.input_ids[row, windows.attention_mask[row].sum() - 1], SEP)
+        self.assertEqual(set(windows.positions[windows.positions >= 0]), set(range(len(sequence))))
+
+    def test_aggregate_weights_windows_by_their_tokens(self):
+        windows = build_windows([list(range(10)), list(range(3))], window=8, overlap=2)
+        self.assertEqual(list(windows.owners), [0, 0, 1])
+        values = np.array([[1.0], [4.0], [7.0]])
+        tokens = (windows.positions >= 0).sum(axis=1)
+        expected = (tokens[0] * 1.0 + tokens[1] * 4.0) / (tokens[0] + tokens[1])
+        np.testing.assert_allclose(aggregate(values, windows), [[expected], [7.0]])
+
+    def test_stitch_averages_overlapping_positions(self):
+        windows = build_windows([list(range(10))], window=6, overlap=2)
+        self.assertEqual(window_spans(10, 6, 2), [(0, 6), (4, 10)])
+        scores = np.stack([np.full(6, 1.0), np.full(6, 3.0)])
+        np.testing.assert_allclose(stitch(scores, windows)[0], [1, 1, 1, 1, 2, 2, 3, 3, 3, 3])
+
+    def test_short_text_is_one_plain_window(self):
+        sequence = [11, 12, 13]
+        windows = build_windows([sequence], window=8, overlap=2, pad_token_id=PAD, cls_token_id=CLS, sep_token_id=SEP)
+        np.testing.assert_array_equal(windows.input_ids, [[CLS, 11, 12, 13, SEP, PAD, PAD, PAD]])
+        np.testing.assert_array_equal(windows.attention_mask, [[1, 1, 1, 1, 1, 0, 0, 0]])
+        values = np.array([[0.2, 0.3, 0.5]])
+        np.testing.assert_allclose(aggregate(values, windows), values)
+        scores = np.arange(8, dtype=np.float64)[None]
+        np.testing.assert_allclose(stitch(scores, windows)[0], [1, 2, 3])
+
+
+class LexiconTests(SimpleTestCase):
+
+    def setUp(self):
+        self.lexicon = Lexicon({
+            'positive': ['like', 'to the moon', 'moon'],
+            'negative': ['scam', 'dump'],
+            'neutral': ['the'],
+            'fallback_positive': ['good'],
+            'fallback_negative': ['bad'],
+        })
+
+    def test_scores_map_to_their_text(self):
+        scores = self.lexicon.score_batch(['scam\nscam dump', '', 'to the moon', 'like'])
+        self.assertEqual([score['negative'] for score in scores], [3, 0, 0, 0])
+        self.assertEqual([score['positive'] for score in scores], [0, 0, 1, 1])
+        self.assertEqual(scores[2]['neutral'], 0)
+
+    def test_keywords_match_whole_words(self):
+        self.assertEqual(self.lexicon.score('likely scammer dumped')['positive'], 0)
+        self.assertEqual(self.lexicon.score('likely scammer dumped')['negative'], 0)
+        self.assertEqual(self.lexicon.score('I LIKE it, a scam!'), {'positive': 1, 'negative': 1, 'neutral': 0})
+
+    def test_fallback_categories_count_distinct_words(self):
+        scores = self.lexicon.score('good good bad, goodness', FALLBACK_CATEGORIES, distinct=True)
+        self.assertEqual(scores, {'fallback_positive': 1, 'fallback_negative': 1})
+
+    def test_fallback_keywords_and_questions_are_whole_words(self):
+        lexicon = Lexicon.from_file(LEXICON_PATH)
+        scores = lexicon.score_batch(['I loved it', 'I am unhappy', 'I dislike it'], FALLBACK_CATEGORIES, distinct=True)
+        self.assertEqual(scores, [
+            {'fallback_positive': 0, 'fallback_negative': 0},
+            {'fallback_positive': 0, 'fallback_negative': 0},
+            {'fallback_positive': 0, 'fallback_negative': 1},
+        ])
+        self.assertFalse(lexicon.is_question('whatever happens next'))
+        self.assertTrue(lexicon.is_question('what happens next'))
+
+    @unittest.skipUnless(importlib.util.find_spec('torch'), 'the analyzer needs torch')
+    def test_fallback_predictions(self):
+        from .ai_analyzer import SentimentAnalyzer
+
+        # The rule-based fallback uses no model, so the analyzer is not initialized
+        analyzer = SentimentAnalyzer.__new__(SentimentAnalyzer)
+        predictions = {text: analyzer._fallback_analysis(text)['final_classification']
+                       for text in ('I loved it', 'I am unhappy', 'I dislike it', 'whatever happens next')}
+        self.assertEqual(predictions, {
+            'I loved it': 'OBJECTIVE',
+            'I am unhappy': 'OBJECTIVE',
+            'I dislike it': 'SUBJECTIVE -> NEGATIVE',
+            'whatever happens next': 'OBJECTIVE',
+        })
+
+
+class FirstTierTests(SimpleTestCase):
+
+    def test_paths_are_decoded_level_by_level(self):
+        probabilities = np.zeros(len(first_tier.PATHS))
+        # OBJECTIVE is the likeliest single path, but SUBJECTIVE wins level 1 as a whole
+        probabilities[[1, 2, 4, 5]] = [0.4, 0.25, 0.2, 0.15]
+        results = first_tier.path_results(probabilities)
+        self.assertEqual(results['final_classification'], 'SUBJECTIVE -> NEUTRAL -> NEUTRAL_SENTIMENT')
+        self.assertEqual(results['level2_prediction'], 'NEUTRAL')
+        self.assertAlmostEqual(results['confidence_scores']['level1'], 0.6)
+        self.assertAlmostEqual(results['confidence_scores']['level2'], 0.35 / 0.6)
+        self.assertAlmostEqual(results['confidence_scores']['level3'], 0.2 / 0.35)
+        # The confidence is the probability of the decoded path
+        self.assertAlmostEqual(results['first_tier']['confidence'], 0.2)
+
+        noise = first_tier.path_results(np.eye(len(first_tier.PATHS))[0])
+        self.assertEqual(noise['final_classification'], 'NOISE')
+        self.assertEqual((noise['level2_prediction'], noise['level3_prediction']), (None, None))
+        self.assertEqual(noise['first_tier']['confidence'], 1.0)
+
+    def test_labels_map_to_paths(self):
+        self.assertEqual(first_tier.path_index(1, None, None), 1)
+        self.assertEqual(first_tier.path_index(2, 2.0, np.nan), 3)
+        self.assertEqual(first_tier.path_index(2, 0.0, 1.0), 5)
+        self.assertIsNone(first_tier.path_index(2, 0.0, np.nan))
+        self.assertIsNone(first_tier.path_index(2, np.nan, None))
+
+    def test_threshold_is_the_lowest_that_reaches_the_accuracy(self):
+        confidences = np.array([0.95, 0.9, 0.7, 0.6])
+        correct = np.array([True, True, True, False])
+        rows = first_tier.sweep(confidences, correct, [0.5, 0.65, 0.8, 0.99])
+        self.assertEqual([row['escalation_rate'] for row in rows], [0.0, 0.25, 0.5, 1.0])
+        self.assertEqual([row['accepted_accuracy'] for row in rows], [0.75, 1.0, 1.0, None])
+        self.assertEqual(first_tier.choose_threshold(rows, 0.95), 0.65)
+        # No threshold is good enough: always escalate
+        self.assertEqual(first_tier.choose_threshold(rows[:1], 0.95), 1.0)
+
+    def test_model_round_trip(self):
+        n_features = 64
+        rng = np.random.default_rng(0)
+        model = first_tier.FirstTierModel(rng.normal(size=(n_features, len(first_tier.PATHS))),
+                                          rng.normal(size=len(first_tier.PATHS)), threshold=0.8)
+        texts = ['buy now https://example.com', 'what is the price?', '🚀🚀']
+        probabilities = model.predict_proba(texts)
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1.0, rtol=1e-5)
+        self.assertEqual(model.predict_proba([]).shape, (0, len(first_tier.PATHS)))
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, first_tier.MODEL_FILE)
+        model.save(path)
+        loaded = first_tier.FirstTierModel.load(path)
+        self.assertAlmostEqual(loaded.threshold, 0.8, places=6)
+        np.testing.assert_allclose(loaded.predict_proba(texts), probabilities, rtol=1e-5)
+
+        with self.assertRaises(ValueError):
+            first_tier.FirstTierModel(np.zeros((n_features, 3)), np.zeros(3))
+
+    def test_answered_results_cache_empty_attributions(self):
+        self.assertEqual(result_attributions({'first_tier': {'confidence': 0.95, 'accepted': True}}),
+                         {'levels': {}, 'first_tier': True})
+        self.assertIsNone(result_attributions({'first_tier': {'confidence': 0.5, 'accepted': False}}))
+        self.assertEqual(result_attributions({'attributions': {'levels': {}}}), {'levels': {}})
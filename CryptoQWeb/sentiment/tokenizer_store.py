@@ -0,0 +1,143 @@
+"""
+Vendored DeBERTa tokenizer shared by every SentimentAnalyzer in the process.
+
+The tokenizer files (tokenizer.json, spm.model, tokenizer_config.json, ...) and
+the encoder config.json are stored in models/tokenizer/ next to the Level/Fold
+checkpoints, together with a manifest naming the Hugging Face model and the
+commit they were downloaded at. At runtime they are read from disk only
+(local_files_only) as a Rust "fast" tokenizer, once per process.
+
+The commit the checkpoints were trained with is pinned in
+sentiment/tokenizer_revision.json (tracked in git), so every build vendors
+the same files. Without a pin nothing is vendored or loaded (a moving branch
+such as 'main' could silently change the ids the checkpoints see), and a
+vendored tokenizer whose manifest names another commit is not used either.
+Record the training commit once (then commit tokenizer_revision.json):
+    python manage.py vendor_tokenizer --revision <commit sha>
+after which builds populate the directory with:
+    python manage.py vendor_tokenizer
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Must match the backbone used by the training notebooks (CODES/Task-1*.ipynb)
+TOKENIZER_NAME = "microsoft/deberta-v3-small"
+PIN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tokenizer_revision.json')
+COMMIT_SHA = re.compile(r'^[0-9a-f]{40}$')
+TOKENIZER_DIR_NAME = "tokenizer"
+MANIFEST_NAME = "manifest.json"
+
+_lock = threading.Lock()
+_tokenizers = {}
+_configs = {}
+
+
+def tokenizer_dir(models_dir: str) -> str:
+    """Directory holding the vendored tokenizer for a models directory"""
+    return os.path.abspath(os.path.join(models_dir, TOKENIZER_DIR_NAME))
+
+
+def read_manifest(models_dir: str):
+    """Return the vendoring manifest, or None when the tokenizer is not vendored"""
+    path = os.path.join(tokenizer_dir(models_dir), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def pinned_revision() -> Optional[str]:
+    """Commit sha of TOKENIZER_NAME the checkpoints were trained with, None when nothing is pinned"""
+    try:
+        with open(PIN_FILE) as f:
+            pin = json.load(f)
+    except OSError:
+        return None
+    if pin.get('name') != TOKENIZER_NAME or not COMMIT_SHA.match(pin.get('revision', '')):
+        raise ValueError(f"{PIN_FILE} must pin a commit sha of {TOKENIZER_NAME}")
+    return pin['revision']
+
+
+def pin_revision(revision: str):
+    """Pin a commit sha in PIN_FILE"""
+    if not COMMIT_SHA.match(revision):
+        raise ValueError(f"Only a commit sha can be pinned, not '{revision}'")
+    with open(PIN_FILE, 'w') as f:
+        json.dump({'name': TOKENIZER_NAME, 'revision': revision}, f, indent=2)
+        f.write('\n')
+
+
+def _check_manifest(models_dir: str) -> bool:
+    manifest = read_manifest(models_dir)
+    if manifest is None:
+        logger.warning(f"✗ No vendored tokenizer in {tokenizer_dir(models_dir)} (run 'manage.py vendor_tokenizer')")
+        return False
+    if manifest.get('name') != TOKENIZER_NAME:
+        logger.warning(f"Vendored tokenizer is {manifest.get('name')}, checkpoints expect {TOKENIZER_NAME}")
+    try:
+        pinned = pinned_revision()
+    except ValueError as e:
+        logger.error(f"✗ {e}")
+        return False
+    if pinned is None:
+        logger.error(f"✗ No tokenizer commit is pinned in {PIN_FILE}; not loading an unpinned tokenizer "
+                     f"(run 'manage.py vendor_tokenizer --revision <commit sha>')")
+        return False
+    if manifest.get('revision') != pinned:
+        logger.error(f"✗ Vendored tokenizer is at {manifest.get('revision')}, the checkpoints pin {pinned} "
+                     f"(run 'manage.py vendor_tokenizer --force')")
+        return False
+    return True
+
+
+def _load_tokenizer(models_dir: str):
+    from transformers import AutoTokenizer
+
+    if not _check_manifest(models_dir):
+        return None
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_dir(models_dir), use_fast=True, local_files_only=True)
+    except Exception as e:
+        logger.error(f"Error loading vendored tokenizer: {e}")
+        return None
+    if not tokenizer.is_fast:
+        logger.warning("Vendored tokenizer is not a fast (Rust) tokenizer; batch encoding will be slower")
+    logger.info(f"✓ DeBERTa tokenizer loaded from {tokenizer_dir(models_dir)}")
+    return tokenizer
+
+
+def _load_config(models_dir: str):
+    from transformers import AutoConfig
+
+    if not os.path.exists(os.path.join(tokenizer_dir(models_dir), 'config.json')) or not _check_manifest(models_dir):
+        return None
+    try:
+        return AutoConfig.from_pretrained(tokenizer_dir(models_dir), local_files_only=True)
+    except Exception as e:
+        logger.error(f"Error loading vendored encoder config: {e}")
+        return None
+
+
+def get_shared_tokenizer(models_dir: str):
+    """Load the vendored tokenizer once per process and share it between analyzers"""
+    key = tokenizer_dir(models_dir)
+    with _lock:
+        if key not in _tokenizers:
+            _tokenizers[key] = _load_tokenizer(models_dir)
+        return _tokenizers[key]
+
+
+def get_shared_encoder_config(models_dir: str):
+    """Vendored encoder config, so models are built without downloading pretrained weights"""
+    key = tokenizer_dir(models_dir)
+    with _lock:
+        if key not in _configs:
+            _configs[key] = _load_config(models_dir)
+        return _configs[key]
@@ -0,0 +1,225 @@
+"""
+Fit-once UMAP reference projection for the dashboard visualizations.
+
+For every hierarchy level a labeled sample of the training data is embedded
+and a UMAP reducer is fitted offline (manage.py build_umap_reference). The
+reducer and the 2-D reference coordinates are stored in
+models/umap_reference/ and loaded once per process; a user's text is then only
+embedded and placed with reducer.transform(), which takes milliseconds
+instead of a numba-compiled fit on every render.
+
+    umap_reference/
+        manifest.json           embedding model, sample counts
+        level1.npz              x, y, labels, texts of the reference points
+        level1_reducer.joblib   fitted umap.UMAP
+        ...
+"""
+
+import os
+import json
+import logging
+import threading
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .embedding_service import EMBEDDING_MODEL, get_embedding_service
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_DIR_NAME = 'umap_reference'
+MANIFEST_NAME = 'manifest.json'
+
+LEVEL_CLASSES = {
+    'level1': ['NOISE', 'OBJECTIVE', 'SUBJECTIVE'],
+    'level2': ['NEUTRAL', 'NEGATIVE', 'POSITIVE'],
+    'level3': ['NEUTRAL_SENTIMENT', 'QUESTION', 'ADVERTISEMENT', 'MISCELLANEOUS'],
+}
+SUBJECTIVE = LEVEL_CLASSES['level1'].index('SUBJECTIVE')
+NEUTRAL = LEVEL_CLASSES['level2'].index('NEUTRAL')
+
+EmbedFn = Callable[[Sequence[str]], np.ndarray]
+
+_projections = {}
+_projections_lock = threading.Lock()
+
+
+def reference_dir(models_dir: str) -> str:
+    return os.environ.get('UMAP_REFERENCE_DIR') or os.path.join(models_dir, REFERENCE_DIR_NAME)
+
+
+def manifest_version(directory: str) -> Optional[str]:
+    """Build time of the reference in directory (None if it was never built), without loading it"""
+    try:
+        return str(int(os.path.getmtime(os.path.join(directory, MANIFEST_NAME))))
+    except OSError:
+        return None
+
+
+def embed_texts(texts: Sequence[str], models_dir: str = 'models') -> np.ndarray:
+    """Sentence embeddings from the shared, disk-cached embedding service"""
+    service = get_embedding_service(models_dir)
+    if service is None:
+        raise RuntimeError("Sentence encoder is not available (run 'manage.py vendor_sentence_encoder')")
+    return service.encode(texts)
+
+
+def select_reference_samples(df, samples_per_class: int = 200, seed: int = 42) -> Dict[str, Dict[str, List]]:
+    """
+    Stratified sample per level from the Task-1 dataframe (text, level_1, level_2, level_3)
+
+    Level 2 only uses SUBJECTIVE rows and level 3 only SUBJECTIVE -> NEUTRAL rows,
+    matching the hierarchy the models are applied in.
+    """
+    import pandas as pd
+
+    df = df.dropna(subset=['text', 'level_1'])
+    level1 = df['level_1'].astype(int)
+    level2 = pd.to_numeric(df['level_2'], errors='coerce')
+    level3 = pd.to_numeric(df['level_3'], errors='coerce')
+    subsets = {
+        'level1': (df, level1),
+        'level2': (df[(level1 == SUBJECTIVE) & level2.notna()], level2),
+        'level3': (df[(level1 == SUBJECTIVE) & (level2 == NEUTRAL) & level3.notna()], level3),
+    }
+
+    samples = {}
+    for level, (subset, codes) in subsets.items():
+        texts, labels = [], []
+        codes = codes.loc[subset.index].astype(int)
+        for code, class_name in enumerate(LEVEL_CLASSES[level]):
+            rows = subset[codes == code]
+            rows = rows.sample(n=min(samples_per_class, len(rows)), random_state=seed)
+            texts.extend(rows['text'].astype(str).tolist())
+            labels.extend([class_name] * len(rows))
+        samples[level] = {'texts': texts, 'labels': labels}
+    return samples
+
+
+def fit_reference(samples: Dict[str, Dict[str, List]], output_dir: str, embed_fn: EmbedFn = embed_texts,
+                  n_neighbors: int = 15, min_dist: float = 0.1, seed: int = 42) -> Dict[str, int]:
+    """Embed the reference samples, fit one UMAP per level and persist everything"""
+    import joblib
+    import umap
+
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {}
+    embedding_dim = None
+    for level, sample in samples.items():
+        if len(sample['texts']) <= n_neighbors:
+            logger.warning(f"✗ Not enough {level} samples ({len(sample['texts'])}) for a UMAP reference")
+            continue
+        embeddings = embed_fn(sample['texts'])
+        embedding_dim = embeddings.shape[1]
+        reducer = umap.UMAP(n_components=2, n_neighbors=n_neighbors, min_dist=min_dist, random_state=seed)
+        coords = reducer.fit_transform(embeddings)
+
+        joblib.dump(reducer, os.path.join(output_dir, f'{level}_reducer.joblib'))
+        np.savez_compressed(
+            os.path.join(output_dir, f'{level}.npz'),
+            x=coords[:, 0].astype(np.float32),
+            y=coords[:, 1].astype(np.float32),
+            labels=np.array(sample['labels']),
+            texts=np.array(sample['texts']),
+        )
+        counts[level] = len(sample['texts'])
+        logger.info(f"✓ {level} UMAP reference fitted on {len(sample['texts'])} samples")
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump({'embedding_model': EMBEDDING_MODEL, 'embedding_dim': embedding_dim, 'samples': counts,
+                   'n_neighbors': n_neighbors, 'min_dist': min_dist}, f, indent=2)
+    return counts
+
+
+class ReferenceProjection:
+    """Persisted per-level reference points and reducers, loaded once"""
+
+    def __init__(self, directory: str, embed_fn: EmbedFn = embed_texts):
+        import joblib
+
+        self.directory = directory
+        self.embed_fn = embed_fn
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        # Changes whenever the reference is rebuilt (part of the cached figures' keys)
+        self.version = manifest_version(directory)
+        if self.manifest.get('embedding_model') != EMBEDDING_MODEL:
+            logger.warning(f"UMAP reference was built with {self.manifest.get('embedding_model')}, embedding with {EMBEDDING_MODEL}")
+        self.reducers = {}
+        self.points = {}
+        for level in LEVEL_CLASSES:
+            reducer_path = os.path.join(directory, f'{level}_reducer.joblib')
+            points_path = os.path.join(directory, f'{level}.npz')
+            if not (os.path.exists(reducer_path) and os.path.exists(points_path)):
+                continue
+            self.reducers[level] = joblib.load(reducer_path)
+            with np.load(points_path) as data:
+                self.points[level] = {
+                    'x': data['x'].tolist(),
+                    'y': data['y'].tolist(),
+                    'labels': data['labels'].tolist(),
+                    'texts': data['texts'].tolist(),
+                }
+        logger.info(f"✓ UMAP reference loaded for {sorted(self.reducers)} from {directory}")
+
+    def warm_up(self):
+        """Load the embedder and run one transform per level so numba compiles at startup, not on the first request"""
+        if self.reducers:
+            embedding = self.embed_fn(['warm up'])
+            for level in self.reducers:
+                self.place(level, embedding)
+
+    def place(self, level: str, embeddings: np.ndarray) -> np.ndarray:
+        """2-D coordinates of new embeddings in the level's reference space"""
+        return self.reducers[level].transform(np.asarray(embeddings, dtype=np.float32))
+
+    def plot_data(self, user_text: str, predictions: Dict[str, Optional[str]]) -> Dict[str, Dict]:
+        """
+        Reference points plus the user's text for every level, in the dashboards'
+        {'x', 'y', 'labels', 'texts', 'user_indices'} format
+
+        The user's point is only added to the levels its prediction reaches.
+        """
+        reached = [level for level in LEVEL_CLASSES if predictions.get(level) and level in self.reducers]
+        user_embedding = self.embed_fn([user_text]) if reached else None
+
+        results = {}
+        for level in LEVEL_CLASSES:
+            points = self.points.get(level, {'x': [], 'y': [], 'labels': [], 'texts': []})
+            data = {key: list(values) for key, values in points.items()}
+            data['user_indices'] = []
+            if level in reached:
+                x, y = self.place(level, user_embedding)[0]
+                data['x'].append(float(x))
+                data['y'].append(float(y))
+                data['labels'].append(predictions[level])
+                data['texts'].append(user_text)
+                data['user_indices'].append(len(data['x']) - 1)
+            results[level] = data
+        return results
+
+
+def empty_plot_data() -> Dict[str, Dict]:
+    """Plot data without any points, used when no reference has been built"""
+    return {level: {'x': [], 'y': [], 'labels': [], 'texts': [], 'user_indices': []} for level in LEVEL_CLASSES}
+
+
+def get_reference_projection(models_dir: str = 'models', warm_up: bool = True) -> Optional[ReferenceProjection]:
+    """Load the persisted reference once per process (None if it was never built)"""
+    directory = reference_dir(models_dir)
+    with _projections_lock:
+        if directory not in _projections:
+            projection = None
+            if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+                try:
+                    projection = ReferenceProjection(directory, partial(embed_texts, models_dir=models_dir))
+                    if warm_up:
+                        projection.warm_up()
+                except Exception as e:
+                    logger.error(f"Error loading UMAP reference from {directory}: {e}")
+                    projection = None
+            else:
+                logger.warning(f"✗ No UMAP reference in {directory} (run 'manage.py build_umap_reference')")
+            _projections[directory] = projection
+        return _projections[directory]
@@ -10,7 +10,16 @@ urlpatterns = [
     path('analyze/', views.analyze_sentiment_form, name='analyze_form'),
     path('api/analyze/', views.analyze_sentiment, name='analyze_api'),
     path('history/', views.analysis_history, name='history'),
+    path('api/history/', views.history_api, name='history_api'),
+    path('api/stats/', views.stats_api, name='stats_api'),
+    path('api/search/', views.search_api, name='search_api'),
+    path('api/export/', views.export_api, name='export_api'),
+    path('api/similar/<int:analysis_id>/', views.similar_api, name='similar_api'),
+    path('api/figures/<int:analysis_id>/<str:figure>/', views.figure_api, name='figure_api'),
+    path('api/dashboard/<int:analysis_id>/', views.dashboard_api, name='dashboard_api'),
     path('detail/<int:analysis_id>/', views.analysis_detail, name='detail'),
+    path('dashboard/<int:analysis_id>/', views.analysis_dashboard, name='dashboard'),
+    path('detail/<uuid:analysis_uid>/', views.analysis_detail_by_uid, name='detail_by_uid'),
     path('edit/<int:analysis_id>/', views.edit_analysis, name='edit'),
     path('delete/<int:analysis_id>/', views.delete_analysis, name='delete'),
     path('about-author/', views.about_author, name='about_author'),
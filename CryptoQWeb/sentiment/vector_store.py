@@ -0,0 +1,243 @@
+"""
+Append-only float16 vector files.
+
+VectorFile is the storage shared by the sentence-embedding cache and the
+analysis vector store: rows are appended to a raw float16 file that readers
+memory-map, and a parallel uint64 key file records which key each row belongs
+to. The key is written after the row, so a row only becomes visible once it
+is complete; appends from several processes are serialized with flock().
+Updating a key appends a new row - the latest row wins. Discarding keys appends
+(key, row count) pairs to deleted.u64, which hide the key's rows written before
+that point; the rows themselves stay in the file.
+
+AnalysisVectorStore keeps the fold-averaged DeBERTa pooled vectors that
+SentimentAnalyzer.analyze(..., return_embeddings=True) computes anyway, one
+VectorFile per level, keyed by SentimentAnalysis.id:
+
+    <ANALYSIS_VECTOR_DIR>/
+        level1/  meta.json  vectors.f16  keys.u64  deleted.u64  .lock
+        level2/  ...
+        level3/  ...
+"""
+
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: single-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ('level1', 'level2', 'level3')
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class VectorFile:
+    """
+    Append-only float16 matrix with a key -> row index
+
+    Args:
+        directory: where meta.json, vectors.f16 and keys.u64 live
+        dim: vector dimension (None: read it from an existing meta.json)
+        meta: extra metadata that must match an existing file (e.g. the model name)
+    """
+
+    def __init__(self, directory: str, dim: Optional[int] = None, meta: Optional[Dict] = None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, 'vectors.f16')
+        self.keys_path = os.path.join(directory, 'keys.u64')
+        self.deleted_path = os.path.join(directory, 'deleted.u64')
+        self.lock_path = os.path.join(directory, '.lock')
+
+        expected = dict(meta or {})
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                stored = json.load(f)
+            if dim is None:
+                dim = stored.get('dim')
+            if stored.get('dim') != dim or any(stored.get(key) != value for key, value in expected.items()):
+                raise ValueError(f"Vector file {directory} was built for {stored}, not {expected} (dim {dim})")
+        elif dim is None:
+            raise ValueError(f"No vector file in {directory} and no dimension given")
+        else:
+            with open(meta_path, 'w') as f:
+                json.dump({**expected, 'dim': dim}, f)
+        self.dim = int(dim)
+
+        self._index: Dict[int, int] = {}
+        self._vectors = None
+        self._rows = 0
+        self._deleted = 0
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def _refresh(self):
+        """Pick up rows appended and keys discarded by this or other processes"""
+        keys_size = os.path.getsize(self.keys_path) if os.path.exists(self.keys_path) else 0
+        rows = keys_size // 8
+        if rows != self._rows:
+            keys = np.fromfile(self.keys_path, dtype=np.uint64, count=rows)
+            for row in range(self._rows, rows):
+                self._index[int(keys[row])] = row
+            self._rows = rows
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float16, mode='r', shape=(rows, self.dim))
+
+        deleted_size = os.path.getsize(self.deleted_path) if os.path.exists(self.deleted_path) else 0
+        if deleted_size // 16 != self._deleted:
+            entries = np.fromfile(self.deleted_path, dtype=np.uint64, count=deleted_size // 16 * 2).reshape(-1, 2)
+            for key, before_row in entries[self._deleted:].tolist():
+                if before_row > self._rows:
+                    # Discarded after rows this refresh has not read yet; apply it next time
+                    break
+                if self._index.get(key, before_row) < before_row:
+                    del self._index[key]
+                self._deleted += 1
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock, open(self.lock_path, 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def lookup(self, keys: Sequence[int]) -> Dict[int, np.ndarray]:
+        """Stored vectors (float32) for the keys that are present"""
+        with self._lock:
+            # Two stat() calls: also picks up keys other processes discarded
+            self._refresh()
+            return {key: np.asarray(self._vectors[self._index[key]], dtype=np.float32)
+                    for key in keys if key in self._index}
+
+    def add(self, keys: Sequence[int], vectors: np.ndarray):
+        if not len(keys):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float16).reshape(len(keys), self.dim)
+        with self._exclusive():
+            # Vectors first, keys last: a row only counts once its key is written
+            vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+            keys_size = os.path.getsize(self.keys_path) if os.path.exists(self.keys_path) else 0
+            with open(self.vectors_path, 'r+b' if vectors_size else 'wb') as f:
+                # Drop vectors of a write that crashed before its keys were committed
+                f.truncate((keys_size // 8) * self.dim * 2)
+                f.seek(0, os.SEEK_END)
+                f.write(vectors.tobytes())
+            with open(self.keys_path, 'ab') as f:
+                f.write(np.asarray(keys, dtype=np.uint64).tobytes())
+            self._refresh()
+
+    def discard(self, keys: Sequence[int]):
+        """Forget keys; adding one again later makes it visible again"""
+        if not len(keys):
+            return
+        with self._exclusive():
+            rows = (os.path.getsize(self.keys_path) if os.path.exists(self.keys_path) else 0) // 8
+            entries = np.array([(key, rows) for key in keys], dtype=np.uint64)
+            with open(self.deleted_path, 'ab') as f:
+                f.write(entries.tobytes())
+            self._refresh()
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(keys, rows) of the latest row per key; vectors are read lazily from the memmap"""
+        with self._lock:
+            self._refresh()
+            if not self._index:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+            keys = np.fromiter(self._index.keys(), dtype=np.int64, count=len(self._index))
+            rows = np.fromiter(self._index.values(), dtype=np.int64, count=len(self._index))
+            return keys, rows
+
+    def latest_rows(self, keys: Sequence[int]) -> Dict[int, int]:
+        """Row holding the current vector of each present key"""
+        with self._lock:
+            self._refresh()
+            return {key: self._index[key] for key in keys if key in self._index}
+
+    def read_rows(self, start: int, stop: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(keys, float16 vectors) of the committed rows start..stop in append order"""
+        with self._lock:
+            self._refresh()
+            stop = self._rows if stop is None else min(stop, self._rows)
+            if start >= stop:
+                return np.zeros(0, dtype=np.int64), np.zeros((0, self.dim), dtype=np.float16)
+            with open(self.keys_path, 'rb') as f:
+                f.seek(start * 8)
+                keys = np.fromfile(f, dtype=np.uint64, count=stop - start).astype(np.int64)
+            return keys, self._vectors[start:stop]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Memory-mapped (rows, dim) float16 matrix, including superseded rows"""
+        with self._lock:
+            self._refresh()
+            return self._vectors if self._vectors is not None else np.zeros((0, self.dim), dtype=np.float16)
+
+    def __len__(self):
+        return self._rows
+
+
+class AnalysisVectorStore:
+    """Per-level pooled DeBERTa vectors indexed by SentimentAnalysis.id"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._files: Dict[str, VectorFile] = {}
+        self._lock = threading.Lock()
+
+    def file(self, level: str, dim: Optional[int] = None) -> Optional[VectorFile]:
+        """The level's VectorFile (None if nothing was stored yet and no dim is given)"""
+        with self._lock:
+            if level not in self._files:
+                path = os.path.join(self.directory, level)
+                if dim is None and not os.path.exists(os.path.join(path, 'meta.json')):
+                    return None
+                self._files[level] = VectorFile(path, dim)
+            return self._files[level]
+
+    def add(self, analysis_id: int, embeddings: Dict[str, np.ndarray]):
+        """Store (or replace) the vectors of one analysis"""
+        for level, vector in embeddings.items():
+            if level in LEVELS and vector is not None:
+                vector = np.asarray(vector, dtype=np.float32).ravel()
+                self.file(level, vector.shape[0]).add([analysis_id], vector[None, :])
+
+    def discard(self, analysis_ids: Sequence[int]):
+        """Forget the vectors of analyses that were deleted or archived"""
+        for level in LEVELS:
+            vector_file = self.file(level)
+            if vector_file is not None:
+                vector_file.discard(analysis_ids)
+
+    def get(self, analysis_id: int) -> Dict[str, np.ndarray]:
+        """Stored vectors of one analysis, by level"""
+        embeddings = {}
+        for level in LEVELS:
+            vector_file = self.file(level)
+            if vector_file is not None:
+                found = vector_file.lookup([analysis_id])
+                if analysis_id in found:
+                    embeddings[level] = found[analysis_id]
+        return embeddings
+
+
+def get_vector_store() -> Optional[AnalysisVectorStore]:
+    """Process-wide analysis vector store (None when disabled)"""
+    if not settings.ANALYSIS_VECTOR_STORE_ENABLED:
+        return None
+    directory = settings.ANALYSIS_VECTOR_DIR
+    with _stores_lock:
+        if directory not in _stores:
+            _stores[directory] = AnalysisVectorStore(directory)
+        return _stores[directory]
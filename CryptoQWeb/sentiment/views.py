@@ -1,34 +1,205 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.conf import settings
+from django.db import transaction
 from .models import SentimentAnalysis
-from .ai_analyzer import SentimentAnalyzer
 from .classification_formatter import format_classification_path
+from .near_duplicate import NearDuplicateIndex
+from . import rollups
+from .write_buffer import AnalysisWriteBuffer, WriteBufferFull
+from .pagination import (
+    FILTER_FIELDS, history_page, parse_filters, parse_include_archive, parse_limit, parse_platform, parse_time_range,
+    serialize_row,
+)
+from . import archive, export
+from .search import search_analyses
+from .vector_store import get_vector_store
+from .model_registry import get_model_registry
+from .ann_index import similar_analyses
+from .attributions import (cache_attributions, discard_attributions, get_cached_attributions, result_attributions,
+                           token_importance)
+from . import figures
+from .figure_cache import figure_key, get_figure_cache
+from .umap_reference import get_reference_projection
+from .dashboard import analysis_predictions, dashboard_payload, invalidate_dashboard, umap_plot_data
+import copy
 import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-# Initialize the sentiment analyzer
-# Note: In production, you might want to use a singleton pattern or cache this
-analyzer = None
-
 def get_analyzer():
-    """Get or initialize the sentiment analyzer (lazy loading - doesn't block startup)"""
-    global analyzer
-    if analyzer is None:
+    """
+    The analyzer of the model version this process serves (None if unavailable)
+
+    The registry creates it on first use (weights load lazily, so startup is not
+    blocked) and swaps in new versions in the background; see model_registry.
+    """
+    return get_model_registry().analyzer()
+
+near_duplicate_index = None
+near_duplicate_archive_run = None
+
+def get_near_duplicate_index():
+    """
+    Get the per-process index of recently analyzed texts (None when disabled)
+
+    After an archive_analyses run (in any process) the entries of analyses that
+    are no longer in the table are dropped.
+    """
+    global near_duplicate_index, near_duplicate_archive_run
+    if near_duplicate_index is None and settings.NEAR_DUPLICATE_ENABLED:
+        near_duplicate_index = NearDuplicateIndex(
+            threshold=settings.NEAR_DUPLICATE_SIMILARITY,
+            capacity=settings.NEAR_DUPLICATE_CAPACITY,
+        )
+        near_duplicate_archive_run = archive.last_run()
+    elif near_duplicate_index is not None:
+        last_run = archive.last_run()
+        if last_run != near_duplicate_archive_run:
+            near_duplicate_archive_run = last_run
+            forget_missing_analyses(near_duplicate_index)
+    return near_duplicate_index
+
+def forget_missing_analyses(index, batch_size=1000):
+    """Discard index entries whose analysis was deleted or archived"""
+    analysis_ids = index.analysis_ids()
+    existing = set()
+    for i in range(0, len(analysis_ids), batch_size):
+        existing.update(SentimentAnalysis.objects.filter(id__in=analysis_ids[i:i + batch_size]).values_list('id', flat=True))
+    missing = [analysis_id for analysis_id in analysis_ids if analysis_id not in existing]
+    for analysis_id in missing:
+        index.discard(analysis_id)
+    if missing:
+        logger.info(f"Dropped {len(missing)} archived analyses from the near-duplicate index")
+
+def analysis_deadline(seconds=None):
+    """
+    time.monotonic() value an analysis started now should finish by
+
+    settings.ANALYSIS_DEADLINE bounds it (0: no deadline); a caller may only
+    ask for a shorter one.
+    """
+    limit = settings.ANALYSIS_DEADLINE
+    if seconds is not None and seconds > 0:
+        limit = min(limit, seconds) if limit > 0 else seconds
+    return time.monotonic() + limit if limit > 0 else None
+
+def run_analysis(text, deadline=None):
+    """
+    Analyze text, reusing the prediction of a recent near-duplicate when there is one
+
+    The model pass runs under a registry lease, so a model version swapped out
+    meanwhile is only released after it, and is fitted to the deadline (see
+    analysis_deadline). A near-duplicate is only reused while the model version
+    that predicted it is still served. Returns (results, duplicate_of_id,
+    signature); the signature is passed to remember_analysis once the record
+    is saved.
+    """
+    index = get_near_duplicate_index()
+    signature = index.signature(text) if index is not None else None
+    match = index.lookup(signature) if index is not None else None
+    with get_model_registry().lease() as analyzer_instance:
+        if analyzer_instance is None:
+            raise RuntimeError('Sentiment analyzer not available')
+        # A prediction of a model version swapped out since is not reused
+        if match is not None and match.results.get('model_version') != analyzer_instance.model_version():
+            index.discard(match.analysis_id)
+            match = None
+        if match is not None and SentimentAnalysis.objects.filter(id=match.analysis_id).exists():
+            logger.info(f"Near-duplicate of analysis {match.analysis_id} (similarity {match.similarity:.2f}), reusing prediction")
+            results = copy.deepcopy(match.results)
+            results['near_duplicate'] = {'analysis_id': match.analysis_id, 'similarity': match.similarity}
+            return results, match.analysis_id, signature
+        if match is not None:
+            index.discard(match.analysis_id)
+        return analyzer_instance.analyze(
+            text,
+            return_embeddings=get_vector_store() is not None,
+            return_attributions=settings.ATTRIBUTIONS_ENABLED,
+            deadline=deadline,
+        ), None, signature
+
+def store_embeddings(sentiment_record, embeddings):
+    """
+    Keep the pooled vectors of a saved analysis in the vector store
+
+    A reused near-duplicate prediction ran no model, so it gets the vectors of
+    the analysis it duplicates. A text the first tier answered has none and is
+    not stored.
+    """
+    store = get_vector_store()
+    if store is None:
+        return
+    try:
+        if not embeddings and sentiment_record.duplicate_of_id is not None:
+            embeddings = store.get(sentiment_record.duplicate_of_id)
+        if embeddings:
+            store.add(sentiment_record.id, embeddings)
+    except Exception as e:
+        logger.error(f"Could not store embeddings of analysis {sentiment_record.id}: {e}")
+
+def remember_analysis(sentiment_record, results, signature):
+    """
+    Make a freshly analyzed (not reused) prediction available to later near-duplicates
+
+    Predictions degraded under load are not remembered, so a near-duplicate
+    arriving after the burst gets the full ensemble.
+    """
+    index = get_near_duplicate_index()
+    degraded = results.get('degradation', {}).get('level')
+    if index is not None and sentiment_record.duplicate_of_id is None and not degraded:
+        index.add(signature, sentiment_record.id, copy.deepcopy(results))
+
+write_buffer = None
+
+def get_write_buffer():
+    """Get the per-process write-behind buffer (None when writes are synchronous)"""
+    global write_buffer
+    if write_buffer is None and settings.ANALYSIS_WRITE_BUFFER_ENABLED:
+        write_buffer = AnalysisWriteBuffer(
+            max_batch=settings.ANALYSIS_WRITE_BUFFER_SIZE,
+            flush_interval=settings.ANALYSIS_WRITE_BUFFER_INTERVAL,
+            max_pending=settings.ANALYSIS_WRITE_BUFFER_MAX_PENDING,
+        )
+    return write_buffer
+
+def save_analysis(sentiment_record, results, signature):
+    """
+    Persist a new analysis (and its rollups) now, or queue it in the write buffer
+
+    Returns True when the row was written synchronously and has an id.
+    The pooled vectors and token attributions are taken out of results here,
+    so they are neither rendered nor reused for near-duplicates.
+    """
+    embeddings = results.pop('embeddings', None)
+    attributions = result_attributions(results)
+    results.pop('attributions', None)
+
+    def on_saved(record):
+        store_embeddings(record, embeddings)
+        if attributions:
+            cache_attributions(record.id, attributions)
+        remember_analysis(record, results, signature)
+
+    buffer = get_write_buffer()
+    if buffer is not None:
         try:
-            # Use relative path for Render deployment
-            # Don't block if models aren't ready - will use fallback analysis
-            analyzer = SentimentAnalyzer(models_dir="models")
-            logger.info("Sentiment analyzer initialized successfully")
-        except Exception as e:
-            logger.warning(f"Sentiment analyzer not available (models may still be downloading): {e}")
-            logger.info("Application will use fallback rule-based analysis until models are ready")
-            analyzer = None
-    return analyzer
+            buffer.submit(sentiment_record, on_saved=on_saved)
+            return False
+        except WriteBufferFull as e:
+            logger.warning(f"Writing analysis synchronously: {e}")
+    with transaction.atomic():
+        sentiment_record.save()
+        rollups.record_created(sentiment_record)
+    on_saved(sentiment_record)
+    return True
 
 def health_check(request):
     """Health check endpoint for Render deployment"""
@@ -71,8 +242,19 @@ def analyze_sentiment(request):
         if request.content_type == 'application/json':
             data = json.loads(request.body)
             text = data.get('text', '').strip()
+            explain = bool(data.get('explain'))
+            deadline_ms = data.get('deadline_ms')
         else:
             text = request.POST.get('text', '').strip()
+            explain = request.POST.get('explain', '').lower() in ('1', 'true', 'yes')
+            deadline_ms = request.POST.get('deadline_ms')
+        try:
+            deadline = analysis_deadline(float(deadline_ms) / 1000 if deadline_ms not in (None, '') else None)
+        except (TypeError, ValueError):
+            return JsonResponse({
+                'error': 'deadline_ms must be a number',
+                'classification': 'NOISE'
+            }, status=400)
         
         if not text:
             return JsonResponse({
@@ -89,17 +271,21 @@ def analyze_sentiment(request):
             }, status=500)
         
         # Perform analysis
-        results = analyzer_instance.analyze(text)
+        results, duplicate_of_id, signature = run_analysis(text, deadline)
+        attributions = results.get('attributions')
         
-        # Save to database
-        sentiment_record = SentimentAnalysis.objects.create(
+        # Save to database (or queue it when write-behind buffering is enabled)
+        sentiment_record = SentimentAnalysis(
             text=text,
             level1_prediction=results.get('level1_prediction'),
             level2_prediction=results.get('level2_prediction'),
             level3_prediction=results.get('level3_prediction'),
             final_classification=results.get('final_classification'),
-            confidence_scores=results.get('confidence_scores', {})
+            confidence_scores=results.get('confidence_scores', {}),
+            duplicate_of_id=duplicate_of_id,
+            model_version=results.get('model_version', '')
         )
+        save_analysis(sentiment_record, results, signature)
         
         # Return results
         response_data = {
@@ -108,8 +294,14 @@ def analyze_sentiment(request):
             'level2': results.get('level2_prediction'),
             'level3': results.get('level3_prediction'),
             'confidence_scores': results.get('confidence_scores', {}),
-            'analysis_id': sentiment_record.id
+            'analysis_id': sentiment_record.id,
+            'analysis_uid': str(sentiment_record.uid),
+            'duplicate_of': duplicate_of_id,
+            'degradation': results.get('degradation'),
+            'first_tier': results.get('first_tier')
         }
+        if explain:
+            response_data['attributions'] = attributions
         
         return JsonResponse(response_data)
         
@@ -142,7 +334,7 @@ def analyze_sentiment_form(request):
                 return render(request, 'sentiment/home.html', {'selected_platform': platform})
             
             # Perform analysis
-            results = analyzer_instance.analyze(text)
+            results, duplicate_of_id, signature = run_analysis(text, analysis_deadline())
             
             # Format classification path
             classification_info = format_classification_path(
@@ -154,16 +346,19 @@ def analyze_sentiment_form(request):
             results['classification_description'] = classification_info['description']
             results['classification_input_summary'] = classification_info['input_summary']
             
-            # Save to database
-            sentiment_record = SentimentAnalysis.objects.create(
+            # Save to database (or queue it when write-behind buffering is enabled)
+            sentiment_record = SentimentAnalysis(
                 text=text,
                 platform=platform,
                 level1_prediction=results.get('level1_prediction'),
                 level2_prediction=results.get('level2_prediction'),
                 level3_prediction=results.get('level3_prediction'),
                 final_classification=results.get('final_classification'),
-                confidence_scores=results.get('confidence_scores', {})
+                confidence_scores=results.get('confidence_scores', {}),
+                duplicate_of_id=duplicate_of_id,
+                model_version=results.get('model_version', '')
             )
+            save_analysis(sentiment_record, results, signature)
             
             # Add success message
             messages.success(request, f'Analysis completed: {results.get("final_classification")}')
@@ -174,6 +369,7 @@ def analyze_sentiment_form(request):
             return render(request, 'sentiment/home.html', {
                 'analysis_result': results,
                 'analysis_id': sentiment_record.id,
+                'analysis_uid': sentiment_record.uid,
                 'original_text': text,
                 'selected_platform': platform,
                 'classification_info': classification_info
@@ -186,10 +382,178 @@ def analyze_sentiment_form(request):
     
     return render(request, 'sentiment/home.html')
 
+def history_filter_options(params):
+    """(param, label, choices, selected) for the history filter dropdowns"""
+    options = []
+    for param, label in (('platform', 'Platform'), ('level1', 'Level 1'), ('level2', 'Level 2'), ('level3', 'Level 3')):
+        field = SentimentAnalysis._meta.get_field(FILTER_FIELDS[param])
+        options.append((param, label, field.choices, params.get(param, '').upper()))
+    return options
+
 def analysis_history(request):
-    """View analysis history"""
-    analyses = SentimentAnalysis.objects.all()[:50]  # Show last 50 analyses
-    return render(request, 'sentiment/history.html', {'analyses': analyses})
+    """View analysis history (cursor-paginated, optionally filtered by platform/class)"""
+    try:
+        filters = parse_filters(request.GET)
+        include_archive = parse_include_archive(request.GET)
+        analyses, next_cursor = history_page(filters, request.GET.get('cursor'), parse_limit(request.GET.get('limit')),
+                                             include_archive)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('sentiment:history')
+
+    # Keep the active filters on the "Older" link
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    filter_query = params.urlencode()
+    if next_cursor:
+        params['cursor'] = next_cursor
+
+    return render(request, 'sentiment/history.html', {
+        'analyses': analyses,
+        'next_query': params.urlencode() if next_cursor else None,
+        'filter_query': filter_query,
+        'is_first_page': not request.GET.get('cursor'),
+        'filter_options': history_filter_options(request.GET),
+        'include_archive': include_archive,
+    })
+
+@require_http_methods(["GET"])
+def history_api(request):
+    """JSON history: ?platform=&level1=&level2=&level3=&limit=&cursor=&include_archive=1"""
+    try:
+        filters = parse_filters(request.GET)
+        analyses, next_cursor = history_page(filters, request.GET.get('cursor'), parse_limit(request.GET.get('limit')),
+                                             parse_include_archive(request.GET))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'results': [serialize_row(analysis) for analysis in analyses],
+        'next_cursor': next_cursor,
+    })
+
+@require_http_methods(["GET"])
+def search_api(request):
+    """Ranked full-text search: ?q=keyword, $TICKER or "a phrase"&limit="""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'No query provided'}, status=400)
+
+    results = []
+    for analysis in search_analyses(query, parse_limit(request.GET.get('limit'))):
+        row = serialize_row(analysis)
+        row['score'] = analysis.score
+        results.append(row)
+    return JsonResponse({'query': query, 'results': results})
+
+@require_http_methods(["GET"])
+def similar_api(request, analysis_id):
+    """Approximate nearest neighbors of an analysis by its pooled vector: ?k=10&nprobe="""
+    if not SentimentAnalysis.objects.filter(id=analysis_id).exists():
+        return JsonResponse({'error': 'Analysis not found'}, status=404)
+    try:
+        k = max(1, min(int(request.GET.get('k', 10)), 100))
+        nprobe = int(request.GET['nprobe']) if request.GET.get('nprobe') else None
+    except ValueError:
+        return JsonResponse({'error': 'k and nprobe must be integers'}, status=400)
+
+    started = time.perf_counter()
+    results = []
+    for analysis in similar_analyses(analysis_id, k, nprobe):
+        row = serialize_row(analysis)
+        row['similarity'] = round(analysis.similarity, 4)
+        results.append(row)
+    return JsonResponse({
+        'analysis_id': analysis_id,
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2),
+    })
+
+@require_http_methods(["GET", "HEAD"])
+def figure_api(request, analysis_id, figure):
+    """
+    One rendered dashboard figure of an analysis: plotly JSON ('wordcloud_png': PNG)
+
+    Figures are cached by analysis, model version and figure type, and served
+    with ETag/Last-Modified so unchanged figures cost a 304.
+    """
+    if figure not in figures.FIGURES:
+        return JsonResponse({'error': f'Unknown figure: {figure}', 'figures': list(figures.FIGURES)}, status=404)
+    if figure == 'wordcloud_png' and not figures.WORDCLOUD_AVAILABLE:
+        return JsonResponse({'error': 'Word cloud images require wordcloud'}, status=503)
+    if figure != 'wordcloud_png' and not figures.PLOTLY_AVAILABLE:
+        return JsonResponse({'error': 'Figures require plotly'}, status=503)
+    try:
+        analysis = SentimentAnalysis.objects.get(id=analysis_id)
+    except SentimentAnalysis.DoesNotExist:
+        return JsonResponse({'error': 'Analysis not found'}, status=404)
+
+    predictions = analysis_predictions(analysis)
+    confidence = analysis.confidence_scores or {}
+    key_parts = [figure, analysis.id, analysis.model_version, analysis.text, predictions, confidence]
+    importance = None
+    if figure == 'tokens':
+        importance = token_importance(get_cached_attributions(analysis.id), predictions)
+        key_parts.append(importance)
+    elif figure.startswith('umap_'):
+        reference = get_reference_projection(settings.MODELS_DIR)
+        key_parts.append(reference.version if reference is not None else None)
+
+    try:
+        entry = get_figure_cache().get_or_build(
+            figure_key(*key_parts),
+            'png' if figure == 'wordcloud_png' else 'json',
+            lambda: figures.render_figure(figure, analysis.text, predictions, confidence, importance,
+                                          umap_data=lambda: umap_plot_data(analysis.text, predictions)),
+        )
+    except Exception as e:
+        logger.error(f"Error rendering figure {figure} of analysis {analysis_id}: {e}")
+        return JsonResponse({'error': f'Could not render figure: {e}'}, status=500)
+
+    etag = quote_etag(entry.etag)
+    response = get_conditional_response(request, etag=etag, last_modified=int(entry.built_at))
+    if response is None:
+        response = HttpResponse(entry.content, content_type=entry.content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(entry.built_at)
+    # Cacheable, but always revalidated: an edit changes the figure behind the same URL
+    patch_cache_control(response, no_cache=True)
+    return response
+
+@require_http_methods(["GET"])
+def stats_api(request):
+    """Counts per hour/day bucket and level prediction: ?granularity=hour|day&platform=&since=&until="""
+    granularity = request.GET.get('granularity', 'day').upper()
+    if granularity not in rollups.GRANULARITIES:
+        return JsonResponse({'error': f'Invalid granularity: {granularity}'}, status=400)
+    try:
+        platform = parse_platform(request.GET)
+        bounds = parse_time_range(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(rollups.get_stats(granularity, platform, **bounds))
+
+@require_http_methods(["GET"])
+def export_api(request):
+    """Stream all matching analyses: ?format=csv|parquet&platform=&since=&until="""
+    file_format = request.GET.get('format', 'csv').lower()
+    if file_format not in export.FORMATS:
+        return JsonResponse({'error': f'Invalid format: {file_format}'}, status=400)
+    if file_format == 'parquet' and not export.PYARROW_AVAILABLE:
+        return JsonResponse({'error': 'Parquet export requires pyarrow'}, status=400)
+    try:
+        queryset = export.export_queryset(parse_platform(request.GET), **parse_time_range(request.GET))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    rows = export.iter_rows(queryset)
+    if file_format == 'parquet':
+        response = StreamingHttpResponse(export.iter_parquet(rows), content_type='application/vnd.apache.parquet')
+    else:
+        response = StreamingHttpResponse(export.iter_csv(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="sentiment_analyses.{file_format}"'
+    return response
 
 def analysis_detail(request, analysis_id):
     """View detailed analysis results"""
@@ -201,14 +565,49 @@ def analysis_detail(request, analysis_id):
             analysis.level2_prediction,
             analysis.level3_prediction
         )
+        # Visualization data is loaded by the page from dashboard_api
         return render(request, 'sentiment/detail.html', {
             'analysis': analysis,
-            'classification_info': classification_info
+            'classification_info': classification_info,
         })
     except SentimentAnalysis.DoesNotExist:
         messages.error(request, 'Analysis not found.')
         return redirect('sentiment:home')
 
+def analysis_dashboard(request, analysis_id):
+    """Interactive dashboard of an analysis; the page loads its data from dashboard_api"""
+    try:
+        analysis = SentimentAnalysis.objects.get(id=analysis_id)
+    except SentimentAnalysis.DoesNotExist:
+        messages.error(request, 'Analysis not found.')
+        return redirect('sentiment:home')
+    return render(request, 'sentiment/dashboard.html', {'analysis': analysis})
+
+@require_http_methods(["GET"])
+def dashboard_api(request, analysis_id):
+    """Memoized dashboard data of an analysis; 'umap' stays 'pending' until the background placement is cached"""
+    try:
+        analysis = SentimentAnalysis.objects.get(id=analysis_id)
+    except SentimentAnalysis.DoesNotExist:
+        return JsonResponse({'error': 'Analysis not found'}, status=404)
+    # Analyses saved without attributions are explained once, then served from the cache
+    if not settings.ATTRIBUTIONS_ENABLED:
+        return JsonResponse(dashboard_payload(analysis))
+    with get_model_registry().lease() as analyzer_instance:
+        return JsonResponse(dashboard_payload(analysis, analyzer_instance))
+
+def analysis_detail_by_uid(request, analysis_uid):
+    """Resolve the uid handed out for a (possibly still buffered) analysis to its detail page"""
+    analysis = SentimentAnalysis.objects.filter(uid=analysis_uid).only('id').first()
+    buffer = get_write_buffer()
+    if analysis is None and buffer is not None:
+        buffer.flush()
+        analysis = SentimentAnalysis.objects.filter(uid=analysis_uid).only('id').first()
+    if analysis is None:
+        messages.error(request, 'Analysis not found.')
+        return redirect('sentiment:home')
+    return redirect('sentiment:detail', analysis_id=analysis.id)
+
 def about_author(request):
     """About Author page"""
     return render(request, 'sentiment/aboutauthor.html')
@@ -239,16 +638,24 @@ def edit_analysis(request, analysis_id):
                 return render(request, 'sentiment/edit_analysis.html', {'analysis': analysis})
             
             try:
-                # Get analyzer
-                analyzer_instance = get_analyzer()
-                if analyzer_instance is None:
-                    messages.error(request, 'Sentiment analyzer is not available.')
-                    return render(request, 'sentiment/edit_analysis.html', {'analysis': analysis})
-                
-                # Perform new analysis
-                results = analyzer_instance.analyze(new_text)
+                with get_model_registry().lease() as analyzer_instance:
+                    if analyzer_instance is None:
+                        messages.error(request, 'Sentiment analyzer is not available.')
+                        return render(request, 'sentiment/edit_analysis.html', {'analysis': analysis})
+                    
+                    # Perform new analysis
+                    results = analyzer_instance.analyze(
+                        new_text,
+                        return_embeddings=get_vector_store() is not None,
+                        return_attributions=settings.ATTRIBUTIONS_ENABLED,
+                        deadline=analysis_deadline(),
+                    )
+                embeddings = results.pop('embeddings', None)
+                attributions = result_attributions(results)
+                results.pop('attributions', None)
                 
                 # Update the record
+                old_rollup_key = rollups.rollup_key(analysis)
                 analysis.text = new_text
                 analysis.platform = platform
                 analysis.level1_prediction = results.get('level1_prediction')
@@ -256,7 +663,22 @@ def edit_analysis(request, analysis_id):
                 analysis.level3_prediction = results.get('level3_prediction')
                 analysis.final_classification = results.get('final_classification')
                 analysis.confidence_scores = results.get('confidence_scores', {})
-                analysis.save()
+                analysis.duplicate_of = None
+                analysis.model_version = results.get('model_version', '')
+                with transaction.atomic():
+                    analysis.save()
+                    rollups.record_updated(old_rollup_key, analysis)
+                store_embeddings(analysis, embeddings)
+                if attributions:
+                    cache_attributions(analysis.id, attributions)
+                else:
+                    discard_attributions(analysis.id)
+                invalidate_dashboard(analysis.id)
+                
+                # The cached prediction no longer matches the stored text
+                index = get_near_duplicate_index()
+                if index is not None:
+                    index.discard(analysis.id)
                 
                 messages.success(request, 'Analysis updated successfully!')
                 return redirect('sentiment:detail', analysis_id=analysis.id)
@@ -278,7 +700,14 @@ def delete_analysis(request, analysis_id):
         analysis = SentimentAnalysis.objects.get(id=analysis_id)
         
         if request.method == 'POST':
-            analysis.delete()
+            index = get_near_duplicate_index()
+            if index is not None:
+                index.discard(analysis.id)
+            with transaction.atomic():
+                rollups.record_deleted(analysis)
+                analysis.delete()
+            discard_attributions(analysis_id)
+            invalidate_dashboard(analysis_id)
             messages.success(request, 'Analysis deleted successfully.')
             return redirect('sentiment:history')
         
@@ -0,0 +1,122 @@
+"""
+Overlapping token windows for long texts.
+
+Instead of truncating at 512 tokens (and paying 512² attention for every
+long post), a text is split into short windows (e.g. 128 tokens) that
+overlap, so no sentence is only ever seen cut in half:
+
+    tokens   0 ............................................... n
+    window 1 [CLS] 0 ........ 125 [SEP]
+    window 2                 [CLS] 94 ........ 219 [SEP]
+    window 3                                   [CLS] 188 ... n [SEP]
+
+The windows of all texts of a batch form one (n_windows, window) tensor, so
+the encoder runs once per fold for the whole batch and attention cost grows
+linearly with the length of a text. Per-window outputs are brought back to
+their text with aggregate() (mean weighted by the tokens each window holds)
+and per-token scores with stitch() (overlapping positions averaged).
+"""
+
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class Windows(NamedTuple):
+    input_ids: np.ndarray       # (n_windows, window) int64
+    attention_mask: np.ndarray  # (n_windows, window) int64
+    owners: np.ndarray          # (n_windows,) index of the text each window belongs to
+    positions: np.ndarray       # (n_windows, window) token position in its text, -1 for special/padding
+    lengths: np.ndarray         # (n_texts,) tokens per text
+
+    @property
+    def n_texts(self) -> int:
+        return len(self.lengths)
+
+    def select(self, texts: Sequence[int]) -> Tuple['Windows', np.ndarray]:
+        """
+        The windows of a subset of texts (renumbered 0..len(texts)-1)
+
+        Returns (windows, row indices of the selected windows in self).
+        """
+        texts = np.asarray(texts, dtype=np.int64)
+        renumber = np.full(self.n_texts, -1, dtype=np.int64)
+        renumber[texts] = np.arange(len(texts))
+        rows = np.flatnonzero(renumber[self.owners] >= 0)
+        return Windows(self.input_ids[rows], self.attention_mask[rows], renumber[self.owners[rows]],
+                       self.positions[rows], self.lengths[texts]), rows
+
+
+def window_spans(length: int, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """[start, end) token spans of at most size tokens covering length tokens, consecutive spans sharing overlap"""
+    if length <= size:
+        return [(0, length)]
+    step = size - overlap
+    starts = list(range(0, length - overlap, step))
+    # The last span ends exactly at the end of the text
+    if starts[-1] + size < length:
+        starts.append(length - size)
+    return [(start, min(start + size, length)) for start in starts]
+
+
+def build_windows(sequences: Sequence[Sequence[int]], window: int, overlap: int, pad_token_id: int = 0,
+                  cls_token_id: Optional[int] = None, sep_token_id: Optional[int] = None) -> Windows:
+    """
+    Split token id sequences (without special tokens) into overlapping windows
+
+    Args:
+        window: length of every window, special tokens included
+        overlap: tokens shared by consecutive windows of a text
+        cls_token_id, sep_token_id: wrapped around the content of every window when given
+    """
+    specials = (cls_token_id is not None) + (sep_token_id is not None)
+    size = window - specials
+    if size - overlap <= 0:
+        raise ValueError(f"Window of {window} tokens leaves no room to advance past an overlap of {overlap}")
+
+    rows = []
+    for text_index, sequence in enumerate(sequences):
+        sequence = np.asarray(sequence, dtype=np.int64)
+        for start, end in window_spans(len(sequence), size, overlap):
+            rows.append((text_index, start, end, sequence[start:end]))
+
+    input_ids = np.full((len(rows), window), pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros((len(rows), window), dtype=np.int64)
+    positions = np.full((len(rows), window), -1, dtype=np.int64)
+    owners = np.empty(len(rows), dtype=np.int64)
+    content = 1 if cls_token_id is not None else 0
+    for row, (text_index, start, end, ids) in enumerate(rows):
+        owners[row] = text_index
+        input_ids[row, content:content + len(ids)] = ids
+        positions[row, content:content + len(ids)] = np.arange(start, end)
+        if cls_token_id is not None:
+            input_ids[row, 0] = cls_token_id
+        if sep_token_id is not None:
+            input_ids[row, content + len(ids)] = sep_token_id
+        attention_mask[row, :content + len(ids) + (sep_token_id is not None)] = 1
+
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    return Windows(input_ids, attention_mask, owners, positions, lengths)
+
+
+def aggregate(values: np.ndarray, windows: Windows) -> np.ndarray:
+    """(n_windows, d) per-window values -> (n_texts, d), weighted by the tokens of each window"""
+    weights = np.maximum((windows.positions >= 0).sum(axis=1), 1).astype(np.float64)
+    totals = np.zeros((windows.n_texts, values.shape[1]), dtype=np.float64)
+    np.add.at(totals, windows.owners, values * weights[:, None])
+    weight_sums = np.bincount(windows.owners, weights=weights, minlength=windows.n_texts)
+    return (totals / np.maximum(weight_sums, 1e-9)[:, None]).astype(values.dtype)
+
+
+def stitch(scores: np.ndarray, windows: Windows) -> List[np.ndarray]:
+    """(n_windows, window) per-slot scores -> per text, one score per token (overlaps averaged)"""
+    stitched = []
+    for text_index, length in enumerate(windows.lengths):
+        totals = np.zeros(length, dtype=np.float64)
+        counts = np.zeros(length, dtype=np.float64)
+        for row in np.flatnonzero(windows.owners == text_index):
+            slots = windows.positions[row] >= 0
+            np.add.at(totals, windows.positions[row][slots], scores[row][slots])
+            np.add.at(counts, windows.positions[row][slots], 1.0)
+        stitched.append(totals / np.maximum(counts, 1.0))
+    return stitched
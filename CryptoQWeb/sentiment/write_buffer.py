@@ -0,0 +1,200 @@
+"""
+Optional write-behind buffer for SentimentAnalysis rows.
+
+With ANALYSIS_WRITE_BUFFER_ENABLED the analyze views hand unsaved instances to
+the buffer and respond immediately with the instance's pre-assigned `uid`.
+A background thread writes queued rows with one bulk_create (plus the rollup
+updates) per transaction whenever ANALYSIS_WRITE_BUFFER_SIZE rows are waiting
+or ANALYSIS_WRITE_BUFFER_INTERVAL seconds have passed, so request latency no
+longer includes a database commit and SQLite sees one write per batch instead
+of one per request. Pending rows are flushed at interpreter exit.
+
+A batch that fails is split in halves and retried down to single rows, so
+one bad row (e.g. a near-duplicate whose original was deleted meanwhile)
+cannot hold back the rows queued with it. A row that keeps failing on its
+own after max_attempts flushes is logged and moved to the dead_letters list.
+When nothing of a batch could be written (the database itself is failing)
+the rows are kept and the next flush backs off exponentially. The queue is
+bounded: submit() raises WriteBufferFull once max_pending rows are waiting,
+and the caller writes synchronously instead.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.db import close_old_connections, transaction
+
+from . import rollups
+from .models import SentimentAnalysis
+
+logger = logging.getLogger(__name__)
+
+OnSaved = Optional[Callable[[SentimentAnalysis], None]]
+Pending = Tuple[SentimentAnalysis, OnSaved]
+
+
+class WriteBufferFull(RuntimeError):
+    """max_pending rows are already waiting to be written"""
+
+
+class AnalysisWriteBuffer:
+    """
+    Queue of unsaved analyses flushed by size or time
+
+    Args:
+        max_batch: flush as soon as this many rows are pending
+        flush_interval: maximum seconds a row waits before being flushed
+        max_pending: rows that may wait at once (submit raises WriteBufferFull beyond)
+        max_attempts: failed flushes of a row on its own before it is dead-lettered
+        max_backoff: longest pause, in seconds, after failed flushes
+    """
+
+    def __init__(self, max_batch: int = 100, flush_interval: float = 1.0, max_pending: int = 10000,
+                 max_attempts: int = 3, max_backoff: float = 60.0):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self._pending: List[Pending] = []
+        # uid -> failed flushes of a row that failed on its own
+        self._attempts: Dict = {}
+        self._failures = 0
+        self._retry_at = 0.0
+        # (analysis, error) of rows given up on, most recent last
+        self.dead_letters = deque(maxlen=1000)
+        self._condition = threading.Condition()
+        # Serializes flushes from the worker thread, atexit and flush-on-read
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='analysis-write-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, analysis: SentimentAnalysis, on_saved: OnSaved = None):
+        """Queue an unsaved analysis; on_saved(analysis) runs after it is committed"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Write buffer is closed")
+            if len(self._pending) >= self.max_pending:
+                raise WriteBufferFull(f"{len(self._pending)} analyses are already waiting to be written")
+            self._pending.append((analysis, on_saved))
+            if len(self._pending) >= self.max_batch:
+                self._condition.notify()
+        return analysis.uid
+
+    def _take(self) -> List[Pending]:
+        with self._condition:
+            batch, self._pending = self._pending, []
+            return batch
+
+    def _requeue(self, batch):
+        with self._condition:
+            self._pending[:0] = batch
+
+    def _write(self, batch: List[Pending]) -> Tuple[List[Pending], List[Tuple[Pending, Exception]]]:
+        """Write batch in one transaction, or in halves down to single rows when it fails; (saved, failed)"""
+        analyses = [analysis for analysis, _ in batch]
+        try:
+            with transaction.atomic():
+                SentimentAnalysis.objects.bulk_create(analyses)
+                rollups.record_created_many(analyses)
+            return batch, []
+        except Exception as e:
+            for analysis in analyses:
+                analysis.pk = None
+            if len(batch) == 1:
+                return [], [(batch[0], e)]
+        middle = len(batch) // 2
+        saved_first, failed_first = self._write(batch[:middle])
+        saved_second, failed_second = self._write(batch[middle:])
+        return saved_first + saved_second, failed_first + failed_second
+
+    def flush(self) -> int:
+        """Write everything pending now; returns the number of rows written"""
+        with self._flush_lock:
+            batch = self._take()
+            if not batch:
+                return 0
+            saved, failed = self._write(batch)
+            if failed:
+                self._keep_failed(failed, isolated=bool(saved))
+            else:
+                self._failures = 0
+                self._retry_at = 0.0
+            for analysis, _ in saved:
+                self._attempts.pop(analysis.uid, None)
+
+        for analysis, on_saved in saved:
+            if on_saved is not None and analysis.pk is not None:
+                try:
+                    on_saved(analysis)
+                except Exception as e:
+                    logger.warning(f"Write buffer callback failed for {analysis.uid}: {e}")
+        logger.debug(f"Write buffer flushed {len(saved)} analyses")
+        return len(saved)
+
+    def _keep_failed(self, failed: List[Tuple[Pending, Exception]], isolated: bool):
+        """
+        Requeue failed rows and back off
+
+        isolated: other rows of the batch were written, so the failures are the
+        rows' own and count towards max_attempts (as do later failures of a row
+        that already failed that way); otherwise the database itself may be
+        failing and the rows are kept as they are.
+        """
+        retry = []
+        for item, error in failed:
+            analysis = item[0]
+            if isolated or analysis.uid in self._attempts:
+                attempts = self._attempts.get(analysis.uid, 0) + 1
+                if attempts >= self.max_attempts:
+                    self._attempts.pop(analysis.uid, None)
+                    self.dead_letters.append((analysis, str(error)))
+                    logger.error(f"✗ Dropped analysis {analysis.uid} after {attempts} failed writes: {error}")
+                    continue
+                self._attempts[analysis.uid] = attempts
+            retry.append(item)
+        self._requeue(retry)
+
+        self._failures += 1
+        delay = min(self.flush_interval * 2 ** self._failures, self.max_backoff)
+        self._retry_at = time.monotonic() + delay
+        logger.error(f"✗ Write buffer could not write {len(failed)} analyses ({failed[0][1]}); "
+                     f"{len(retry)} requeued, next flush in {delay:.1f}s")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed:
+                    now = time.monotonic()
+                    # A full batch goes right away, unless failed flushes asked to back off
+                    due = now if len(self._pending) >= self.max_batch else deadline
+                    remaining = max(due, self._retry_at) - now
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                closed = self._closed
+            self.flush()
+            close_old_connections()
+            if closed:
+                return
+
+    def close(self):
+        """Stop the worker thread and durably write everything still queued"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=30)
+        self.flush()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._pending)
@@ -30,4 +30,8 @@ timeout 1800 python download_models_optimized.py || {
 echo "🗄️  Running database migrations..."
 python manage.py migrate --noinput || echo "⚠️  Migrations failed, continuing..."
 
+# Step 6: Vendor the pinned tokenizer so runtime never downloads it
+echo "🔤 Vendoring tokenizer..."
+python manage.py vendor_tokenizer || echo "⚠️  Tokenizer vendoring failed, continuing..."
+
 echo "✅ Build process completed successfully!"